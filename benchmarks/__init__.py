@@ -0,0 +1 @@
+"""Benchmarks for the Python side of Holodeck."""
@@ -0,0 +1,99 @@
+"""Measures the Python overhead of a step, on top of the tick handshake.
+
+Runs against the Python stand-in server, so no world binary is needed::
+
+    python -m benchmarks.bench_step --steps 20000 --sensors 8
+
+The overhead of a step with the compiled step plan is compared with the way a step was done before
+the plan existed, where the sensor names were scanned for the task sensor and the state dictionary
+was walked on every step.
+"""
+import argparse
+import time
+import uuid
+
+import numpy as np
+
+from holodeck.agents import AgentDefinition, HolodeckAgent
+from holodeck.environments import HolodeckEnvironment
+from holodeck.sensors import SensorDefinition
+from holodeck.standin import start_server_process
+
+
+def _unplanned_step(env, action):
+    """A step the way it was done before the step plan."""
+    agent = env._agent
+    HolodeckAgent.__act__(agent, action)
+    env._start_tick()
+    env._finish_tick("step")
+    reward = None
+    terminal = None
+    for sensor in env._state_dict[agent.name]:
+        if "Task" in sensor:
+            reward = env._state_dict[agent.name][sensor][0]
+            terminal = env._state_dict[agent.name][sensor][1] == 1
+    return env._create_copy(env._state_dict[agent.name]), reward, terminal, None
+
+
+def _round_trip(env, _):
+    env._start_tick()
+    env._finish_tick("step")
+
+
+def measure(step, num_sensors=2, steps=10000, warmup=500):
+    """Times a step function against a stand-in server.
+
+    Args:
+        step (callable): Called with the environment and an action.
+        num_sensors (:obj:`int`): Number of sensors on the agent.
+        steps (:obj:`int`): Number of steps to time.
+        warmup (:obj:`int`): Number of untimed steps to run first.
+
+    Returns:
+        :obj:`np.ndarray`: The latency of each step, in microseconds.
+    """
+    sensors = [SensorDefinition("uav0", "UavAgent", "Location{}".format(i), "LocationSensor")
+               for i in range(num_sensors)]
+    sensors.append(SensorDefinition("uav0", "UavAgent", "DistanceTask", "DistanceTask"))
+    agent = AgentDefinition("uav0", "UavAgent", sensors=sensors, is_main_agent=True)
+    env_uuid = str(uuid.uuid4())
+    process = start_server_process(env_uuid)
+    env = HolodeckEnvironment(agent_definitions=[agent], start_world=False, uuid=env_uuid,
+                              pre_start_steps=0)
+    # Shorter than the action buffer, so it has to be padded
+    action = np.zeros(3, dtype=np.float32)
+    try:
+        env.reset()
+        for _ in range(warmup):
+            step(env, action)
+
+        latencies = np.empty(steps)
+        for i in range(steps):
+            start = time.perf_counter()
+            step(env, action)
+            latencies[i] = time.perf_counter() - start
+        return latencies * 1e6
+    finally:
+        env.__on_exit__()
+        process.terminate()
+        process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=10000)
+    parser.add_argument("--sensors", type=int, default=2)
+    args = parser.parse_args()
+
+    round_trip = measure(_round_trip, args.sensors, args.steps)
+    print("{:<10} {:>10} {:>10} {:>14}".format("step", "mean us", "p50 us", "overhead us"))
+    for name, step in [("handshake", _round_trip), ("unplanned", _unplanned_step),
+                       ("planned", lambda env, action: env.step(action))]:
+        latencies = round_trip if step is _round_trip else measure(step, args.sensors, args.steps)
+        print("{:<10} {:>10.1f} {:>10.1f} {:>14.1f}".format(
+            name, latencies.mean(), np.percentile(latencies, 50),
+            np.percentile(latencies, 50) - np.percentile(round_trip, 50)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Measures the tick handshake round trip latency of each sync backend.
+
+Runs against the Python stand-in server, so no world binary is needed::
+
+    python -m benchmarks.bench_sync --round-trips 20000
+"""
+import argparse
+import time
+import uuid
+
+import numpy as np
+
+from holodeck.holodeckclient import HolodeckClient
+from holodeck.standin import start_server_process
+
+
+def measure_round_trips(sync_backend, round_trips=10000, warmup=500):
+    """Measures release/acquire round trips against a stand-in server.
+
+    Args:
+        sync_backend (:obj:`str`): Name of the sync backend.
+        round_trips (:obj:`int`): Number of round trips to time.
+        warmup (:obj:`int`): Number of untimed round trips to run first.
+
+    Returns:
+        :obj:`np.ndarray`: The latency of each round trip, in microseconds.
+    """
+    env_uuid = str(uuid.uuid4())
+    process = start_server_process(env_uuid, sync_backend)
+    client = HolodeckClient(env_uuid, should_timeout=True, sync_backend=sync_backend)
+    try:
+        client.acquire()
+        for _ in range(warmup):
+            client.release()
+            client.acquire()
+
+        latencies = np.empty(round_trips)
+        for i in range(round_trips):
+            start = time.perf_counter()
+            client.release()
+            client.acquire()
+            latencies[i] = time.perf_counter() - start
+        return latencies * 1e6
+    finally:
+        process.terminate()
+        process.join()
+        client.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--round-trips", type=int, default=10000)
+    parser.add_argument("--backends", nargs="+", default=["semaphore", "futex"])
+    args = parser.parse_args()
+
+    print("{:<10} {:>10} {:>10} {:>10}".format("backend", "mean us", "p50 us", "p99 us"))
+    for backend in args.backends:
+        latencies = measure_round_trips(backend, args.round_trips)
+        print("{:<10} {:>10.1f} {:>10.1f} {:>10.1f}".format(
+            backend, latencies.mean(), np.percentile(latencies, 50), np.percentile(latencies, 99)))
+
+
+if __name__ == "__main__":
+    main()
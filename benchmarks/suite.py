@@ -0,0 +1,270 @@
+"""Benchmarks the hot paths of the Python side of Holodeck, and compares them with a baseline.
+
+Runs against the stand-in engine, so no world binary is needed. Scenarios of installed worlds can
+be added with ``--scenario``::
+
+    python -m benchmarks.suite --output baseline.json
+    python -m benchmarks.suite --compare baseline.json --threshold 0.2
+
+With ``--compare``, the exit code is 1 if any benchmark got slower than the baseline by more than
+the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import uuid
+
+import numpy as np
+
+import holodeck
+from holodeck import standin
+from holodeck.command import CommandCenter, CommandsGroup, DebugDrawCommand
+from holodeck.environments import HolodeckEnvironment
+from holodeck.holodeckclient import HolodeckClient
+from holodeck.standin import StandInServer
+
+RESOLUTIONS = [256, 512, 1024, 2048]
+COMMAND_COUNTS = [1, 10, 100, 1000]
+AGENT_COUNTS = [1, 4, 16]
+
+
+def _scenario(num_agents=1, resolution=None):
+    """A scenario for the stand-in engine with UAVs with low dimensional sensors, and optionally a
+    camera on the main agent."""
+    agents = []
+    for i in range(num_agents):
+        sensors = [{"sensor_type": "LocationSensor"}, {"sensor_type": "VelocitySensor"},
+                   {"sensor_type": "IMUSensor"}]
+        if i == 0:
+            sensors.append({"sensor_type": "DistanceTask"})
+            if resolution is not None:
+                sensors.append({"sensor_type": "RGBCamera",
+                                "configuration": {"CaptureWidth": resolution,
+                                                  "CaptureHeight": resolution}})
+        agents.append({"agent_name": "uav{}".format(i), "agent_type": "UavAgent",
+                       "control_scheme": 0, "location": [0, 0, i], "sensors": sensors})
+    return {"name": "Benchmark", "world": "StandInWorld", "main_agent": "uav0", "agents": agents}
+
+
+def _standin_env(scenario, **kwargs):
+    # Writing noise into the sensors would dominate the timings of the Python side
+    os.environ.setdefault("HOLODECK_STANDIN_FILL", "constant")
+    return HolodeckEnvironment(scenario=scenario, binary_path=standin.binary_path(),
+                               uuid=str(uuid.uuid4()), pre_start_steps=0, show_viewport=False,
+                               **kwargs)
+
+
+def _timings(fn, repeats, warmup=0):
+    for _ in range(warmup):
+        fn()
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+    return timings * 1e6
+
+
+def _result(benchmark, params, timings):
+    return {"benchmark": benchmark,
+            "params": params,
+            "mean_us": float(timings.mean()),
+            "p50_us": float(np.percentile(timings, 50)),
+            "p90_us": float(np.percentile(timings, 90)),
+            "per_sec": float(1e6 / timings.mean()),
+            "repeats": len(timings)}
+
+
+def bench_step(env, engine, repeats):
+    """Round trip latency and throughput of step and tick."""
+    action = np.zeros(env.action_space.shape, dtype=np.float32)
+    env.reset()
+    return [
+        _result("step", {"engine": engine},
+                _timings(lambda: env.step(action), repeats, warmup=repeats // 10)),
+        _result("tick", {"engine": engine},
+                _timings(env.tick, repeats, warmup=repeats // 10)),
+    ]
+
+
+def bench_commands(repeats):
+    """Serializing and writing commands, against the number of commands in a tick."""
+    env_uuid = str(uuid.uuid4())
+    server = StandInServer(env_uuid)
+    client = HolodeckClient(env_uuid)
+    try:
+        command_center = CommandCenter(client)
+        results = []
+        for count in COMMAND_COUNTS:
+            group = CommandsGroup()
+            for i in range(count):
+                group.add_command(DebugDrawCommand(0, [i, 0, 0], [0, i, 0], [255, 0, 0], 1.0))
+            results.append(_result("commands_to_json", {"commands": count},
+                                    _timings(group.to_json, repeats)))
+            serialized = group.to_json()
+            results.append(_result(
+                "write_command_buffer", {"commands": count},
+                _timings(lambda: command_center._write_to_command_buffer(serialized),
+                         max(repeats // 10, 10))))
+
+            def send():
+                for command in group._commands:
+                    command_center.enqueue_command(command)
+                command_center.handle_buffer()
+            results.append(_result("handle_buffer", {"commands": count},
+                                   _timings(send, max(repeats // 10, 10))))
+        return results
+    finally:
+        client.unlink()
+        server.unlink()
+
+
+def bench_copy(env, repeats):
+    """Copying the state, against the resolution of a camera."""
+    results = []
+    for resolution in RESOLUTIONS:
+        state = {"RGBCamera": np.zeros((resolution, resolution, 4), dtype=np.uint8),
+                 "LocationSensor": np.zeros(3, dtype=np.float32)}
+        results.append(_result("create_copy", {"resolution": resolution},
+                               _timings(lambda: env._create_copy(state), repeats)))
+    return results
+
+
+def bench_draw(env, repeats):
+    """Queueing a batch of debug points, against the number of points."""
+    results = []
+    for count in COMMAND_COUNTS:
+        points = np.random.rand(count, 3)
+
+        def draw():
+            env.draw_points(points)
+            env._command_center.clear()
+        results.append(_result("draw_points", {"points": count}, _timings(draw, repeats)))
+    return results
+
+
+def bench_reset(repeats):
+    """Reset latency, against the number of agents."""
+    results = []
+    for num_agents in AGENT_COUNTS:
+        with _standin_env(_scenario(num_agents)) as env:
+            results.append(_result("reset", {"agents": num_agents, "engine": "standin"},
+                                   _timings(env.reset, repeats)))
+    return results
+
+
+def bench_startup(scenarios, repeats):
+    """Time until an environment is ready, for the stand-in and for installed scenarios."""
+    def start_standin():
+        _standin_env(_scenario()).__on_exit__()
+
+    results = [_result("startup", {"engine": "standin"}, _timings(start_standin, repeats))]
+    for scenario in scenarios:
+        def start_world():
+            holodeck.make(scenario, show_viewport=False).__on_exit__()
+        results.append(_result("startup", {"engine": scenario}, _timings(start_world, 1)))
+    return results
+
+
+def run(scenarios=(), repeats=1000):
+    """Runs every benchmark.
+
+    Args:
+        scenarios (:obj:`list` of :obj:`str`): Installed scenarios to benchmark as well.
+        repeats (:obj:`int`): Number of timed repetitions of the fast benchmarks. The slow ones
+            (reset and startup) are repeated less.
+
+    Returns:
+        :obj:`dict`: The results, and the platform they were measured on.
+    """
+    results = []
+    with _standin_env(_scenario(resolution=256)) as env:
+        results += bench_step(env, "standin", repeats)
+        results += bench_copy(env, max(repeats // 10, 10))
+        results += bench_draw(env, max(repeats // 10, 10))
+    for scenario in scenarios:
+        with holodeck.make(scenario, show_viewport=False) as env:
+            results += bench_step(env, scenario, repeats)
+    results += bench_commands(repeats)
+    results += bench_reset(max(repeats // 100, 5))
+    results += bench_startup(scenarios, max(repeats // 200, 3))
+
+    return {"platform": {"python": platform.python_version(), "numpy": np.__version__,
+                         "machine": platform.machine(), "system": platform.system()},
+            "results": results}
+
+
+def _key(result):
+    return result["benchmark"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results, baseline, threshold=0.2):
+    """Compares results with a baseline by their median.
+
+    Args:
+        results (:obj:`dict`): Results of :func:`run`.
+        baseline (:obj:`dict`): Earlier results of :func:`run`.
+        threshold (:obj:`float`): Relative slowdown above which a benchmark is a regression.
+
+    Returns:
+        :obj:`list` of :obj:`dict`: For every benchmark in both, its ``benchmark``, ``params``,
+        ``baseline_us``, ``current_us``, ``change`` (relative) and if it is a ``regression``.
+    """
+    previous = {_key(result): result for result in baseline["results"]}
+    comparison = []
+    for result in results["results"]:
+        before = previous.get(_key(result))
+        if before is None:
+            continue
+        change = result["p50_us"] / before["p50_us"] - 1
+        comparison.append({"benchmark": result["benchmark"], "params": result["params"],
+                           "baseline_us": before["p50_us"], "current_us": result["p50_us"],
+                           "change": change, "regression": change > threshold})
+    return comparison
+
+
+def _params(params):
+    return " ".join("{}={}".format(key, value) for key, value in sorted(params.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=1000)
+    parser.add_argument("--scenario", action="append", default=[],
+                        help="An installed scenario to benchmark as well, can be repeated")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="A JSON file of earlier results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    results = run(args.scenario, args.repeats)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+    print("{:<22} {:<28} {:>12} {:>12}".format("benchmark", "params", "p50 us", "per sec"))
+    for result in results["results"]:
+        print("{:<22} {:<28} {:>12.1f} {:>12.0f}".format(
+            result["benchmark"], _params(result["params"]), result["p50_us"], result["per_sec"]))
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        comparison = compare(results, baseline, args.threshold)
+        print()
+        print("{:<22} {:<28} {:>12} {:>12} {:>8}".format(
+            "benchmark", "params", "baseline us", "current us", "change"))
+        for entry in comparison:
+            print("{:<22} {:<28} {:>12.1f} {:>12.1f} {:>+7.0%}{}".format(
+                entry["benchmark"], _params(entry["params"]), entry["baseline_us"],
+                entry["current_us"], entry["change"], "  REGRESSION" if entry["regression"] else ""))
+        if any(entry["regression"] for entry in comparison):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
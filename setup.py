@@ -21,4 +21,7 @@ setup(
         'pywin32 >= 1.0; platform_system == "Windows"',
         'numpy'
     ],
+    entry_points={
+        'console_scripts': ['holodeck-standin=holodeck.standin:main'],
+    },
 )
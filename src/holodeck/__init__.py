@@ -2,7 +2,8 @@
 """
 __version__ = '0.3.1'
 
-from holodeck.holodeck import make
+from holodeck.holodeck import make, make_vector
 from holodeck.packagemanager import *
 
-__all__ = ['agents', 'environments', 'exceptions', 'holodeck', 'make', 'packagemanager', 'sensors']
+__all__ = ['agents', 'asyncenvironments', 'environments', 'exceptions', 'holodeck', 'make',
+           'make_vector', 'packagemanager', 'scheduler', 'sensors', 'state', 'vectorenvironments']
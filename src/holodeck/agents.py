@@ -7,6 +7,7 @@ from . import joint_constraints
 from holodeck.spaces import ContinuousActionSpace, DiscreteActionSpace
 from holodeck.sensors import SensorDefinition, SensorFactory, RGBCamera
 from holodeck.command import AddSensorCommand, RemoveSensorCommand
+from holodeck.exceptions import HolodeckException
 
 
 class ControlSchemes:
@@ -82,6 +83,8 @@ class HolodeckAgent:
             max(map(lambda x: reduce(lambda i, j: i * j, x[1].buffer_shape),
                     self.control_schemes))
 
+        self._buffer_keys = [name, name + "_teleport_flag", name + "_teleport_command",
+                             name + "_control_scheme"]
         self._action_buffer = \
             self._client.malloc(name, [self._max_control_scheme_length], np.float32)
         # Teleport flag: 0: do nothing, 1: teleport, 2: rotate, 3: teleport and rotate
@@ -89,6 +92,14 @@ class HolodeckAgent:
         self._teleport_buffer = self._client.malloc(name + "_teleport_command", [12], np.float32)
         self._control_scheme_buffer = self._client.malloc(name + "_control_scheme", [1],
                                                           np.uint8)
+        self._action_schedule = None
+        if self._client.schedule_depth > 1:
+            self._buffer_keys.append(name + "_action_schedule")
+            self._action_schedule = \
+                self._client.malloc(name + "_action_schedule",
+                                    [self._client.schedule_depth,
+                                     self._max_control_scheme_length],
+                                    np.float32)
         self._current_control_scheme = 0
         self.set_control_scheme(0)
 
@@ -99,12 +110,73 @@ class HolodeckAgent:
         Args:
             action(:obj:`np.ndarray`): The action to take.
         """
-        self.__act__(action)
+        self._action_writer(action)
+
+    def action_writer(self):
+        """Gives a function that writes an action to the agent's action buffer, specialised for
+        the current control scheme. It is what :meth:`act` calls, and is rebuilt whenever the
+        control scheme changes.
+
+        Returns:
+            callable: Takes an action, like :meth:`act`.
+        """
+        if type(self).__act__ is not HolodeckAgent.__act__:
+            return self.__act__
+
+        buffer = self._action_buffer
+        size = len(buffer)
+
+        def write(action):
+            # Shorter actions are padded with zeros, without allocating a padded copy
+            length = len(action)
+            if length < size:
+                buffer[:length] = action
+                buffer[length:] = 0
+            else:
+                buffer[:] = action
+
+        return write
+
+    def act_schedule(self, actions):
+        """Sets one action per tick for the agent to carry out over the next ticks. Each action is
+        interpreted like an argument to :meth:`act`.
+
+        Only available if the environment was created with a ``schedule_depth`` greater than one.
+
+        Args:
+            actions (:obj:`np.ndarray` or :obj:`list`): The actions to take, one per tick.
+
+        Returns:
+            :obj:`int`: The number of scheduled ticks.
+        """
+        if self._action_schedule is None:
+            raise HolodeckException("Action schedules need a schedule_depth greater than one")
+        if not 0 < len(actions) <= len(self._action_schedule):
+            raise HolodeckException("Can schedule between 1 and {} actions, got {}".format(
+                len(self._action_schedule), len(actions)))
+
+        # Convert each action the same way act does, keeping the current action
+        current = np.copy(self._action_buffer)
+        try:
+            for row, action in zip(self._action_schedule, actions):
+                self._action_writer(np.array(action, dtype=np.float32))
+                np.copyto(row, self._action_buffer)
+        finally:
+            np.copyto(self._action_buffer, current)
+        return len(actions)
+
+    def hold_schedule(self, num_ticks):
+        """Schedules the current action for each of the next ``num_ticks`` ticks.
+
+        Args:
+            num_ticks (:obj:`int`): The number of ticks to schedule.
+        """
+        self._action_schedule[:num_ticks] = self._action_buffer
 
     def clear_action(self):
         """Sets the action to zeros, effectively removing any previous actions.
         """
-        np.copyto(self._action_buffer, np.zeros(self._action_buffer.shape))
+        self._action_buffer.fill(0)
 
     def set_control_scheme(self, index):
         """Sets the control scheme for the agent. See :class:`ControlSchemes`.
@@ -115,6 +187,7 @@ class HolodeckAgent:
         """
         self._current_control_scheme = index % self._num_control_schemes
         self._control_scheme_buffer[0] = self._current_control_scheme
+        self._action_writer = self.action_writer()
 
     def teleport(self, location=None, rotation=None):
         """Teleports the agent to a specific location, with a specific rotation.
@@ -160,6 +233,9 @@ class HolodeckAgent:
         """Adds a sensor to a particular agent object and attaches an instance of the sensor to the
         agent in the world.
 
+        A sensor with the name of one the agent already has replaces it, and the shared memory of
+        the replaced sensor is freed.
+
         Args:
             sensor_defs (:class:`~holodeck.sensors.HolodeckSensor` or
                          list of :class:`~holodeck.sensors.HolodeckSensor`):
@@ -170,6 +246,10 @@ class HolodeckAgent:
 
         for sensor_def in sensor_defs:
             if sensor_def.agent_name == self.name:
+                # A sensor of the same name is replaced, like remove_sensors would
+                replaced = self.sensors.pop(sensor_def.sensor_name, None)
+                if replaced is not None:
+                    replaced.free()
                 sensor = SensorFactory.build_sensor(self._client, sensor_def)
                 self.sensors[sensor_def.sensor_name] = sensor
                 self.agent_state_dict[sensor_def.sensor_name] = sensor.sensor_data
@@ -191,11 +271,34 @@ class HolodeckAgent:
             sensor_defs = [sensor_defs]
 
         for sensor_def in sensor_defs:
-            self.sensors.pop(sensor_def.sensor_name, None)
+            sensor = self.sensors.pop(sensor_def.sensor_name, None)
+            if sensor is not None:
+                sensor.free()
             self.agent_state_dict.pop(sensor_def.sensor_name, None)
             command_to_send = RemoveSensorCommand(self.name, sensor_def.sensor_name)
             self._client.command_center.enqueue_command(command_to_send)
 
+    def update_sensor_views(self):
+        """Rebuilds :attr:`agent_state_dict` so it points at the sensor data written during the
+        last tick.
+
+        Only needed when sensors have more than one slot. A new dictionary is created, so one that
+        was handed out earlier keeps pointing at the data of its own tick.
+        """
+        self.agent_state_dict = {name: sensor.sensor_data for name, sensor in self.sensors.items()}
+
+    def free(self):
+        """Releases the shared memory of the agent and all of its sensors back to the client.
+
+        The agent must not be used afterwards.
+        """
+        for sensor in self.sensors.values():
+            sensor.free()
+        self.sensors = dict()
+        for key in self._buffer_keys:
+            self._client.free(key)
+        self._buffer_keys = []
+
     def has_camera(self):
         """Indicatates whether this agent has a camera or not.
 
@@ -223,10 +326,33 @@ class HolodeckAgent:
         first element containing a short description of the control scheme, and the second
         element containing the :obj:`ActionSpace` for the control scheme.
 
+        The control schemes are built once for each agent type. Every agent gets copies of them
+        that share their bounds, but sample from random generators of their own, see
+        :meth:`~holodeck.spaces.ActionSpace.spawn`.
+
         Returns:
             (:obj:`str`, :class:`~holodeck.spaces.ActionSpace`):
                 Each tuple contains a short description and the ActionSpace
         """
+        schemes = self.__dict__.get("_control_schemes")
+        if schemes is None:
+            schemes = tuple((description, space.spawn())
+                            for description, space in type(self)._shared_control_schemes())
+            self._control_schemes = schemes
+        return schemes
+
+    @classmethod
+    def _shared_control_schemes(cls):
+        # Looked up in the class itself, a subclass has control schemes of its own
+        schemes = cls.__dict__.get("_type_control_schemes")
+        if schemes is None:
+            schemes = tuple(cls._make_control_schemes())
+            cls._type_control_schemes = schemes
+        return schemes
+
+    @classmethod
+    def _make_control_schemes(cls):
+        """Builds the control schemes of the agent type, see :attr:`control_schemes`."""
         raise NotImplementedError("Child class must implement this function")
 
     def get_joint_constraints(self, joint_name):
@@ -239,14 +365,14 @@ class HolodeckAgent:
         raise NotImplementedError("Child class must implement this function")
 
     def __act__(self, action):
-        # Allow for smaller arrays to be provided as input
-        if len(self._action_buffer) > len(action):
-            action = np.copy(action)
-            action.resize(self._action_buffer.shape)
-
-        # The default act function is to copy the data,
-        # but if needed it can be overridden
-        np.copyto(self._action_buffer, action)
+        # The default act function is to copy the data, padding smaller arrays with zeros in
+        # place, but if needed it can be overridden
+        length = len(action)
+        if length < len(self._action_buffer):
+            self._action_buffer[:length] = action
+            self._action_buffer[length:] = 0
+        else:
+            np.copyto(self._action_buffer, action)
 
     def __repr__(self):
         return self.name
@@ -282,10 +408,10 @@ class UavAgent(HolodeckAgent):
 
     agent_type = "UAV"
 
-    @property
-    def control_schemes(self):
-        torques_min = [self.__MIN_PITCH, self.__MIN_ROLL, self.__MIN_YAW_RATE, self.__MIN_FORCE]
-        torques_max = [self.__MAX_PITCH, self.__MAX_ROLL, self.__MAX_YAW_RATE, self.__MAX_FORCE]
+    @classmethod
+    def _make_control_schemes(cls):
+        torques_min = [cls.__MIN_PITCH, cls.__MIN_ROLL, cls.__MIN_YAW_RATE, cls.__MIN_FORCE]
+        torques_max = [cls.__MAX_PITCH, cls.__MAX_ROLL, cls.__MAX_YAW_RATE, cls.__MAX_FORCE]
         no_min_max = [None, None, None, None]
         return [("[pitch_torque, roll_torque, yaw_torque, thrust]",
                  ContinuousActionSpace([4], low=torques_min, high=torques_max)),
@@ -337,26 +463,38 @@ class SphereAgent(HolodeckAgent):
 
     agent_type = "SphereRobot"
 
-    @property
-    def control_schemes(self):
-        cont_min = [self.__MIN_FORWARD_SPEED, self.__MIN_ROTATION_SPEED]
-        cont_max = [self.__MAX_FORWARD_SPEED, self.__MAX_ROTATION_SPEED]
+    # Move forward .185 meters (to match initial release)
+    # Turn 10/-10 degrees (to match initial release)
+    _DISCRETE_ACTIONS = np.array([[.185, 0], [-.185, 0], [0, 10], [0, -10]], dtype=np.float32)
+    _DISCRETE_ACTIONS.flags.writeable = False
+
+    @classmethod
+    def _make_control_schemes(cls):
+        cont_min = [cls.__MIN_FORWARD_SPEED, cls.__MIN_ROTATION_SPEED]
+        cont_max = [cls.__MAX_FORWARD_SPEED, cls.__MAX_ROTATION_SPEED]
         return [("0: Move forward\n1: Move backward\n2: Turn right\n3: Turn left",
-                 DiscreteActionSpace([1], low=self.__DISCRETE_MIN, high=self.__DISCRETE_MAX, buffer_shape=[2])),
+                 DiscreteActionSpace([1], low=cls.__DISCRETE_MIN, high=cls.__DISCRETE_MAX, buffer_shape=[2])),
                 ("[forward_movement, rotation]", ContinuousActionSpace([2], low=cont_min, high=cont_max))]
 
     def get_joint_constraints(self, joint_name):
         return None
 
+    def action_writer(self):
+        buffer = self._action_buffer
+        if self._current_control_scheme == ControlSchemes.SPHERE_DISCRETE:
+            table = self._DISCRETE_ACTIONS
+
+            def write(action):
+                # A row of the table is a view, so nothing is allocated
+                index = action if np.ndim(action) == 0 else action[0]
+                buffer[:] = table[int(index)]
+        else:
+            def write(action):
+                np.copyto(buffer, action)
+        return write
+
     def __act__(self, action):
-        if self._current_control_scheme is ControlSchemes.SPHERE_CONTINUOUS:
-            np.copyto(self._action_buffer, action)
-        elif self._current_control_scheme is ControlSchemes.SPHERE_DISCRETE:
-            # Move forward .185 meters (to match initial release)
-            # Turn 10/-10 degrees (to match initial release)
-            actions = np.array([[.185, 0], [-.185, 0], [0, 10], [0, -10]])
-            to_act = np.array(actions[action, :])
-            np.copyto(self._action_buffer, to_act)
+        self._action_writer(action)
 
     def __repr__(self):
         return "SphereAgent " + self.name
@@ -384,18 +522,14 @@ class AndroidAgent(HolodeckAgent):
 
     agent_type = "Android"
 
-    @property
-    def control_schemes(self):
-        direct_min = [self.__MIN_TORQUE for _ in range(self.__JOINTS_VECTOR_SIZE)]
-        direct_max = [self.__MAX_TORQUE for _ in range(self.__JOINTS_VECTOR_SIZE)]
-        scaled_min = [-1 for _ in range(self.__JOINTS_VECTOR_SIZE)]
-        scaled_max = [1 for _ in range(self.__JOINTS_VECTOR_SIZE)]
-
+    @classmethod
+    def _make_control_schemes(cls):
         return [("[Raw Bone Torques] * 94",
-                 ContinuousActionSpace([self.__JOINTS_VECTOR_SIZE], low=direct_min, high=direct_max)),
+                 ContinuousActionSpace([cls.__JOINTS_VECTOR_SIZE], low=cls.__MIN_TORQUE,
+                                       high=cls.__MAX_TORQUE)),
                 ("[-1 to 1] * 94, where 1 is the maximum torque for a given "
                  "joint (based on mass of bone)",
-                 ContinuousActionSpace([self.__JOINTS_VECTOR_SIZE], low=scaled_min, high=scaled_max))]
+                 ContinuousActionSpace([cls.__JOINTS_VECTOR_SIZE], low=-1, high=1))]
 
     def __repr__(self):
         return "AndroidAgent " + self.name
@@ -507,24 +641,24 @@ class HandAgent(HolodeckAgent):
 
     agent_type = "HandAgent"
 
-    @property
-    def control_schemes(self):
-        raw_min = [self.__MIN_TORQUE for _ in range(self.__JOINTS_DOF)]
-        raw_max = [self.__MAX_TORQUE for _ in range(self.__JOINTS_DOF)]
-        joint_min = [-1 for _ in range(self.__JOINTS_DOF)]
-        joint_max = [1 for _ in range(self.__JOINTS_DOF)]
+    @classmethod
+    def _make_control_schemes(cls):
+        raw_min = [cls.__MIN_TORQUE for _ in range(cls.__JOINTS_DOF)]
+        raw_max = [cls.__MAX_TORQUE for _ in range(cls.__JOINTS_DOF)]
+        joint_min = [-1 for _ in range(cls.__JOINTS_DOF)]
+        joint_max = [1 for _ in range(cls.__JOINTS_DOF)]
 
-        scaled_min = [-1.0 if i < self.__JOINTS_DOF
-                      else self.__MIN_MOVEMENT_METERS for i in range(self.__JOINTS_AND_DIST)]
-        scaled_max = [1.0 if i < self.__JOINTS_DOF
-                      else self.__MAX_MOVEMENT_METERS for i in range(self.__JOINTS_AND_DIST)]
+        scaled_min = [-1.0 if i < cls.__JOINTS_DOF
+                      else cls.__MIN_MOVEMENT_METERS for i in range(cls.__JOINTS_AND_DIST)]
+        scaled_max = [1.0 if i < cls.__JOINTS_DOF
+                      else cls.__MAX_MOVEMENT_METERS for i in range(cls.__JOINTS_AND_DIST)]
 
-        return [("[Raw Bone Torques] * 23", ContinuousActionSpace([self.__JOINTS_DOF], low=raw_min, high=raw_max)),
+        return [("[Raw Bone Torques] * 23", ContinuousActionSpace([cls.__JOINTS_DOF], low=raw_min, high=raw_max)),
                 ("[-1 to 1] * 23, where 1 is the maximum torque for the given index"
                  "joint (based on mass of bone)",
-                 ContinuousActionSpace([self.__JOINTS_DOF], low=joint_min, high=joint_max)),
+                 ContinuousActionSpace([cls.__JOINTS_DOF], low=joint_min, high=joint_max)),
                 ("[-1 to 1] * 23, scaled torques, then [x, y, z] transform",
-                 ContinuousActionSpace([self.__JOINTS_AND_DIST], low=scaled_min, high=scaled_max))]
+                 ContinuousActionSpace([cls.__JOINTS_AND_DIST], low=scaled_min, high=scaled_max))]
 
     def __repr__(self):
         return "HandAgent " + self.name
@@ -593,10 +727,10 @@ class NavAgent(HolodeckAgent):
 
     agent_type = "NavAgent"
 
-    @property
-    def control_schemes(self):
-        low = [self.__MIN_DISTANCE for _ in range(3)]
-        high = [self.__MAX_DISTANCE for _ in range(3)]
+    @classmethod
+    def _make_control_schemes(cls):
+        low = [cls.__MIN_DISTANCE for _ in range(3)]
+        high = [cls.__MAX_DISTANCE for _ in range(3)]
         return [("[x_target, y_target, z_target]", ContinuousActionSpace([3], low=low, high=high))]
 
     def get_joint_constraints(self, joint_name):
@@ -605,9 +739,6 @@ class NavAgent(HolodeckAgent):
     def __repr__(self):
         return "NavAgent " + self.name
 
-    def __act__(self, action):
-        np.copyto(self._action_buffer, np.array(action))
-
 
 class TurtleAgent(HolodeckAgent):
     """A simple turtle bot.
@@ -631,10 +762,10 @@ class TurtleAgent(HolodeckAgent):
 
     agent_type = "TurtleAgent"
 
-    @property
-    def control_schemes(self):
-        low = [self.__MIN_THRUST, self.__MIN_YAW]
-        high = [self.__MAX_THRUST, self.__MAX_YAW]
+    @classmethod
+    def _make_control_schemes(cls):
+        low = [cls.__MIN_THRUST, cls.__MIN_YAW]
+        high = [cls.__MAX_THRUST, cls.__MAX_YAW]
         return [("[forward_force, rot_force]", ContinuousActionSpace([2], low=low, high=high))]
 
     def get_joint_constraints(self, joint_name):
@@ -643,10 +774,6 @@ class TurtleAgent(HolodeckAgent):
     def __repr__(self):
         return "TurtleAgent " + self.name
 
-    def __act__(self, action):
-        np.copyto(self._action_buffer, np.array(action))
-        np.copyto(self._action_buffer, action)
-
 
 class AgentDefinition:
     """Represents information needed to initialize agent.
@@ -0,0 +1,141 @@
+"""Module containing an asyncio interface to a Holodeck environment.
+
+Waiting for the engine blocks in a semaphore wait, which would stall an event loop. The
+:class:`AsyncHolodeckEnvironment` does that wait on a dedicated thread instead, so many
+environments can be driven from one event loop alongside other I/O.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from holodeck.exceptions import HolodeckException
+
+
+class AsyncHolodeckEnvironment:
+    """Wraps a :class:`~holodeck.environments.HolodeckEnvironment` with coroutine methods.
+
+    Starting a tick (writing actions and commands and releasing the engine) doesn't block, so it is
+    done on the event loop. Only the wait for the engine is handed to the environment's waiter
+    thread.
+
+    .. code-block:: python
+
+        env = AsyncHolodeckEnvironment(holodeck.make("UrbanCity-MaxDistance"))
+        state = await env.reset()
+        state, reward, terminal, _ = await env.step(action, timeout=5)
+
+    If a call times out or is cancelled, the tick keeps running on the engine. The next call waits
+    for it to finish before starting a new one, so the environment is never left in an
+    inconsistent state.
+
+    Args:
+        env (:class:`~holodeck.environments.HolodeckEnvironment`): The environment to wrap. It must
+            not be used directly anymore.
+        timeout (:obj:`float`, optional): Default number of seconds to wait for the engine. Defaults
+            to the timeout of the environment's client, which is 60 seconds for environments that
+            started their own world, and no timeout otherwise.
+    """
+
+    def __init__(self, env, timeout=None):
+        self.env = env
+        if timeout is None and env._client.sync_backend.should_timeout:
+            timeout = 60
+        self.timeout = timeout
+        self._waiter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="holodeck-waiter")
+        # The wait of a call that timed out or was cancelled, which the next call has to finish
+        self._outstanding = None
+
+    @property
+    def action_space(self):
+        """Gives the action space for the main agent.
+
+        Returns:
+            :class:`~holodeck.spaces.ActionSpace`: The action space for the main agent.
+        """
+        return self.env.action_space
+
+    async def reset(self, timeout=None):
+        """Resets the environment. See :meth:`~holodeck.environments.HolodeckEnvironment.reset`.
+
+        Args:
+            timeout (:obj:`float`, optional): Seconds to wait. Defaults to :attr:`timeout`.
+
+        Returns:
+            :obj:`dict`: The state after the reset.
+        """
+        await self._finish_outstanding()
+        return await self._wait(self.env.reset, timeout)
+
+    async def step(self, action, timeout=None):
+        """Supplies an action to the main agent and ticks the environment once.
+
+        Args:
+            action (:obj:`np.ndarray`): An action for the main agent to carry out on the next tick.
+            timeout (:obj:`float`, optional): Seconds to wait for the engine before raising
+                :obj:`TimeoutError`. Defaults to :attr:`timeout`.
+
+        Returns:
+            (:obj:`dict`, :obj:`float`, :obj:`bool`, info): The same 4tuple as
+            :meth:`~holodeck.environments.HolodeckEnvironment.step`.
+        """
+        await self._finish_outstanding()
+        self.env.step_async(action)
+        return await self._wait(self.env.step_wait, timeout)
+
+    async def tick(self, timeout=None):
+        """Ticks the environment once.
+
+        Args:
+            timeout (:obj:`float`, optional): Seconds to wait for the engine before raising
+                :obj:`TimeoutError`. Defaults to :attr:`timeout`.
+
+        Returns:
+            :obj:`dict`: The same state as :meth:`~holodeck.environments.HolodeckEnvironment.tick`.
+        """
+        await self._finish_outstanding()
+        self.env.tick_async()
+        return await self._wait(self.env.tick_wait, timeout)
+
+    def act(self, agent_name, action):
+        """Supplies an action to an agent, without ticking. See
+        :meth:`~holodeck.environments.HolodeckEnvironment.act`.
+        """
+        if self._outstanding is not None:
+            raise HolodeckException("A timed out or cancelled tick is still running")
+        self.env.act(agent_name, action)
+
+    async def close(self):
+        """Waits for a running tick, and closes the environment and its world."""
+        try:
+            await self._finish_outstanding()
+        finally:
+            self._waiter.shutdown(wait=False)
+            self.env.__on_exit__()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _wait(self, fn, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        future = asyncio.get_running_loop().run_in_executor(self._waiter, fn)
+        try:
+            # Shielded, so a timeout or cancellation doesn't abandon the wait on the engine
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self._outstanding = future
+            raise
+
+    async def _finish_outstanding(self):
+        if self._outstanding is None:
+            return
+        try:
+            await asyncio.shield(self._outstanding)
+        except asyncio.CancelledError:
+            # Still running, it is finished by the next call instead
+            raise
+        except Exception:  # pylint: disable=broad-except
+            # The failure was already reported to the call that timed out or was cancelled
+            pass
+        self._outstanding = None
@@ -5,9 +5,72 @@ worry about these.
 """
 
 
+import json
+import math
+from collections import deque
+
 import numpy as np
 from holodeck.exceptions import HolodeckException
 
+
+def _encode_number(number):
+    """Encodes a number as JSON.
+
+    Args:
+        number (:obj:`int`, :obj:`float`, :obj:`bool` or numpy scalar): The number.
+
+    Returns:
+        :obj:`bytes`: The JSON for the number.
+    """
+    if isinstance(number, np.generic):
+        number = number.item()
+    if isinstance(number, bool):
+        return b"1" if number else b"0"
+    if isinstance(number, int):
+        return str(number).encode()
+    number = float(number)
+    if not math.isfinite(number):
+        raise HolodeckException("Can't send {} to the engine, numbers must be finite".format(
+            number))
+    return repr(number).encode()
+
+
+def _encode_rows(rows):
+    """Encodes every row of a 2D array as the JSON of a list of number parameters, in bulk.
+
+    Args:
+        rows (:obj:`np.ndarray`): The numbers, one row per command.
+
+    Returns:
+        :obj:`list` of :obj:`bytes`: The JSON of the parameters of each row, without brackets.
+    """
+    rows = np.asarray(rows, dtype=np.float64)
+    if not np.isfinite(rows).all():
+        raise HolodeckException("Can't send non finite numbers to the engine, numbers must be "
+                                "finite")
+    # The engine reads 32 bit floats, which 9 significant digits represent exactly
+    template = ",".join(['{"value":%.9g}'] * rows.shape[1])
+    return [(template % tuple(row)).encode() for row in rows.tolist()]
+
+
+# The start of the JSON of each command type, up to the parameters
+_COMMAND_PREFIXES = dict()
+
+# Custom commands that set something about the world, and the settings they change as a side effect.
+# Weather changes the fog, and the day cycle keeps changing the hour
+_WORLD_SETTINGS = {
+    "SetWeather": (("CustomCommand", "SetFogDensity"),),
+    "SetFogDensity": (),
+    "SetHour": (),
+    "SetDayCycle": (("CustomCommand", "SetHour"),),
+}
+
+
+def _sensor_settings(agent_name, sensor_name):
+    """The keys of the settings of a sensor, which are lost when it is added or removed."""
+    return (("RGBCameraRate", agent_name, sensor_name), ("RotateSensor", agent_name, sensor_name))
+
+
 class CommandsGroup:
     """Represents a list of commands
 
@@ -31,8 +94,24 @@ class CommandsGroup:
              :obj:`str`: Json for commands array object and all of the commands inside the array.
 
         """
-        commands = ",".join(map(lambda x: x.to_json(), self._commands))
-        return "{\"commands\": [" + commands + "]}"
+        out = bytearray()
+        self.write_json(out)
+        return out.decode()
+
+    def write_json(self, out):
+        """Appends the JSON for the commands array object to a buffer.
+
+        Args:
+            out (:obj:`bytearray`): The buffer to append to.
+        """
+        out += b'{"commands":['
+        for command in self._commands:
+            command.write_json(out)
+            out += b","
+        if self._commands:
+            # Drop the trailing comma
+            del out[-1]
+        out += b"]}"
 
     def clear(self):
         """Clear the list of commands.
@@ -60,11 +139,27 @@ class Command:
     is significant, they are added to an ordered list. Ensure that you are adding parameters in
     the order the client expects them.
 
+    Commands that set something can be coalesced by the :class:`CommandCenter`:
+
+    - Queued commands with the same ``coalesce_key`` replace each other, only the last one is sent.
+    - An ``idempotent`` command isn't sent again while the same command is still in effect.
+    - ``invalidates`` lists the keys of settings that the command changes as a side effect, so
+      that they are sent again afterwards.
+
+    Attributes:
+        coalesce_key (:obj:`tuple`): The setting this command sets, or ``None`` if the command is
+            always sent.
+        idempotent (:obj:`bool`): If sending the same command again has no effect.
+        invalidates (:obj:`tuple`): Keys of settings this command changes.
+
     """
+    idempotent = False
 
     def __init__(self):
         self._parameters = []
         self._command_type = ""
+        self.coalesce_key = None
+        self.invalidates = ()
 
     def set_command_type(self, command_type):
         """Set the type of the command.
@@ -83,11 +178,13 @@ class Command:
                 A number or list of numbers to add to the parameters.
 
         """
+        if isinstance(number, np.ndarray):
+            number = number.ravel().tolist()
         if isinstance(number, list) or isinstance(number, tuple):
             for x in number:
                 self.add_number_parameters(x)
             return
-        self._parameters.append("{ \"value\": " + str(number) + " }")
+        self._parameters.append(b'{"value":' + _encode_number(number) + b"}")
 
     def add_string_parameters(self, string):
         """Add given string parameters to the internal list.
@@ -101,7 +198,7 @@ class Command:
             for x in string:
                 self.add_string_parameters(x)
             return
-        self._parameters.append("{ \"value\": \"" + string + "\" }")
+        self._parameters.append(b'{"value":' + json.dumps(str(string)).encode() + b"}")
 
     def to_json(self):
         """Converts to json.
@@ -110,14 +207,51 @@ class Command:
             :obj:`str`: This object as a json string.
 
         """
-        to_return = "{ \"type\": \"" + self._command_type +\
-            "\", \"params\": [" + ",".join(self._parameters) + "]}"
-        return to_return
+        out = bytearray()
+        self.write_json(out)
+        return out.decode()
+
+    def json_size(self):
+        """
+        Returns:
+            :obj:`int`: The number of bytes of the JSON of this object.
+        """
+        return len(self._json_prefix()) + sum(map(len, self._parameters)) + \
+            max(len(self._parameters) - 1, 0) + 2
+
+    def _json_prefix(self):
+        prefix = _COMMAND_PREFIXES.get(self._command_type)
+        if prefix is None:
+            prefix = b'{"type":' + json.dumps(self._command_type).encode() + b',"params":['
+            _COMMAND_PREFIXES[self._command_type] = prefix
+        return prefix
+
+    def write_json(self, out):
+        """Appends this object as JSON to a buffer.
+
+        The parameters are encoded when they are added, so this only joins them.
+
+        Args:
+            out (:obj:`bytearray`): The buffer to append to.
+        """
+        out += self._json_prefix()
+        out += b",".join(self._parameters)
+        out += b"]}"
 
 
 class CommandCenter:
     """Manages pending commands to send to the client (the engine).
 
+    The engine reads at most :attr:`max_buffer` bytes of commands per tick. When more are queued,
+    they are sent over as many consecutive ticks as needed, in the order they were queued. Commands
+    queued together with :meth:`enqueue_commands` and ``atomic=True`` are always sent in the same
+    tick.
+
+    Commands that set something (see :class:`Command`) are coalesced: a queued command is dropped
+    when another one for the same setting is queued after it, and an idempotent command is dropped
+    when the same command was the last one sent for its setting. The settings that were sent are
+    forgotten with :meth:`forget_settings`, which the environment does when it is reset.
+
     Args:
         client (:class:`~holodeck.holodeckclient.HolodeckClient`): Client to send commands to
 
@@ -130,26 +264,86 @@ class CommandCenter:
         # This is the size of the command buffer that Holodeck expects/will read.
         self.max_buffer = 1048576
         self._command_buffer_ptr = self._client.malloc("command_buffer", [self.max_buffer], np.byte)
-        self._commands = CommandsGroup()
-        self._should_write_to_command_buffer = False
+        # Each entry is a list of commands that must be sent in the same tick. Coalesced commands
+        # are emptied rather than removed from the middle of the queue
+        self._queue = deque()
+        self._queued_commands = 0
+        # Setting key to the entry of the queue that sets it
+        self._pending = dict()
+        # Setting key to the parameters of the last idempotent command sent for it
+        self._applied = dict()
+        # Reused for every tick, so encoding doesn't allocate once it has grown to the usual size
+        self._encode_buffer = bytearray()
 
     def clear(self):
         """Clears pending commands
 
         """
-        self._commands.clear()
+        self._queue.clear()
+        self._queued_commands = 0
+        self._pending.clear()
+
+    def forget_settings(self):
+        """Forgets which settings were sent, so that every idempotent command is sent again. Must
+        be called when the world resets its settings, e.g. when the level is reloaded.
+
+        """
+        self._applied.clear()
 
     def handle_buffer(self):
-        """Writes the list of commands into the command buffer, if needed.
+        """Writes the queued commands into the command buffer, if there are any.
 
-        Checks if we should write to the command buffer, writes all of the queued commands to the
-        buffer, and then clears the contents of the self._commands list
+        As many commands as fit are written, in order. The rest stay queued for the next tick.
 
+        Raises:
+            HolodeckException: If a single command, or a group of atomic commands, is too large to
+                ever fit in the buffer. It is dropped from the queue.
         """
-        if self._should_write_to_command_buffer:
-            self._write_to_command_buffer(self._commands.to_json())
-            self._should_write_to_command_buffer = False
-            self._commands.clear()
+        if not self._queue:
+            return
+
+        out = self._encode_buffer
+        # Truncating keeps the allocation of the bytearray
+        del out[:]
+        out += b'{"commands":['
+        # Room for the closing brackets and the 0 the engine expects at the end
+        limit = self.max_buffer - 3
+        sent = 0
+        while self._queue:
+            unit = self._queue[0]
+            if not unit:
+                self._queue.popleft()
+                continue
+            mark = len(out)
+            for command in unit:
+                command.write_json(out)
+                out += b","
+            # The trailing comma is dropped, so it doesn't count
+            if len(out) - 1 > limit:
+                del out[mark:]
+                if sent == 0:
+                    self._queue.popleft()
+                    self._queued_commands -= len(unit)
+                    for command in unit:
+                        if self._pending.get(command.coalesce_key) is unit:
+                            del self._pending[command.coalesce_key]
+                    raise HolodeckException(
+                        "Error: {} command(s) that must be sent together exceed the command "
+                        "buffer size of {} bytes".format(len(unit), self.max_buffer))
+                break
+            self._queue.popleft()
+            self._queued_commands -= len(unit)
+            sent += len(unit)
+            for command in unit:
+                self._sent(command, unit)
+
+        if sent == 0:
+            # Only coalesced commands were left
+            return
+        # Drop the trailing comma
+        del out[-1]
+        out += b"]}"
+        self._write_to_command_buffer(out)
 
     def enqueue_command(self, command_to_send):
         """Adds command to outgoing queue.
@@ -158,8 +352,68 @@ class CommandCenter:
             command_to_send (:class:`Command`): Command to add to queue
 
         """
-        self._should_write_to_command_buffer = True
-        self._commands.add_command(command_to_send)
+        self._invalidate(command_to_send)
+        key = command_to_send.coalesce_key
+        if key is not None:
+            pending = self._pending.pop(key, None)
+            if pending is not None:
+                # Replaced by this command
+                self._queued_commands -= len(pending)
+                pending.clear()
+            if command_to_send.idempotent and \
+                    self._applied.get(key) == command_to_send._parameters:
+                # Already in effect
+                return
+
+        unit = [command_to_send]
+        self._queue.append(unit)
+        self._queued_commands += 1
+        if key is not None:
+            self._pending[key] = unit
+
+    def enqueue_commands(self, commands, atomic=False):
+        """Adds several commands to the outgoing queue.
+
+        Args:
+            commands (:obj:`list` of :class:`Command`): Commands to add to the queue, in order.
+            atomic (:obj:`bool`, optional): If the commands must be sent in the same tick. Defaults
+                to False.
+
+        """
+        commands = list(commands)
+        if not atomic:
+            for command in commands:
+                self.enqueue_command(command)
+            return
+        if not commands:
+            return
+        # Atomic groups are sent as they are, without coalescing
+        for command in commands:
+            self._invalidate(command)
+            if command.coalesce_key is not None:
+                self._pending.pop(command.coalesce_key, None)
+        self._queue.append(commands)
+        self._queued_commands += len(commands)
+
+    def _invalidate(self, command):
+        for key in command.invalidates:
+            self._applied.pop(key, None)
+            # A queued command for the setting has to be sent before this one
+            self._pending.pop(key, None)
+
+    def _sent(self, command, unit):
+        # Settings sent before this command in the same buffer are overridden by it
+        for invalidated in command.invalidates:
+            self._applied.pop(invalidated, None)
+        key = command.coalesce_key
+        if key is None:
+            return
+        if self._pending.get(key) is unit:
+            del self._pending[key]
+        if command.idempotent:
+            self._applied[key] = command._parameters
+        else:
+            self._applied.pop(key, None)
 
     def _write_to_command_buffer(self, to_write):
         """Write input to the command buffer.
@@ -167,23 +421,43 @@ class CommandCenter:
         Reformat input string to the correct format.
 
         Args:
-            to_write (:class:`str`): The string to write to the command buffer.
+            to_write (:class:`str` or :obj:`bytearray`): The JSON to write to the command buffer.
 
         """
-        np.copyto(self._command_bool_ptr, True)
-        to_write += '0'  # The gason JSON parser in holodeck expects a 0 at the end of the file.
-        input_bytes = str.encode(to_write)
-        if len(input_bytes) > self.max_buffer:
+        if isinstance(to_write, str):
+            to_write = bytearray(to_write.encode())
+        # The gason JSON parser in holodeck expects a 0 at the end of the file.
+        length = len(to_write) + 1
+        if length > self.max_buffer:
             raise HolodeckException("Error: Command length exceeds buffer size")
-        for index, val in enumerate(input_bytes):
-            self._command_buffer_ptr[index] = val
+        self._command_buffer_ptr[:length - 1] = np.frombuffer(to_write, dtype=np.byte)
+        self._command_buffer_ptr[length - 1] = ord("0")
+        np.copyto(self._command_bool_ptr, True)
 
     @property
     def queue_size(self):
         """
         Returns:
             int: Size of commands queue"""
-        return self._commands.size
+        return self._queued_commands
+
+    @property
+    def backlog_ticks(self):
+        """The number of ticks it takes to send every queued command.
+
+        Returns:
+            int: The number of ticks, 0 if nothing is queued.
+        """
+        ticks = 0
+        # Bytes used in the current tick, starting with the brackets and the trailing 0
+        used = self.max_buffer
+        for unit in self._queue:
+            size = sum(command.json_size() + 1 for command in unit)
+            if used + size > self.max_buffer:
+                ticks += 1
+                used = len(b'{"commands":[]}0')
+            used += size
+        return ticks
 
 
 class SpawnAgentCommand(Command):
@@ -278,6 +552,40 @@ class DebugDrawCommand(Command):
         self.add_number_parameters(color)
         self.add_number_parameters(thickness)
 
+    @classmethod
+    def batch(cls, draw_type, starts, ends, colors, thickness):
+        """Creates one command per row of arrays, encoding all of their parameters at once.
+
+        Args:
+            draw_type (:obj:`int`): The type of object to draw, see :class:`DebugDrawCommand`.
+            starts (:obj:`np.ndarray`): ``[N, 3]`` start locations.
+            ends (:obj:`np.ndarray`): ``[N, 3]`` end locations.
+            colors (:obj:`np.ndarray`): ``[N, 3]`` colors, or a single ``[r, g, b]`` color.
+            thickness (:obj:`np.ndarray` or :obj:`float`): ``[N]`` thicknesses, or a single one.
+
+        Returns:
+            :obj:`list` of :class:`DebugDrawCommand`: The commands.
+        """
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 3)
+        count = len(starts)
+        rows = np.empty((count, 11))
+        rows[:, 0] = draw_type
+        rows[:, 1:4] = starts
+        rows[:, 4:7] = np.broadcast_to(np.asarray(ends, dtype=np.float64).reshape(-1, 3),
+                                       (count, 3))
+        rows[:, 7:10] = np.broadcast_to(np.asarray(colors, dtype=np.float64).reshape(-1, 3),
+                                        (count, 3))
+        rows[:, 10] = np.broadcast_to(np.asarray(thickness, dtype=np.float64).ravel(), (count,))
+
+        commands = []
+        for parameters in _encode_rows(rows):
+            command = cls.__new__(cls)
+            Command.__init__(command)
+            command._command_type = "DebugDraw"
+            command._parameters = [parameters]
+            commands.append(command)
+        return commands
+
 
 class TeleportCameraCommand(Command):
     """Move the viewport camera (agent follower)
@@ -292,6 +600,7 @@ class TeleportCameraCommand(Command):
     def __init__(self, location, rotation):
         Command.__init__(self)
         self._command_type = "TeleportCamera"
+        self.coalesce_key = ("TeleportCamera",)
         self.add_number_parameters(location)
         self.add_number_parameters(rotation)
 
@@ -306,6 +615,8 @@ class AddSensorCommand(Command):
     def __init__(self, sensor_definition):
         Command.__init__(self)
         self._command_type = "AddSensor"
+        self.invalidates = _sensor_settings(sensor_definition.agent_name,
+                                            sensor_definition.sensor_name)
         self.add_string_parameters(sensor_definition.agent_name)
         self.add_string_parameters(sensor_definition.sensor_name)
         self.add_string_parameters(sensor_definition.type.sensor_type)
@@ -332,6 +643,7 @@ class RemoveSensorCommand(Command):
     def __init__(self, agent, sensor):
         Command.__init__(self)
         self._command_type = "RemoveSensor"
+        self.invalidates = _sensor_settings(agent, sensor)
         self.add_string_parameters(agent)
         self.add_string_parameters(sensor)
 
@@ -347,6 +659,7 @@ class RotateSensorCommand(Command):
     def __init__(self, agent, sensor, rotation):
         Command.__init__(self)
         self._command_type = "RotateSensor"
+        self.coalesce_key = ("RotateSensor", agent, sensor)
         self.add_string_parameters(agent)
         self.add_string_parameters(sensor)
         self.add_number_parameters(rotation)
@@ -360,9 +673,12 @@ class RenderViewportCommand(Command):
         render_viewport (:obj:`bool`): If viewport should be rendered
 
     """
+    idempotent = True
+
     def __init__(self, render_viewport):
         Command.__init__(self)
         self.set_command_type("RenderViewport")
+        self.coalesce_key = ("RenderViewport",)
         self.add_number_parameters(int(bool(render_viewport)))
 
 
@@ -375,9 +691,12 @@ class RGBCameraRateCommand(Command):
         ticks_per_capture (:obj:`int`): number of ticks between captures
 
     """
+    idempotent = True
+
     def __init__(self, agent_name, sensor_name, ticks_per_capture):
         Command.__init__(self)
         self._command_type = "RGBCameraRate"
+        self.coalesce_key = ("RGBCameraRate", agent_name, sensor_name)
         self.add_string_parameters(agent_name)
         self.add_string_parameters(sensor_name)
         self.add_number_parameters(ticks_per_capture)
@@ -390,9 +709,12 @@ class RenderQualityCommand(Command):
         render_quality (int): 0 = low, 1 = medium, 3 = high, 3 = epic
 
     """
+    idempotent = True
+
     def __init__(self, render_quality):
         Command.__init__(self)
         self.set_command_type("AdjustRenderQuality")
+        self.coalesce_key = ("AdjustRenderQuality",)
         self.add_number_parameters(int(render_quality))
 
 
@@ -414,6 +736,45 @@ class CustomCommand(Command):
 
         Command.__init__(self)
         self.set_command_type("CustomCommand")
+        if name in _WORLD_SETTINGS:
+            self.coalesce_key = ("CustomCommand", name)
+            # A running day cycle moves the hour, so setting it again is never a no-op
+            self.idempotent = name not in ("SetDayCycle", "SetHour")
+            self.invalidates = _WORLD_SETTINGS[name]
         self.add_string_parameters(name)
         self.add_number_parameters(num_params)
         self.add_string_parameters(string_params)
+
+    @classmethod
+    def batch(cls, name, num_params, string_params=None):
+        """Creates one command per row of parameters, encoding all of their numbers at once.
+
+        Args:
+            name (:obj:`str`): The name of the commands, ex "SpawnProp"
+            num_params (:obj:`np.ndarray`): ``[N, K]`` number parameters of the commands.
+            string_params (:obj:`list` of :obj:`list` of :obj:`str`, optional): The ``N`` lists of
+                string parameters of the commands.
+
+        Returns:
+            :obj:`list` of :class:`CustomCommand`: The commands.
+        """
+        numbers = _encode_rows(num_params)
+        if string_params is None:
+            string_params = [()] * len(numbers)
+        # Scenes repeat the same few strings, so each is only escaped once
+        encoded = dict()
+
+        def encode(string):
+            fragment = encoded.get(string)
+            if fragment is None:
+                fragment = b'{"value":' + json.dumps(str(string)).encode() + b"}"
+                encoded[string] = fragment
+            return fragment
+
+        commands = []
+        for row, strings in zip(numbers, string_params):
+            command = cls(name)
+            command._parameters.append(row)
+            command._parameters.extend(map(encode, strings))
+            commands.append(command)
+        return commands
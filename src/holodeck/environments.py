@@ -6,6 +6,8 @@ It specifies an environment, which contains a number of agents, and the interfac
 with the agents.
 """
 import atexit
+import itertools
+import json
 import os
 import random
 import subprocess
@@ -19,7 +21,10 @@ from holodeck.command import CommandCenter, SpawnAgentCommand, RGBCameraRateComm
 
 from holodeck.exceptions import HolodeckException
 from holodeck.holodeckclient import HolodeckClient
+from holodeck.shmem import sweep_orphaned_segments
+from holodeck.state import LazyState
 from holodeck.agents import AgentDefinition, SensorDefinition, AgentFactory
+from holodeck.sensors import RGBCamera, ViewportCapture
 from holodeck.weather import WeatherController
 
 
@@ -59,17 +64,44 @@ class HolodeckEnvironment:
         ticks_per_sec (:obj:`int`, optional):
             Number of frame ticks per unreal second. Defaults to 30.
 
-        copy_state (:obj:`bool`, optional):
-            If the state should be copied or returned as a reference. Defaults to True.
+        copy_state (:obj:`bool` or :obj:`str`, optional):
+            If the state should be copied or returned as a reference. Defaults to True. With
+            ``"lazy"``, a :class:`~holodeck.state.LazyState` is returned, which only copies the
+            sensors that are read. The sensors that are still unread when the next tick starts
+            are dropped from it.
 
         scenario (:obj:`dict`):
             The scenario that is to be loaded. See :ref:`scenario-files` for the schema.
 
+        shmem_arena (:obj:`bool`, optional):
+            If all shared memory buffers should be allocated from a single
+            :class:`~holodeck.shmem.ShmemArena` instead of one file per buffer. Defaults to False.
+
+        sensor_slots (:obj:`int`, optional):
+            Number of rotating slots for each sensor buffer. With ``copy_state=False`` and ``N``
+            slots, the arrays returned for a tick stay intact for ``N - 1`` more ticks, so they can
+            be kept without copying. Defaults to 1.
+
+        sync_backend (:obj:`str`, optional):
+            The :mod:`holodeck.sync` backend used for the tick handshake with the engine,
+            ``"semaphore"`` or ``"futex"``. Defaults to ``"semaphore"``.
+
+        schedule_depth (:obj:`int`, optional):
+            Maximum number of ticks :meth:`step_schedule` can run for a single handshake with the
+            engine. Defaults to 1, which disables action schedules.
+
+        draw_budget (:obj:`int`, optional):
+            Maximum number of bytes of debug drawing commands queued per tick by
+            :meth:`draw_lines`, :meth:`draw_points` and :meth:`draw_polyline`. Larger drawings are
+            decimated to fit. Defaults to no limit.
+
     """
 
     def __init__(self, agent_definitions=None, binary_path=None, window_size=None,
                  start_world=True, uuid="", gl_version=4, verbose=False, pre_start_steps=2,
-                 show_viewport=True, ticks_per_sec=30, copy_state=True, scenario=None):
+                 show_viewport=True, ticks_per_sec=30, copy_state=True, scenario=None,
+                 shmem_arena=False, sensor_slots=1, sync_backend="semaphore", schedule_depth=1,
+                 draw_budget=None):
 
         if agent_definitions is None:
             agent_definitions = []
@@ -89,8 +121,23 @@ class HolodeckEnvironment:
         self._uuid = uuid
         self._pre_start_steps = pre_start_steps
         self._copy_state = copy_state
+        # Compiled by reset(), and again whenever the buffers change, see _StepPlan
+        self._plan = None
+        # Lazy states that still point at the sensor buffers, and must be copied before the
+        # buffers are written again
+        self._lazy_states = []
+        self._bytes_copied = 0
+        # Camera frames of the previous tick, kept when pooling frames in step()
+        self._frame_scratch = dict()
         self._ticks_per_sec = ticks_per_sec
         self._scenario = scenario
+        self._shmem_arena = shmem_arena
+        self._sensor_slots = sensor_slots
+        self._sync_backend = sync_backend
+        self._schedule_depth = schedule_depth
+        self._draw_budget = draw_budget
+        # Bytes of debug drawing commands queued since the last tick
+        self._draw_bytes = 0
         self._initial_agent_defs = agent_definitions
         self._spawned_agent_defs = []
 
@@ -98,6 +145,7 @@ class HolodeckEnvironment:
         if start_world:
             world_key = self._scenario["world"]
             if os.name == "posix":
+                sweep_orphaned_segments()
                 self.__linux_start_process__(binary_path, world_key, gl_version, verbose=verbose,
                                              show_viewport=show_viewport)
             elif os.name == "nt":
@@ -106,7 +154,9 @@ class HolodeckEnvironment:
                 raise HolodeckException("Unknown platform: " + os.name)
 
         # Initialize Client
-        self._client = HolodeckClient(self._uuid, start_world)
+        self._client = HolodeckClient(self._uuid, start_world, use_arena=shmem_arena,
+                                      sensor_slots=sensor_slots, sync_backend=sync_backend,
+                                      schedule_depth=schedule_depth)
         self._command_center = CommandCenter(self._client)
         self._client.command_center = self._command_center
         self._reset_ptr = self._client.malloc("RESET", [1], np.bool)
@@ -135,6 +185,8 @@ class HolodeckEnvironment:
 
         # Flag indicates if the user has called .reset() before .tick() and .step()
         self._initial_reset = False
+        # Flag indicates a tick was started with step_async() or tick_async() and not yet waited on
+        self._tick_pending = False
         self.reset()
 
     @property
@@ -146,6 +198,15 @@ class HolodeckEnvironment:
         """
         return self._agent.action_space
 
+    @property
+    def bytes_copied(self):
+        """Gives the number of bytes of sensor data copied into the returned states so far.
+
+        Returns:
+            :obj:`int`: The number of bytes.
+        """
+        return self._bytes_copied
+
     def info(self):
         """Returns a string with specific information about the environment.
         This information includes which agents are in the environment and which sensors they have.
@@ -277,6 +338,9 @@ class HolodeckEnvironment:
 
             For multi-agent environment, returns the same as `tick`.
         """
+        if self._tick_pending:
+            raise HolodeckException("You must call .step_wait() or .tick_wait() before .reset()")
+
         # Reset level
         self._initial_reset = True
         self._reset_ptr[0] = True
@@ -290,8 +354,14 @@ class HolodeckEnvironment:
             print("Warning: Reset called before all commands could be sent. Discarding",
                   self._command_center.queue_size, "commands.")
         self._command_center.clear()
+        # The level was reloaded, so the world settings are back to their defaults
+        self._command_center.forget_settings()
 
-        # Load agents
+        # Load agents. The old agents' shared memory goes back to the client's pool, where the new
+        # agents and sensors pick it up again
+        for agent in self.agents.values():
+            agent.free()
+        self._agent = None
         self._spawned_agent_defs = []
         self.agents = dict()
         self._state_dict = dict()
@@ -307,19 +377,34 @@ class HolodeckEnvironment:
         else:
             self._default_state_fn = self._get_full_state
 
+        self._plan = _StepPlan(self)
+
         for _ in range(self._pre_start_steps + 1):
             self.tick()
 
         return self._default_state_fn()
 
-    def step(self, action, ticks=1):
+    def step(self, action, ticks=1, out=None, frame_skip=False, pool_frames=None):
         """Supplies an action to the main agent and tells the environment to tick once.
         Primary mode of interaction for single agent environments.
 
         Args:
             action (:obj:`np.ndarray`): An action for the main agent to carry out on the next tick.
             ticks (:obj:`int`): Number of times to step the environment wiht this action.
-                If ticks > 1, this function returns the last state generated.
+                If ticks > 1, this function returns the last state generated. The state is only
+                built for the last tick.
+            out (:obj:`dict`, optional): A state to copy the sensor data into, instead of creating
+                a new one, e.g. one created with :meth:`allocate_state`. It is returned as the
+                state. Regardless of ``copy_state``, this is the only copy that is made.
+            frame_skip (:obj:`bool`, optional): If the reward should be summed over the ``ticks``,
+                instead of taken from the last one, and stepping should stop early once a terminal
+                is reported. Defaults to False.
+            pool_frames (:obj:`str`, optional): How to combine the camera frames
+                (:class:`~holodeck.sensors.RGBCamera` and
+                :class:`~holodeck.sensors.ViewportCapture`) of the main agent from the last two
+                ticks. ``"max"`` takes their elementwise maximum, and ``"stack"`` stacks them along
+                a new first dimension, previous frame first. Defaults to None, which only returns
+                the frames of the last tick.
 
         Returns:
             (:obj:`dict`, :obj:`float`, :obj:`bool`, info): A 4tuple:
@@ -329,21 +414,186 @@ class HolodeckEnvironment:
                 - Terminal: The bool terminal signal returned by the environment.
                 - Info: Any additional info, depending on the world. Defaults to None.
         """
-        if not self._initial_reset:
-            raise HolodeckException("You must call .reset() before .step()")
+        self._check_can_tick("step")
+        if pool_frames not in (None, "max", "stack"):
+            raise HolodeckException("Unknown pool_frames {}, expected \"max\" or "
+                                    "\"stack\"".format(pool_frames))
+        if pool_frames == "stack" and out is not None:
+            raise HolodeckException("pool_frames=\"stack\" can't be used with out")
+
+        frames = self._camera_frames() if pool_frames is not None else dict()
+        previous_frames = None
+        total_reward = None
+        for i in range(ticks):
+            if frames and i > 0:
+                previous_frames = self._save_frames(frames)
+            self.step_async(action)
+            self._finish_tick("step")
+
+            # Only the reward and terminal are needed from the intermediate ticks
+            reward, terminal = self._get_reward_terminal()
+            if reward is not None:
+                total_reward = reward if total_reward is None else total_reward + reward
+            if frame_skip and terminal:
+                break
 
-        for _ in range(ticks):
-            if self._agent is not None:
-                self._agent.act(action)
+        state = self._get_state(out)
+        if frames:
+            state = self._pool_frames(state, out, pool_frames, previous_frames)
+        return state, total_reward if frame_skip else reward, terminal, None
 
-            self._command_center.handle_buffer()
-            self._client.release()
-            self._client.acquire()
+    def step_schedule(self, actions):
+        """Supplies one action per tick to the main agent, and runs all of those ticks in a single
+        handshake with the engine.
 
-            reward, terminal = self._get_reward_terminal()
-            last_state = self._default_state_fn(), reward, terminal, None
+        The other agents repeat their current action every tick. The engine stops early after a
+        tick that reports a terminal. Instead of the state of the last tick, the state holds the
+        trace of every low dimensional sensor over the ticks that were run, with one row per tick.
+        Camera sensors (:class:`~holodeck.sensors.RGBCamera` and
+        :class:`~holodeck.sensors.ViewportCapture`) aren't traced and hold their last frame.
+
+        The environment must have been created with a ``schedule_depth`` of at least
+        ``len(actions)``.
+
+        Args:
+            actions (:obj:`np.ndarray` or :obj:`list`): The actions for the main agent, one per
+                tick. Each is interpreted like the action of :meth:`step`.
 
-        return last_state
+        Returns:
+            (:obj:`dict`, :obj:`np.ndarray`, :obj:`np.ndarray`, info): A 4tuple:
+                - State: Dictionary from sensor name to the trace of the sensor, of shape
+                    ``(ticks,) + data_shape``, where ``ticks`` is the number of ticks that ran.
+                - Rewards: The reward of every tick, or None if there is no task sensor.
+                - Terminals: The terminal of every tick, or None if there is no task sensor.
+                - Info: Any additional info, depending on the world. Defaults to None.
+        """
+        self._check_can_tick("step_schedule")
+        if self._client.schedule_depth < 2:
+            raise HolodeckException("step_schedule needs an environment created with a "
+                                    "schedule_depth greater than one")
+        if self._agent is None:
+            raise HolodeckException("step_schedule needs a main agent")
+
+        num_ticks = self._agent.act_schedule(actions)
+        for agent in self.agents.values():
+            if agent is not self._agent:
+                agent.hold_schedule(num_ticks)
+
+        header = self._client._schedule_header
+        header[0] = num_ticks
+        header[1] = 0
+        try:
+            self._start_tick()
+            self._finish_tick("step_schedule")
+        finally:
+            # A later handshake is a single tick again
+            header[0] = 0
+        completed = int(header[1])
+
+        def trace_agent(agent):
+            return {name: sensor.sensor_trace[:completed] if sensor.sensor_trace is not None
+                    else self._state_dict[agent.name][name]
+                    for name, sensor in agent.sensors.items()}
+
+        if self.num_agents == 1:
+            state = self._copy_state_dict(trace_agent(self._agent))
+        else:
+            state = self._copy_state_dict({name: trace_agent(agent)
+                                           for name, agent in self.agents.items()})
+
+        rewards = None
+        terminals = None
+        for name, sensor in self._agent.sensors.items():
+            if "Task" in name and sensor.sensor_trace is not None:
+                rewards = np.copy(sensor.sensor_trace[:completed, 0])
+                terminals = sensor.sensor_trace[:completed, 1] == 1
+        return state, rewards, terminals, None
+
+    def _camera_frames(self):
+        """Gives the camera sensors of the main agent whose frames can be pooled."""
+        if self._agent is None:
+            return dict()
+        return {name: sensor for name, sensor in self._agent.sensors.items()
+                if isinstance(sensor, (RGBCamera, ViewportCapture))}
+
+    def _save_frames(self, frames):
+        """Copies the current camera frames into scratch buffers that are reused across steps."""
+        saved = dict()
+        for name, sensor in frames.items():
+            scratch = self._frame_scratch.get(name)
+            if scratch is None or scratch.shape != sensor.sensor_data.shape:
+                scratch = np.empty_like(sensor.sensor_data)
+                self._frame_scratch[name] = scratch
+            np.copyto(scratch, sensor.sensor_data)
+            saved[name] = scratch
+        return saved
+
+    def _pool_frames(self, state, out, pool_frames, previous_frames):
+        if out is None and self._copy_state is False:
+            # The state is the environment's own dictionary, which must keep pointing at the
+            # sensor buffers, so the pooled frames go into a new one
+            state = dict(state)
+            if self.num_agents > 1:
+                state[self._agent.name] = dict(state[self._agent.name])
+        agent_state = state if self.num_agents == 1 else state[self._agent.name]
+        for name in self._camera_frames():
+            current = agent_state[name]
+            # With a single tick, the last frame is the only one there is
+            previous = current if previous_frames is None else previous_frames[name]
+            if pool_frames == "stack":
+                agent_state[name] = np.stack([previous, current])
+            elif out is not None:
+                # The frame was copied into out, which belongs to the caller
+                np.maximum(previous, current, out=current)
+            else:
+                agent_state[name] = np.maximum(previous, current)
+        return state
+
+    def step_async(self, action):
+        """Supplies an action to the main agent and starts the next tick, without waiting for the
+        engine to finish it.
+
+        Must be followed by a call to :meth:`step_wait`, which waits for the tick and returns its
+        result. In between, the engine is simulating, so the Python process is free to do other
+        work, such as computing the next action from the previous observation.
+
+        While a tick is pending:
+
+        - States returned with ``copy_state=True`` are copies and are safe to read. States
+          returned with ``copy_state="lazy"`` keep the sensors that were read before the tick
+          started, the others are dropped from them.
+        - States returned with ``copy_state=False`` point at the sensor buffers the engine is
+          writing to, and must not be read until :meth:`step_wait` returns, unless the environment
+          was created with ``sensor_slots`` of 2 or more. Then the engine writes the pending tick
+          into another slot, and the previous state stays intact.
+        - :meth:`act`, :meth:`step`, :meth:`tick` and :meth:`reset` must not be called. Commands
+          (e.g. :meth:`draw_line`) may be issued, they are sent with the following tick.
+
+        Args:
+            action (:obj:`np.ndarray`): An action for the main agent to carry out on the next tick.
+        """
+        self._check_can_tick("step_async")
+
+        if self._agent is not None:
+            self._agent.act(action)
+        self._start_tick()
+
+    def step_wait(self, out=None):
+        """Waits for the tick started by :meth:`step_async` to finish.
+
+        If waiting times out, the tick is no longer considered pending, and the state of the engine
+        is unknown. The environment should be reset or closed.
+
+        Args:
+            out (:obj:`dict`, optional): A state to copy the sensor data into, see :meth:`step`.
+
+        Returns:
+            (:obj:`dict`, :obj:`float`, :obj:`bool`, info): The same 4tuple as :meth:`step`.
+        """
+        self._finish_tick("step_wait")
+
+        reward, terminal = self._get_reward_terminal()
+        return self._get_state(out), reward, terminal, None
 
     def act(self, agent_name, action):
         """Supplies an action to a particular agent, but doesn't tick the environment.
@@ -356,8 +606,37 @@ class HolodeckEnvironment:
                 action will be applied every time `tick` is called, until a new action is supplied
                 with another call to act.
         """
+        if self._tick_pending:
+            raise HolodeckException("You must call .step_wait() or .tick_wait() before .act()")
         self.agents[agent_name].act(action)
 
+    def act_all(self, actions):
+        """Supplies an action to every agent at once, but doesn't tick the environment. Like
+        calling :meth:`act` for each agent, for environments with many agents.
+
+        Args:
+            actions (:obj:`dict` or :obj:`np.ndarray`): Either a dictionary of actions by agent
+                name, for some or all of the agents, or an ``[n_agents, dim]`` array with a row for
+                each agent, in the order of :attr:`agents`. Rows shorter than an agent's action are
+                padded with zeros, so agents with different action sizes are better given a
+                dictionary.
+        """
+        if self._tick_pending:
+            raise HolodeckException("You must call .step_wait() or .tick_wait() before "
+                                    ".act_all()")
+        if isinstance(actions, dict):
+            for agent_name, action in actions.items():
+                self.agents[agent_name].act(action)
+            return
+
+        actions = np.asarray(actions)
+        if len(actions) != len(self.agents):
+            raise HolodeckException("Expected an action for each of the {} agents, got {}".format(
+                len(self.agents), len(actions)))
+        # Each row is a view, written straight into the agent's action buffer
+        for agent, action in zip(self.agents.values(), actions):
+            agent.act(action)
+
     def get_joint_constraints(self, agent_name, joint_name):
         """Returns the corresponding swing1, swing2 and twist limit values for the
                 specified agent and joint. Will return None if the joint does not exist for the agent.
@@ -367,33 +646,148 @@ class HolodeckEnvironment:
         """
         return self.agents[agent_name].get_joint_constraints(joint_name)
 
-    def tick(self, num_ticks=1):
+    def tick(self, num_ticks=1, out=None):
         """Ticks the environment once. Normally used for multi-agent environments.
         Args:
             num_ticks (:obj:`int`): Number of ticks to perform. Defaults to 1. 
+            out (:obj:`dict`, optional): A state to copy the sensor data into, see :meth:`step`.
         Returns:
             :obj:`dict`: A dictionary from agent name to its full state. The full state is another
                 dictionary from :obj:`holodeck.sensors.Sensors` enum to np.ndarray, containing the
                 sensors information for each sensor. The sensors always include the reward and
                 terminal sensors.
 
-                Will return the state from the last tick executed.
+                Will return the state from the last tick executed, it is only built for that
+                tick.
         """
-        if not self._initial_reset:
-            raise HolodeckException("You must call .reset() before .tick()")
+        self._check_can_tick("tick")
 
         for _ in range(num_ticks):
-            self._command_center.handle_buffer()
+            self._start_tick()
+            self._finish_tick("tick")
 
-            self._client.release()
-            self._client.acquire()
-            state = self._default_state_fn()
+        # The state is only built for the last tick
+        return self._get_state(out)
 
-        return state
+    def tick_async(self):
+        """Starts the next tick without waiting for the engine to finish it.
+
+        Must be followed by a call to :meth:`tick_wait`. See :meth:`step_async` for what is safe to
+        do while the tick is pending.
+        """
+        self._check_can_tick("tick_async")
+        self._start_tick()
+
+    def tick_wait(self, out=None):
+        """Waits for the tick started by :meth:`tick_async` to finish.
+
+        Args:
+            out (:obj:`dict`, optional): A state to copy the sensor data into, see :meth:`step`.
+
+        Returns:
+            :obj:`dict`: The same state as :meth:`tick`.
+        """
+        self._finish_tick("tick_wait")
+        return self._get_state(out)
+
+    def allocate_state(self):
+        """Allocates a state with the current sensor layout, to be passed as ``out`` to
+        :meth:`step` or :meth:`tick`.
+
+        The state has the same structure as the state returned by :meth:`step` (or :meth:`tick` for
+        multi-agent environments), with an empty array of each sensor's ``data_shape`` and
+        ``dtype``. It needs to be allocated again after agents or sensors are added or removed.
+
+        Returns:
+            :obj:`dict`: The state.
+        """
+        def allocate_agent_state(agent):
+            return {name: np.empty(sensor.data_shape, dtype=sensor.dtype)
+                    for name, sensor in agent.sensors.items()}
+
+        if self.num_agents == 1 and self._agent is not None:
+            return allocate_agent_state(self._agent)
+        return {name: allocate_agent_state(agent) for name, agent in self.agents.items()}
+
+    def _check_can_tick(self, caller):
+        if not self._initial_reset:
+            raise HolodeckException("You must call .reset() before .{}()".format(caller))
+        if self._tick_pending:
+            raise HolodeckException("You must call .step_wait() or .tick_wait() before "
+                                    ".{}()".format(caller))
+
+    def _start_tick(self):
+        self._expire_lazy_states()
+        self._command_center.handle_buffer()
+        self._draw_bytes = 0
+        self._client.release()
+        self._tick_pending = True
+
+    def _finish_tick(self, caller):
+        if not self._tick_pending:
+            raise HolodeckException("There is no pending tick, call .step_async() or "
+                                    ".tick_async() before .{}()".format(caller))
+        try:
+            self._client.acquire()
+        finally:
+            # If the engine timed out, the tick is abandoned rather than left pending, so that the
+            # environment can still be reset or closed
+            self._tick_pending = False
+        if self._sensor_slots > 1:
+            self._update_sensor_views()
+
+    def _update_sensor_views(self):
+        state_dict = dict()
+        for agent_name, agent in self.agents.items():
+            agent.update_sensor_views()
+            state_dict[agent_name] = agent.agent_state_dict
+        self._state_dict = state_dict
+
+    def _expire_lazy_states(self):
+        for state_ref in self._lazy_states:
+            state = state_ref()
+            if state is not None:
+                state.expire()
+        self._lazy_states = []
+
+    def _count_copy(self, nbytes):
+        self._bytes_copied += nbytes
 
     def _enqueue_command(self, command_to_send):
         self._command_center.enqueue_command(command_to_send)
 
+    @property
+    def command_backlog_ticks(self):
+        """The number of ticks it takes to send the queued commands.
+
+        Commands are sent with the next tick, but the engine reads at most
+        :attr:`~holodeck.command.CommandCenter.max_buffer` bytes of them per tick. Larger batches,
+        e.g. when building a scene out of many props, are spread over consecutive ticks.
+
+        Returns:
+            :obj:`int`: The number of ticks, 0 if no commands are queued.
+        """
+        return self._command_center.backlog_ticks
+
+    def flush_commands(self, max_ticks=None):
+        """Ticks until every queued command has been sent to the engine.
+
+        The actions of the agents are repeated on every tick.
+
+        Args:
+            max_ticks (:obj:`int`, optional): The most ticks to run. Defaults to no limit.
+
+        Returns:
+            :obj:`int`: The number of ticks that were run.
+        """
+        self._check_can_tick("flush_commands")
+        ticks = 0
+        while self._command_center.queue_size > 0 and (max_ticks is None or ticks < max_ticks):
+            self._start_tick()
+            self._finish_tick("flush_commands")
+            ticks += 1
+        return ticks
+
     def add_agent(self, agent_def, is_main_agent=False):
         """Add an agent in the world.
 
@@ -467,20 +861,100 @@ class HolodeckEnvironment:
         prop_type = prop_type.lower()
         material = material.lower()
 
-        available_props = ["box", "sphere", "cylinder", "cone"]
-        available_materials = ["white", "gold", "cobblestone", "brick",
-                               "wood", "grass", "steel", "black"]
-
-        if prop_type not in available_props:
+        if prop_type not in _PROP_TYPES:
             raise HolodeckException("{} not an available prop. Available prop types: {}".format(
-                prop_type, available_props))
-        if material not in available_materials and material is not "":
+                prop_type, list(_PROP_TYPES)))
+        if material not in _PROP_MATERIALS and material != "":
             raise HolodeckException("{} not an available material. Available material types: {}".format(
-                material, available_materials))
+                material, list(_PROP_MATERIALS)))
 
         self.send_world_command("SpawnProp", num_params=[location, rotation, scale, sim_physics],
                                 string_params=[prop_type, material, tag])
 
+    def spawn_props(self, types, locations=None, rotations=None, scales=1, sim_physics=False,
+                    materials="", tags=""):
+        """Spawns many props at once, see :meth:`spawn_prop`.
+
+        Every argument is either one value for all of the props, or one value per prop. The props
+        are validated and encoded together, and spread over as many ticks as the command buffer
+        needs, see :meth:`flush_commands`.
+
+        Args:
+            types (:obj:`str` or :obj:`list` of :obj:`str`): The types of the props.
+            locations (:obj:`np.ndarray`): ``[N, 3]`` locations of the props, which sets the number
+                of props. Defaults to a single prop at the origin.
+            rotations (:obj:`np.ndarray`, optional): ``[N, 3]`` ``[roll, pitch, yaw]`` rotations.
+                Defaults to no rotation.
+            scales (:obj:`float` or :obj:`np.ndarray`, optional): A scale for every dimension of
+                every prop, ``[N]`` scales (one per prop, for every dimension), a single
+                ``[x, y, z]`` scale for every prop, or ``[N, 3]`` ``[x, y, z]`` scales. With three
+                props, three scales are one per prop. Defaults to 1.
+            sim_physics (:obj:`bool` or :obj:`np.ndarray`, optional): If the props are mobile and
+                affected by gravity. Defaults to False.
+            materials (:obj:`str` or :obj:`list` of :obj:`str`, optional): The materials of the
+                props. Defaults to the checkered gray material.
+            tags (:obj:`str` or :obj:`list` of :obj:`str`, optional): The tags of the props.
+
+        Returns:
+            :obj:`int`: The number of props that were queued.
+        """
+        if locations is None:
+            locations = np.zeros((1, 3))
+        locations = np.asarray(locations, dtype=np.float64).reshape(-1, 3)
+        count = len(locations)
+
+        numbers = np.zeros((count, 10))
+        numbers[:, 0:3] = locations
+        if rotations is not None:
+            numbers[:, 3:6] = np.asarray(rotations, dtype=np.float64).reshape(-1, 3)
+        numbers[:, 6:9] = _prop_scales(scales, count)
+        numbers[:, 9] = np.asarray(sim_physics, dtype=bool)
+
+        types = _prop_strings(types, count)
+        materials = _prop_strings(materials, count)
+        tags = np.broadcast_to(np.asarray(tags, dtype=str), (count,))
+
+        # Every distinct name is only checked once
+        unknown = np.setdiff1d(types, _PROP_TYPES)
+        if len(unknown) > 0:
+            raise HolodeckException("{} not an available prop. Available prop types: {}".format(
+                unknown[0], list(_PROP_TYPES)))
+        unknown = np.setdiff1d(materials, _PROP_MATERIALS + ("",))
+        if len(unknown) > 0:
+            raise HolodeckException("{} not an available material. Available material types: {}"
+                                    .format(unknown[0], list(_PROP_MATERIALS)))
+
+        strings = zip(types.tolist(), materials.tolist(), tags.tolist())
+        self._command_center.enqueue_commands(CustomCommand.batch("SpawnProp", numbers, strings))
+        return count
+
+    def spawn_props_from_file(self, path, chunk_size=1000):
+        """Spawns the props of a scene file, streaming them into the world in chunks.
+
+        The file is either:
+
+        - An ``.npz`` file with ``types`` and ``[N, 3]`` ``locations`` arrays, and optionally
+          ``rotations``, ``scales``, ``sim_physics``, ``materials`` and ``tags`` arrays, like the
+          arguments of :meth:`spawn_props`.
+        - A JSON lines file, with one prop per line as an object with the arguments of
+          :meth:`spawn_prop`, e.g. ``{"prop_type": "box", "location": [0, 0, 1]}``.
+
+        Each chunk is queued and sent to the engine before the next one is read, so the command
+        queue stays bounded. This ticks the environment, repeating the actions of the agents.
+
+        Args:
+            path (:obj:`str`): The path of the scene file.
+            chunk_size (:obj:`int`, optional): Number of props queued at a time. Defaults to 1000.
+
+        Returns:
+            :obj:`int`: The number of props that were spawned.
+        """
+        count = 0
+        for chunk in _read_prop_chunks(path, chunk_size):
+            count += self.spawn_props(**chunk)
+            self.flush_commands()
+        return count
+
     def draw_line(self, start, end, color=None, thickness=10.0):
         """Draws a debug line in the world
 
@@ -536,6 +1010,109 @@ class HolodeckEnvironment:
         command_to_send = DebugDrawCommand(3, loc, [0, 0, 0], color, thickness)
         self._enqueue_command(command_to_send)
 
+    def draw_lines(self, starts, ends, color=None, thickness=10.0, arrows=False):
+        """Draws many debug lines in the world at once.
+
+        If the lines don't fit in the ``draw_budget`` of the tick, every n-th line is drawn.
+
+        Args:
+            starts (:obj:`np.ndarray`): ``[N, 3]`` start locations of the lines.
+                (see :ref:`coordinate-system`)
+            ends (:obj:`np.ndarray`): ``[N, 3]`` end locations of the lines.
+            color (:obj:`np.ndarray`): ``[r, g, b]`` color of every line, or ``[N, 3]`` colors.
+            thickness (:obj:`float` or :obj:`np.ndarray`): thickness of every line, or ``[N]``
+                thicknesses.
+            arrows (:obj:`bool`): If arrows should be drawn instead of lines.
+
+        Returns:
+            :obj:`int`: The number of lines that were drawn.
+        """
+        color = [255, 0, 0] if color is None else color
+        commands = DebugDrawCommand.batch(1 if arrows else 0, starts, ends, color, thickness)
+        return self._enqueue_draws(commands)
+
+    def draw_points(self, points, color=None, thickness=10.0):
+        """Draws many debug points in the world at once.
+
+        If the points don't fit in the ``draw_budget`` of the tick, every n-th point is drawn.
+
+        Args:
+            points (:obj:`np.ndarray`): ``[N, 3]`` locations of the points.
+                (see :ref:`coordinate-system`)
+            color (:obj:`np.ndarray`): ``[r, g, b]`` color of every point, or ``[N, 3]`` colors.
+            thickness (:obj:`float` or :obj:`np.ndarray`): thickness of every point, or ``[N]``
+                thicknesses.
+
+        Returns:
+            :obj:`int`: The number of points that were drawn.
+        """
+        color = [255, 0, 0] if color is None else color
+        commands = DebugDrawCommand.batch(3, points, [0, 0, 0], color, thickness)
+        return self._enqueue_draws(commands)
+
+    def draw_polyline(self, points, color=None, thickness=10.0, tolerance=0.0):
+        """Draws a line through a sequence of points, e.g. a trajectory.
+
+        With a ``tolerance``, the line is first simplified with the Douglas-Peucker algorithm,
+        which drops the points that are closer than ``tolerance`` to the simplified line. If it
+        still doesn't fit in the ``draw_budget`` of the tick, every n-th point is kept.
+
+        Args:
+            points (:obj:`np.ndarray`): ``[N, 3]`` locations the line goes through.
+                (see :ref:`coordinate-system`)
+            color (:obj:`np.ndarray`): ``[r, g, b]`` color of the line, or ``[N, 3]`` colors, each
+                used from its point to the next one.
+            thickness (:obj:`float`): thickness of the line
+            tolerance (:obj:`float`): How far the simplified line may be from the points, in
+                meters. Defaults to 0, which doesn't simplify it.
+
+        Returns:
+            :obj:`int`: The number of line segments that were drawn.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        colors = np.asarray([255, 0, 0] if color is None else color, dtype=np.float64)
+        per_point = colors.ndim == 2
+        if len(points) < 2:
+            return 0
+
+        keep = np.arange(len(points))
+        if tolerance > 0:
+            keep = np.flatnonzero(_douglas_peucker(points, tolerance))
+        room = self._draw_room()
+        while True:
+            kept_colors = colors[keep][:-1] if per_point else colors
+            commands = DebugDrawCommand.batch(0, points[keep[:-1]], points[keep[1:]],
+                                              kept_colors, thickness)
+            size = sum(command.json_size() + 1 for command in commands)
+            if room is None or size <= room or len(keep) <= 2:
+                break
+            # Keep every n-th point, and the last one
+            stride = -(-size // max(room, 1))
+            keep = np.append(keep[:-1:stride], keep[-1])
+        return self._enqueue_draws(commands, decimate=False)
+
+    def _draw_room(self):
+        if self._draw_budget is None:
+            return None
+        return max(self._draw_budget - self._draw_bytes, 0)
+
+    def _enqueue_draws(self, commands, decimate=True):
+        sizes = np.fromiter((command.json_size() + 1 for command in commands), dtype=np.int64,
+                            count=len(commands))
+        room = self._draw_room()
+        if room is not None and sizes.sum() > room:
+            if decimate:
+                # Spread what is drawn over the whole drawing, rather than drawing its start
+                stride = -(-int(sizes.sum()) // max(room, 1))
+                commands = commands[::stride]
+                sizes = sizes[::stride]
+            count = int(np.searchsorted(np.cumsum(sizes), room, side="right"))
+            commands = commands[:count]
+            sizes = sizes[:count]
+        self._draw_bytes += int(sizes.sum())
+        self._command_center.enqueue_commands(commands)
+        return len(commands)
+
     def move_viewport(self, location, rotation):
         """Teleport the camera to the given location
 
@@ -616,7 +1193,7 @@ class HolodeckEnvironment:
             subprocess.Popen([binary_path, task_key, '-HolodeckOn', '-opengl' + str(gl_version),
                               '-LOG=HolodeckLog.txt', '-ForceRes', '-ResX=' + str(self._window_size[1]),
                               '-ResY=' + str(self._window_size[0]), '--HolodeckUUID=' + self._uuid,
-                              '-TicksPerSec=' + str(self._ticks_per_sec)],
+                              '-TicksPerSec=' + str(self._ticks_per_sec)] + self._extra_engine_args(),
                              stdout=out_stream,
                              stderr=out_stream,
                              env=environment)
@@ -639,7 +1216,7 @@ class HolodeckEnvironment:
             subprocess.Popen([binary_path, task_key, '-HolodeckOn', '-LOG=HolodeckLog.txt',
                               '-ForceRes', '-ResX=' + str(self._window_size[1]), '-ResY=' +
                               str(self._window_size[0]), '-TicksPerSec=' + str(self._ticks_per_sec),
-                              '--HolodeckUUID=' + self._uuid],
+                              '--HolodeckUUID=' + self._uuid] + self._extra_engine_args(),
                              stdout=out_stream, stderr=out_stream)
 
         atexit.register(self.__on_exit__)
@@ -647,6 +1224,19 @@ class HolodeckEnvironment:
         if response == win32event.WAIT_TIMEOUT:
             raise HolodeckException("Timed out waiting for binary to load")
 
+    def _extra_engine_args(self):
+        """Command line flags for optional features that the engine has to opt in to."""
+        args = []
+        if self._shmem_arena:
+            args.append('-HolodeckArena')
+        if self._sensor_slots > 1:
+            args.append('-HolodeckSensorSlots=' + str(self._sensor_slots))
+        if self._sync_backend != "semaphore":
+            args.append('-HolodeckSync=' + self._sync_backend)
+        if self._schedule_depth > 1:
+            args.append('-HolodeckScheduleDepth=' + str(self._schedule_depth))
+        return args
+
     def __on_exit__(self):
         if hasattr(self, '_exited'):
             return
@@ -669,23 +1259,53 @@ class HolodeckEnvironment:
     def _get_single_state(self):
 
         if self._agent is not None:
-            return self._create_copy(self._state_dict[self._agent.name]) if self._copy_state \
-                else self._state_dict[self._agent.name]
+            return self._copy_state_dict(self._state_dict[self._agent.name])
 
         return self._get_full_state()
 
     def _get_full_state(self):
-        return self._create_copy(self._state_dict) if self._copy_state else self._state_dict
+        return self._copy_state_dict(self._state_dict)
+
+    def _get_state(self, out=None):
+        if out is None and self._copy_state is not True:
+            return self._default_state_fn()
+
+        plan = self._step_plan()
+        pairs = plan.pairs[self._client.sensor_slot] if plan.num_slots > 1 else plan.pairs[0]
+        self._bytes_copied += plan.nbytes
+        if out is None:
+            if plan.single_agent:
+                return {sensor_name: view.copy() for _, sensor_name, view in pairs}
+            state = {agent_name: dict() for agent_name in plan.agent_names}
+            for agent_name, sensor_name, view in pairs:
+                state[agent_name][sensor_name] = view.copy()
+            return state
+
+        if plan.single_agent:
+            for _, sensor_name, view in pairs:
+                np.copyto(out[sensor_name], view)
+        else:
+            for agent_name, sensor_name, view in pairs:
+                np.copyto(out[agent_name][sensor_name], view)
+        return out
+
+    def _step_plan(self):
+        plan = self._plan
+        if plan is None or not plan.is_valid(self):
+            plan = self._plan = _StepPlan(self)
+        return plan
+
+    def _copy_state_dict(self, state):
+        if self._copy_state == "lazy":
+            return LazyState(state, self._lazy_states, self._count_copy)
+        return self._create_copy(state) if self._copy_state else state
 
     def _get_reward_terminal(self):
-        reward = None
-        terminal = None
-        if self._agent is not None:
-            for sensor in self._state_dict[self._agent.name]:
-                if "Task" in sensor:
-                    reward = self._state_dict[self._agent.name][sensor][0]
-                    terminal = self._state_dict[self._agent.name][sensor][1] == 1
-        return reward, terminal
+        plan = self._step_plan()
+        task = plan.task[self._client.sensor_slot] if plan.num_slots > 1 else plan.task[0]
+        if task is None:
+            return None, None
+        return task[0], task[1] == 1
 
     def _create_copy(self, obj):
         if isinstance(obj, dict):  # Deep copy dictionary
@@ -695,5 +1315,163 @@ class HolodeckEnvironment:
                     copy[k] = self._create_copy(v)
                 else:
                     copy[k] = np.copy(v)
+                    self._bytes_copied += copy[k].nbytes
             return copy
         return None  # Not implemented for other types
+
+
+class _StepPlan:
+    """Everything a step reads from the sensor buffers, resolved once instead of on every step.
+
+    Holds the views of every sensor buffer the state is copied from, and the buffer of the main
+    agent's task sensor that the reward and terminal are read from, for each sensor slot. Views of
+    shared memory stay valid until a buffer is allocated or freed, so the plan is recompiled when
+    the client's :attr:`~holodeck.holodeckclient.HolodeckClient.layout_version` changes.
+
+    Args:
+        env (:class:`HolodeckEnvironment`): The environment to compile the plan for.
+    """
+
+    def __init__(self, env):
+        client = env._client
+        self.layout_version = client.layout_version
+        self.agent = env._agent
+        self.num_agents = env.num_agents
+        self.single_agent = env.num_agents == 1 and env._agent is not None
+        self.num_slots = client.sensor_slots
+        agents = [env._agent] if self.single_agent else list(env.agents.values())
+        self.agent_names = [agent.name for agent in agents]
+
+        # For each slot, the (agent name, sensor name, view) of every sensor in the state
+        self.pairs = [[] for _ in range(self.num_slots)]
+        self.task = [None] * self.num_slots
+        self.nbytes = 0
+        for agent in agents:
+            for sensor_name, sensor in agent.sensors.items():
+                for slot in range(self.num_slots):
+                    view = sensor._sensor_slots[slot] if self.num_slots > 1 \
+                        else sensor.sensor_data
+                    self.pairs[slot].append((agent.name, sensor_name, view))
+                    # The reward comes from the last task sensor of the main agent
+                    if agent is env._agent and "Task" in sensor_name:
+                        self.task[slot] = view
+                self.nbytes += sensor.sensor_data.nbytes
+
+    def is_valid(self, env):
+        """
+        Returns:
+            :obj:`bool`: If the plan still matches the agents and buffers of the environment.
+        """
+        return self.layout_version == env._client.layout_version and \
+            self.agent is env._agent and self.num_agents == env.num_agents
+
+
+_PROP_TYPES = ("box", "sphere", "cylinder", "cone")
+_PROP_MATERIALS = ("white", "gold", "cobblestone", "brick", "wood", "grass", "steel", "black")
+
+# The arguments of spawn_props, and the argument of spawn_prop and its default for each
+_PROP_FIELDS = {"types": ("prop_type", None), "locations": ("location", [0, 0, 0]),
+                "rotations": ("rotation", [0, 0, 0]), "scales": ("scale", 1),
+                "sim_physics": ("sim_physics", False), "materials": ("material", ""),
+                "tags": ("tag", "")}
+
+
+def _prop_strings(strings, count):
+    """Lower cases prop types or materials, and repeats a single one for every prop."""
+    strings = np.char.lower(np.asarray(strings, dtype=str))
+    return np.broadcast_to(strings, (count,))
+
+
+def _prop_scales(scales, count):
+    """Checks the scales of :meth:`HolodeckEnvironment.spawn_props`, and shapes them to broadcast
+    over the ``[count, 3]`` scales of the props.
+
+    Raises:
+        HolodeckException: If the scales have none of the accepted shapes.
+    """
+    scales = np.asarray(scales, dtype=np.float64)
+    if scales.ndim == 0:
+        return scales
+    if scales.shape == (count,):
+        return scales.reshape(-1, 1)
+    if scales.shape in ((3,), (count, 3)):
+        return scales
+    raise HolodeckException("Scales of shape {} don't fit {} props, expected a single scale, [{}] "
+                            "scales, [3] or [{}, 3]".format(scales.shape, count, count, count))
+
+
+def _read_prop_chunks(path, chunk_size):
+    """Reads a scene file, see :meth:`HolodeckEnvironment.spawn_props_from_file`.
+
+    Yields:
+        :obj:`dict`: The keyword arguments of :meth:`HolodeckEnvironment.spawn_props` for each
+        chunk of at most ``chunk_size`` props.
+    """
+    if path.endswith(".npz"):
+        with np.load(path) as scene:
+            arrays = {name: scene[name] for name in _PROP_FIELDS if name in scene}
+        for name in ("types", "locations"):
+            if name not in arrays:
+                raise HolodeckException("Scene file {} has no {} array".format(path, name))
+        # Arrays with a value per prop are split into chunks, the others apply to every prop
+        count = len(arrays["locations"])
+        per_prop = {name for name, array in arrays.items()
+                    if array.ndim > 0 and len(array) == count}
+        for start in range(0, count, chunk_size):
+            yield {name: array[start:start + chunk_size] if name in per_prop else array
+                   for name, array in arrays.items()}
+        return
+
+    with open(path) as scene:
+        lines = (line for line in scene if line.strip())
+        while True:
+            props = [json.loads(line) for line in itertools.islice(lines, chunk_size)]
+            if not props:
+                return
+            yield _prop_columns(props)
+
+
+def _prop_columns(props):
+    """Turns a list of props, as the keyword arguments of
+    :meth:`HolodeckEnvironment.spawn_prop`, into the keyword arguments of
+    :meth:`HolodeckEnvironment.spawn_props`."""
+    columns = dict()
+    for name, (field, default) in _PROP_FIELDS.items():
+        columns[name] = [prop.get(field, default) for prop in props]
+    # A scale is a single value or an [x, y, z] list, so that every one becomes a list
+    columns["scales"] = [scale if isinstance(scale, list) else [scale] * 3
+                         for scale in columns["scales"]]
+    return columns
+
+
+def _douglas_peucker(points, tolerance):
+    """Simplifies a line with the Douglas-Peucker algorithm.
+
+    Args:
+        points (:obj:`np.ndarray`): ``[N, 3]`` points of the line.
+        tolerance (:obj:`float`): Largest distance of a dropped point to the simplified line.
+
+    Returns:
+        :obj:`np.ndarray`: ``[N]`` mask of the points that are kept.
+    """
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    ranges = [(0, len(points) - 1)]
+    while ranges:
+        first, last = ranges.pop()
+        if last - first < 2:
+            continue
+        segment = points[last] - points[first]
+        inner = points[first + 1:last] - points[first]
+        length = np.dot(segment, segment)
+        if length > 0:
+            along = np.clip(inner @ segment / length, 0, 1)
+            inner = inner - along[:, np.newaxis] * segment
+        distances = np.einsum("ij,ij->i", inner, inner)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance * tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            ranges.append((first, split))
+            ranges.append((split, last))
+    return keep
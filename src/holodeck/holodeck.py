@@ -1,7 +1,10 @@
 """Module containing high level interface for loading environments."""
+import functools
 import uuid
 
 from holodeck.environments import HolodeckEnvironment
+from holodeck.vectorenvironments import VectorHolodeckEnvironment, \
+    SubprocVectorHolodeckEnvironment
 from holodeck.packagemanager import get_scenario,\
     get_binary_path_for_scenario,\
     get_package_config_for_scenario,\
@@ -21,7 +24,9 @@ class GL_VERSION:
 
 
 def make(scenario_name="", scenario_cfg=None, gl_version=GL_VERSION.OPENGL4, window_res=None, verbose=False,
-         show_viewport=True, ticks_per_sec=30, copy_state=True):
+         show_viewport=True, ticks_per_sec=30, copy_state=True, shmem_arena=False,
+         sensor_slots=1, sync_backend="semaphore", schedule_depth=1,
+         draw_budget=None):
     """Creates a Holodeck environment
 
     Args:
@@ -48,8 +53,33 @@ def make(scenario_name="", scenario_cfg=None, gl_version=GL_VERSION.OPENGL4, win
         ticks_per_sec (:obj:`int`, optional):
             The number of frame ticks per unreal seconds. Defaults to 30.
 
-        copy_state (:obj:`bool`, optional):
-            If the state should be copied or passed as a reference when returned. Defaults to True
+        copy_state (:obj:`bool` or :obj:`str`, optional):
+            If the state should be copied or passed as a reference when returned. Defaults to True.
+            ``"lazy"`` only copies the sensors that are read, see :class:`~holodeck.state.LazyState`
+
+        shmem_arena (:obj:`bool`, optional):
+            If all shared memory buffers should be allocated from a single
+            :class:`~holodeck.shmem.ShmemArena`. The world binary must support the arena layout.
+            Defaults to False
+
+        sensor_slots (:obj:`int`, optional):
+            Number of rotating slots for each sensor buffer, see
+            :class:`~holodeck.environments.HolodeckEnvironment`. The world binary must support
+            multiple slots if this is more than 1. Defaults to 1
+
+        sync_backend (:obj:`str`, optional):
+            The :mod:`holodeck.sync` backend for the tick handshake. ``"futex"`` cuts the wake-up
+            latency of each tick, but needs a world binary that supports it.
+            Defaults to ``"semaphore"``
+
+        schedule_depth (:obj:`int`, optional):
+            Maximum number of ticks a single
+            :meth:`~holodeck.environments.HolodeckEnvironment.step_schedule` can run. The world
+            binary must support action schedules if this is more than 1. Defaults to 1
+
+        draw_budget (:obj:`int`, optional):
+            Maximum number of bytes of batched debug drawing commands per tick, see
+            :class:`~holodeck.environments.HolodeckEnvironment`. Defaults to no limit
 
     Returns:
         :class:`~holodeck.environments.HolodeckEnvironment`: A holodeck environment instantiated
@@ -84,8 +114,58 @@ def make(scenario_name="", scenario_cfg=None, gl_version=GL_VERSION.OPENGL4, win
     param_dict["show_viewport"] = show_viewport
     param_dict["copy_state"] = copy_state
     param_dict["ticks_per_sec"] = ticks_per_sec
+    param_dict["shmem_arena"] = shmem_arena
+    param_dict["sensor_slots"] = sensor_slots
+    param_dict["sync_backend"] = sync_backend
+    param_dict["schedule_depth"] = schedule_depth
+    param_dict["draw_budget"] = draw_budget
 
     if window_res is not None:
         param_dict["window_size"] = window_res
 
     return HolodeckEnvironment(**param_dict)
+
+
+def make_vector(scenario_name="", num_envs=1, scenario_cfg=None, use_processes=False,
+                auto_reset=False, **kwargs):
+    """Creates a vector environment running several copies of the same scenario.
+
+    Each copy is created with :meth:`make`, with ``copy_state=False`` unless specified otherwise,
+    since the vector environment already copies the states when stacking them.
+
+    Args:
+        scenario_name (:obj:`str`): The name of the scenario to load, see :meth:`make`.
+        num_envs (:obj:`int`): The number of copies of the scenario to run.
+        scenario_cfg (:obj:`dict`): Scenario configuration, see :meth:`make`.
+        use_processes (:obj:`bool`): If each copy should be driven from its own worker process,
+            with the states gathered in shared memory. See
+            :class:`~holodeck.vectorenvironments.SubprocVectorHolodeckEnvironment`.
+        auto_reset (:obj:`bool`): If copies that reach a terminal state should be reset in the
+            background, see :class:`~holodeck.vectorenvironments.VectorHolodeckEnvironment`. Not
+            supported together with ``use_processes``.
+        **kwargs: Any other argument accepted by :meth:`make`.
+
+    Returns:
+        :class:`~holodeck.vectorenvironments.VectorHolodeckEnvironment` or
+        :class:`~holodeck.vectorenvironments.SubprocVectorHolodeckEnvironment`: The vector
+        environment.
+    """
+    if num_envs < 1:
+        raise HolodeckException("num_envs must be at least 1")
+    kwargs.setdefault("copy_state", False)
+
+    if use_processes:
+        if auto_reset:
+            raise HolodeckException("auto_reset is not supported with use_processes")
+        env_fn = functools.partial(make, scenario_name, scenario_cfg=scenario_cfg, **kwargs)
+        return SubprocVectorHolodeckEnvironment([env_fn] * num_envs)
+
+    envs = []
+    try:
+        for _ in range(num_envs):
+            envs.append(make(scenario_name, scenario_cfg=scenario_cfg, **kwargs))
+    except Exception:
+        for env in envs:
+            env.__on_exit__()
+        raise
+    return VectorHolodeckEnvironment(envs, auto_reset=auto_reset)
@@ -1,8 +1,12 @@
 """The client used for subscribing shared memory between python and c++."""
 import os
+from collections import OrderedDict
+
+import numpy as np
 
 from holodeck.exceptions import HolodeckException
-from holodeck.shmem import Shmem
+from holodeck.shmem import Shmem, ShmemArena
+from holodeck.sync import make_sync_backend
 
 class HolodeckClient:
     """HolodeckClient for controlling a shared memory session.
@@ -11,20 +15,45 @@ class HolodeckClient:
         uuid (:obj:`str`, optional): A UUID to indicate which server this client is associated with.
             The same UUID should be passed to the world through a command line flag. Defaults to "".
         should_timeout (:obj:`boolean`, optional): If the client should time out after 5s waiting for the engine
+        use_arena (:obj:`boolean`, optional): If every buffer should be allocated from a single
+            :class:`~holodeck.shmem.ShmemArena` instead of one shared memory file per buffer. The
+            engine must be started with ``-HolodeckArena`` to understand this layout.
+            Defaults to False.
+        pool_size (:obj:`int`, optional): How many freed blocks to keep around so they can be
+            reused by :meth:`malloc`, e.g. when a sensor is created again after a reset. The least
+            recently freed blocks beyond this are closed and unlinked. Defaults to 64.
+        sensor_slots (:obj:`int`, optional): Number of rotating slots each sensor buffer has. With
+            more than one slot, the engine writes each tick into the next slot and publishes the
+            tick sequence number and slot it wrote in a shared header, so data from earlier ticks
+            stays intact for ``sensor_slots - 1`` more ticks. The engine must be started with
+            ``-HolodeckSensorSlots=N``. Defaults to 1.
+        sync_backend (:obj:`str`, optional): Which :mod:`holodeck.sync` backend to use for the
+            tick handshake, ``"semaphore"`` or ``"futex"``. Defaults to ``"semaphore"``.
+        schedule_depth (:obj:`int`, optional): Maximum number of ticks the engine can run for a
+            single handshake. With more than one, every agent gets an action schedule of that many
+            rows and every low dimensional sensor a trace of that many rows, and a shared header
+            tells the engine how many ticks to run. The engine must be started with
+            ``-HolodeckScheduleDepth=K``. Defaults to 1.
     """
-    def __init__(self, uuid="", should_timeout=False):
+    def __init__(self, uuid="", should_timeout=False, use_arena=False, pool_size=64,
+                 sensor_slots=1, sync_backend="semaphore", schedule_depth=1):
         self._uuid = uuid
 
         # Important functions
-        self._get_semaphore_fn = None
-        self._release_semaphore_fn = None
-        self._semaphore1 = None
-        self._semaphore2 = None
+        self._sync_backend_name = sync_backend
+        self._sync = None
         self.unlink = None
         self.command_center = None
         self.should_timeout = should_timeout
 
         self._memory = dict()
+        self._refcounts = dict()
+        self._pool = OrderedDict()
+        self.pool_size = pool_size
+        # Changes whenever a block is allocated or freed, so anything that holds on to views of
+        # the buffers (like the environment's step plan) can tell that the layout changed
+        self.layout_version = 0
+        self._arena = ShmemArena(self._uuid) if use_arena else None
         self._sensors = dict()
         self._agents = dict()
         self._settings = dict()
@@ -36,76 +65,77 @@ class HolodeckClient:
         else:
             raise HolodeckException("Currently unsupported os: " + os.name)
 
-    def __windows_init__(self):
-        import win32event
-        semaphore_all_access = 0x1F0003
-
-        self.timeout = 5000 if self.should_timeout else win32event.INFINITE            
-
-        self._semaphore1 = \
-            win32event.OpenSemaphore(semaphore_all_access, False,
-                                     "Global\\HOLODECK_SEMAPHORE_SERVER" + self._uuid)
-        self._semaphore2 = \
-            win32event.OpenSemaphore(semaphore_all_access, False,
-                                     "Global\\HOLODECK_SEMAPHORE_CLIENT" + self._uuid)
+        if sensor_slots < 1:
+            raise HolodeckException("sensor_slots must be at least 1")
+        self.sensor_slots = sensor_slots
+        # [tick sequence number, slot last written]
+        self._sensor_header = self.malloc("sensor_header", [2], np.uint64) \
+            if sensor_slots > 1 else None
 
-        def windows_acquire_semaphore(sem):
-            result = win32event.WaitForSingleObject(sem, self.timeout)
+        if schedule_depth < 1:
+            raise HolodeckException("schedule_depth must be at least 1")
+        self.schedule_depth = schedule_depth
+        # [ticks requested, ticks completed]
+        self._schedule_header = self.malloc("schedule_header", [2], np.uint32) \
+            if schedule_depth > 1 else None
 
-            if result != win32event.WAIT_OBJECT_0:
-                raise TimeoutError("Timed out or error waiting for engine!")
-            
-        def windows_release_semaphore(sem):
-            win32event.ReleaseSemaphore(sem, 1)
+    def __windows_init__(self):
+        self._sync = make_sync_backend(self._sync_backend_name, self._uuid, self.should_timeout)
+        self.timeout = self._sync.timeout
 
         def windows_unlink():
             pass
 
-        self._get_semaphore_fn = windows_acquire_semaphore
-        self._release_semaphore_fn = windows_release_semaphore
         self.unlink = windows_unlink
 
     def __posix_init__(self):
-        import posix_ipc
-        self._semaphore1 = posix_ipc.Semaphore("/HOLODECK_SEMAPHORE_SERVER" + self._uuid)
-        self._semaphore2 = posix_ipc.Semaphore("/HOLODECK_SEMAPHORE_CLIENT" + self._uuid)
-
-        # Unfortunately, OSX doesn't support sem_timedwait(), so setting this timeout
-        # does nothing.
-        self.timeout = 60 if self.should_timeout else None
-
-        def posix_acquire_semaphore(sem):
-            sem.acquire(self.timeout)
-
-        def posix_release_semaphore(sem):
-            sem.release()
+        self._sync = make_sync_backend(self._sync_backend_name, self._uuid, self.should_timeout)
+        self.timeout = self._sync.timeout
 
         def posix_unlink():
-            posix_ipc.unlink_semaphore(self._semaphore1.name)
-            posix_ipc.unlink_semaphore(self._semaphore2.name)
+            self._sync.unlink()
             for shmem_block in self._memory.values():
                 shmem_block.unlink()
+            for shmem_block in self._pool.values():
+                shmem_block.unlink()
+            self._memory.clear()
+            self._refcounts.clear()
+            self._pool.clear()
+            if self._arena is not None:
+                self._arena.unlink()
 
-        self._get_semaphore_fn = posix_acquire_semaphore
-        self._release_semaphore_fn = posix_release_semaphore
         self.unlink = posix_unlink
 
+    @property
+    def sync_backend(self):
+        """The backend used for the tick handshake with the engine.
+
+        Returns:
+            :class:`~holodeck.sync.SyncBackend`: The sync backend.
+        """
+        return self._sync
+
     def acquire(self):
         """Used to acquire control. Will wait until the HolodeckServer has finished its work.
 
         """
-        self._get_semaphore_fn(self._semaphore2)
+        self._sync.acquire()
 
     def release(self):
         """Used to release control. Will allow the HolodeckServer to take a step.
 
         """
-        self._release_semaphore_fn(self._semaphore1)
+        self._sync.release()
 
     def malloc(self, key, shape, dtype):
         """Allocates a block of shared memory, and returns a numpy array whose data corresponds
         with that block.
 
+        Blocks are reference counted: allocating a key that is already in use with the same shape
+        and dtype returns the existing block and adds a reference to it. Every call should be
+        matched by a call to :meth:`free`. Freed blocks are kept in a pool and handed out again
+        when the same key (or, for an arena, the same shape) is allocated later.
+
         Args:
             key (:obj:`str`): The key to identify the block.
             shape (:obj:`list` of :obj:`int`): The shape of the numpy array to allocate.
@@ -114,9 +144,99 @@ class HolodeckClient:
         Returns:
             :obj:`np.ndarray`: The numpy array that is positioned on the shared memory.
         """
-        if key not in self._memory or \
-           self._memory[key].shape != shape or \
-           self._memory[key].dtype != dtype:
-            self._memory[key] = Shmem(key, shape, dtype, self._uuid)
+        self.layout_version += 1
+        block = self._memory.get(key)
+        if block is not None:
+            if self._block_matches(block, shape, dtype):
+                self._refcounts[key] += 1
+                return block.np_array
+            # The key is being reallocated with a new layout, the old block can't be reused
+            del self._memory[key]
+            del self._refcounts[key]
+            block.close()
+
+        block = self._take_from_pool(key, shape, dtype)
+        if block is None:
+            if self._arena is not None:
+                block = self._arena.allocate(key, shape, dtype)
+            else:
+                block = Shmem(key, shape, dtype, self._uuid)
+
+        self._memory[key] = block
+        self._refcounts[key] = 1
+        return block.np_array
+
+    def free(self, key):
+        """Drops a reference to a block allocated with :meth:`malloc`.
+
+        Once the last reference is dropped, the block is moved to the pool of reusable blocks.
+        Freeing a key that isn't allocated does nothing.
 
-        return self._memory[key].np_array
+        Args:
+            key (:obj:`str`): The key of the block.
+        """
+        if key not in self._refcounts:
+            return
+        self.layout_version += 1
+        self._refcounts[key] -= 1
+        if self._refcounts[key] > 0:
+            return
+
+        del self._refcounts[key]
+        self._pool[key] = self._memory.pop(key)
+        while len(self._pool) > self.pool_size:
+            _, evicted = self._pool.popitem(last=False)
+            evicted.unlink()
+
+    def _take_from_pool(self, key, shape, dtype):
+        """Gets a freed block that can be reused for key, or None."""
+        block = self._pool.pop(key, None)
+        if block is not None:
+            if self._block_matches(block, shape, dtype):
+                return block
+            block.close()
+
+        if self._arena is not None:
+            # Arena blocks aren't tied to a file name, so any block of the same layout will do
+            for pooled_key, pooled in self._pool.items():
+                if self._block_matches(pooled, shape, dtype):
+                    del self._pool[pooled_key]
+                    self._arena.rename(pooled, key)
+                    return pooled
+        return None
+
+    @staticmethod
+    def _block_matches(block, shape, dtype):
+        return tuple(block.shape) == tuple(shape) and block.dtype == dtype
+
+    @property
+    def sensor_slot(self):
+        """The sensor buffer slot the engine wrote to during the last tick.
+
+        Returns:
+            :obj:`int`: The slot index, always 0 when ``sensor_slots`` is 1.
+        """
+        if self._sensor_header is None:
+            return 0
+        return int(self._sensor_header[1])
+
+    @property
+    def tick_sequence(self):
+        """The sequence number of the last tick the engine completed, as published in the sensor
+        header.
+
+        Returns:
+            :obj:`int`: The tick sequence number, or ``None`` when ``sensor_slots`` is 1.
+        """
+        if self._sensor_header is None:
+            return None
+        return int(self._sensor_header[0])
+
+    @property
+    def arena(self):
+        """The arena all buffers are allocated from, if the client was created with ``use_arena``.
+
+        Returns:
+            :class:`~holodeck.shmem.ShmemArena`: The arena, or ``None``.
+        """
+        return self._arena
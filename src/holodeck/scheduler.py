@@ -0,0 +1,167 @@
+"""Module containing a scheduler that steps several environments independently of each other.
+
+Unlike :class:`~holodeck.vectorenvironments.VectorHolodeckEnvironment`, which waits for the slowest
+engine every tick, the scheduler hands back each environment as soon as its engine has finished,
+so a fast world never waits on a slow one.
+"""
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from holodeck.exceptions import HolodeckException
+
+
+class CompletionScheduler:
+    """Steps several :class:`~holodeck.environments.HolodeckEnvironment` and yields them in the
+    order their engines finish.
+
+    Every environment that has been given an action with :meth:`submit` is waited on by a thread
+    of a waiter pool. The semaphore wait doesn't hold the GIL, so the engines finish in parallel,
+    and :meth:`results` yields each one as soon as it is done:
+
+    .. code-block:: python
+
+        scheduler = CompletionScheduler(envs)
+        for env_id, state in enumerate(scheduler.reset()):
+            scheduler.submit(env_id, policy(state))
+
+        for env_id, (state, reward, terminal, _) in scheduler.results():
+            scheduler.submit(env_id, policy(state))
+
+    An environment must not be used directly while it has a pending step.
+
+    Args:
+        envs (:obj:`list` of :class:`~holodeck.environments.HolodeckEnvironment`):
+            The environments to step. They don't need to run the same scenario.
+        num_waiters (:obj:`int`, optional): Number of waiter threads. Defaults to one per
+            environment, fewer threads delay noticing that an engine has finished.
+    """
+
+    def __init__(self, envs, num_waiters=None):
+        if not envs:
+            raise HolodeckException("A scheduler needs at least one environment")
+        self.envs = list(envs)
+        self._executor = ThreadPoolExecutor(max_workers=num_waiters or len(self.envs),
+                                            thread_name_prefix="holodeck-waiter")
+        self._completed = queue.Queue()
+        self._pending = set()
+        self._submit_times = dict()
+        self._started = time.monotonic()
+        self._steps = [0] * len(self.envs)
+        self._busy_time = [0.0] * len(self.envs)
+
+    @property
+    def num_envs(self):
+        """
+        Returns:
+            :obj:`int`: The number of environments.
+        """
+        return len(self.envs)
+
+    @property
+    def num_pending(self):
+        """
+        Returns:
+            :obj:`int`: The number of environments with a step that hasn't been yielded yet.
+        """
+        return len(self._pending)
+
+    def reset(self):
+        """Resets every environment. There must be no pending steps.
+
+        Returns:
+            :obj:`list`: The state of each environment.
+        """
+        if self._pending:
+            raise HolodeckException("Can't reset while there are pending steps")
+        return [env.reset() for env in self.envs]
+
+    def submit(self, env_id, action):
+        """Supplies an action to the main agent of an environment and starts its next tick.
+
+        Args:
+            env_id (:obj:`int`): Index of the environment.
+            action (:obj:`np.ndarray`): The action for the main agent.
+        """
+        if env_id in self._pending:
+            raise HolodeckException("Environment {} already has a pending step".format(env_id))
+        env = self.envs[env_id]
+        env.step_async(action)
+        self._pending.add(env_id)
+        self._submit_times[env_id] = time.monotonic()
+        self._executor.submit(self._wait, env_id)
+
+    def results(self, timeout=None):
+        """Yields the result of every pending step, in the order the engines finish.
+
+        Environments that are submitted again while iterating are yielded as well, so the loop
+        runs until no environment has a pending step.
+
+        Args:
+            timeout (:obj:`float`, optional): Seconds to wait for the next engine to finish before
+                raising :class:`~holodeck.exceptions.HolodeckException`. Defaults to no timeout.
+
+        Yields:
+            (:obj:`int`, :obj:`tuple`): The index of the environment, and the 4tuple returned by
+            :meth:`~holodeck.environments.HolodeckEnvironment.step`.
+        """
+        while self._pending:
+            yield self.next_result(timeout)
+
+    def next_result(self, timeout=None):
+        """Waits for the next pending step to finish.
+
+        Args:
+            timeout (:obj:`float`, optional): Seconds to wait before raising
+                :class:`~holodeck.exceptions.HolodeckException`. Defaults to no timeout.
+
+        Returns:
+            (:obj:`int`, :obj:`tuple`): The index of the environment, and its step result.
+        """
+        if not self._pending:
+            raise HolodeckException("There are no pending steps")
+        try:
+            env_id, result, error = self._completed.get(timeout=timeout)
+        except queue.Empty:
+            raise HolodeckException("Timed out waiting for an environment to finish its step")
+
+        self._pending.discard(env_id)
+        self._steps[env_id] += 1
+        self._busy_time[env_id] += time.monotonic() - self._submit_times.pop(env_id)
+        if error is not None:
+            raise error
+        return env_id, result
+
+    def stats(self):
+        """Gives the throughput of each environment, to make imbalance between them visible.
+
+        Returns:
+            :obj:`list` of :obj:`dict`: For each environment, the number of completed ``steps``,
+            ``steps_per_sec`` since the scheduler was created, and the mean ``latency`` in seconds
+            from :meth:`submit` until its result was yielded.
+        """
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        return [{"steps": steps,
+                 "steps_per_sec": steps / elapsed,
+                 "latency": busy / steps if steps else 0.0}
+                for steps, busy in zip(self._steps, self._busy_time)]
+
+    def close(self):
+        """Waits for the pending steps, stops the waiter threads and closes every environment."""
+        self._executor.shutdown(wait=True)
+        for env in self.envs:
+            env.__on_exit__()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _wait(self, env_id):
+        try:
+            result = self.envs[env_id].step_wait()
+        except Exception as error:  # pylint: disable=broad-except
+            self._completed.put((env_id, None, error))
+        else:
+            self._completed.put((env_id, result, None))
@@ -20,6 +20,8 @@ class HolodeckSensor:
         config (:obj:`dict`): Configuration dictionary to pass to the engine
     """
     default_config = {}
+    # If the sensor is traced every tick when several ticks are run at once. Images are too large
+    traceable = True
 
     def __init__(self, client, agent_name=None, agent_type=None,
                     name="DefaultSensor", config=None):
@@ -28,23 +30,70 @@ class HolodeckSensor:
         self.agent_name = agent_name
         self.agent_type = agent_type
         self._buffer_name = self.agent_name + "_" + self.name
-
-        self._sensor_data_buffer = \
-            self._client.malloc(self._buffer_name + "_sensor_data",
-                                self.data_shape, self.dtype)
+        self._sensor_data_key = self._buffer_name + "_sensor_data"
+
+        self._sensor_slots = None
+        if self._client.sensor_slots > 1:
+            # One buffer per slot, the engine rotates between them every tick
+            self._sensor_slots = \
+                self._client.malloc(self._sensor_data_key,
+                                    [self._client.sensor_slots] + list(self.data_shape), self.dtype)
+            self._sensor_data_buffer = self._sensor_slots[0]
+        else:
+            self._sensor_data_buffer = \
+                self._client.malloc(self._sensor_data_key, self.data_shape, self.dtype)
+
+        self._sensor_trace_key = None
+        self._sensor_trace = None
+        if self._client.schedule_depth > 1 and self.traceable:
+            # One row per tick of an action schedule
+            self._sensor_trace_key = self._buffer_name + "_sensor_trace"
+            self._sensor_trace = \
+                self._client.malloc(self._sensor_trace_key,
+                                    [self._client.schedule_depth] + list(self.data_shape),
+                                    self.dtype)
 
         self.config = {} if config is None else config
 
+    @property
+    def sensor_trace(self):
+        """Get the trace of the sensor data over the ticks of the last action schedule (see
+        :meth:`~holodeck.environments.HolodeckEnvironment.step_schedule`).
+
+        Returns:
+            :obj:`np.ndarray` of shape ``(schedule_depth,) + data_shape``: One row per tick, or
+            ``None`` if the sensor isn't traced.
+        """
+        return self._sensor_trace
+
     @property
     def sensor_data(self):
         """Get the sensor data buffer
 
+        When the client has more than one sensor slot, this is the slot written during the last
+        tick. It stays intact until the engine wraps around to that slot again.
+
         Returns:
             :obj:`np.ndarray` of size :obj:`self.data_shape`: Current sensor data
 
         """
+        if self._sensor_slots is not None:
+            return self._sensor_slots[self._client.sensor_slot]
         return self._sensor_data_buffer
 
+    def free(self):
+        """Releases the sensor's shared memory back to the client.
+
+        The sensor data buffer must not be used afterwards.
+        """
+        if self._sensor_data_key is not None:
+            self._client.free(self._sensor_data_key)
+            self._sensor_data_key = None
+        if self._sensor_trace_key is not None:
+            self._client.free(self._sensor_trace_key)
+            self._sensor_trace_key = None
+            self._sensor_trace = None
+
     @property
     def dtype(self):
         """The type of data in the sensor
@@ -155,8 +204,7 @@ class CupGameTask(HolodeckSensor):
             seed = 0  # have to pass a value
         config_command = CustomCommand("CupGameConfig", num_params=[speed, num_shuffles, int(use_seed), seed])
         start_command = CustomCommand("StartCupGame")
-        self._client.command_center.enqueue_command(config_command)
-        self._client.command_center.enqueue_command(start_command)
+        self._client.command_center.enqueue_commands([config_command, start_command], atomic=True)
 
 
 class CleanUpTask(HolodeckSensor):
@@ -217,6 +265,7 @@ class ViewportCapture(HolodeckSensor):
     The default resolution is ``1280x720``, matching the default Viewport resolution.
     """
     sensor_type = "ViewportCapture"
+    traceable = False
 
     def __init__(self, client, agent_name, agent_type,
                  name="ViewportCapture", config=None):
@@ -262,6 +311,7 @@ class RGBCamera(HolodeckSensor):
     """
 
     sensor_type = "RGBCamera"
+    traceable = False
 
     def __init__(self, client, agent_name, agent_type, name="RGBCamera",  config=None):
 
@@ -652,13 +702,11 @@ class SensorDefinition:
         """Gets the configuration dictionary as a string ready for transport
 
         Returns:
-            (:obj:`str`): The configuration as an escaped json string
+            (:obj:`str`): The configuration as a json string. It is escaped when the command it is
+            sent with is encoded.
 
         """
-        param_str = json.dumps(self.config)
-        # Prepare configuration string for transport to the engine
-        param_str = param_str.replace("\"", "\\\"")
-        return param_str
+        return json.dumps(self.config)
 
     def __init__(self, agent_name, agent_type, sensor_name, sensor_type, 
                  socket="", location=(0, 0, 0), rotation=(0, 0, 0), config=None, 
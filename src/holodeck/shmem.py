@@ -1,32 +1,36 @@
 """Shared memory with memory mapping"""
-import ctypes
+import json
 import mmap
 import os
+import sys
+import time
 from functools import reduce
 
 import numpy as np
 
 from holodeck.exceptions import HolodeckException
 
+# Before Python 3.13, mmap keeps a duplicate of the file descriptor open until it is closed
+_MMAP_KWARGS = {"trackfd": False} if sys.version_info >= (3, 13) else {}
+
 
 class Shmem:
     """Implementation of shared memory
 
+    The file descriptor is closed as soon as the block is mapped, the mapping itself lives until
+    :meth:`close` is called (or until the last numpy view of it is garbage collected).
 
     Args:
         name (:obj:`str`): Name the points to the beginning of the shared memory block
         shape (:obj:`int`): Shape of the memory block
         dtype (type, optional): data type of the shared memory. Defaults to np.float32
         uuid (:obj:`str`, optional): UUID of the memory block. Defaults to ""
+        create (:obj:`bool`, optional): If the block should be created (and zeroed). If False, an
+            existing block of the same size is attached to. Defaults to True
     """
-    _numpy_to_ctype = {
-        np.float32: ctypes.c_float,
-        np.uint8: ctypes.c_uint8,
-        np.bool: ctypes.c_bool,
-        np.byte: ctypes.c_byte
-    }
-
-    def __init__(self, name, shape, dtype=np.float32, uuid=""):
+
+    def __init__(self, name, shape, dtype=np.float32, uuid="", create=True):
+        self.name = name
         self.shape = shape
         self.dtype = dtype
         size = reduce(lambda x, y: x * y, shape)
@@ -39,23 +43,263 @@ class Shmem:
             self._mem_pointer = mmap.mmap(0, size_bytes, self._mem_path)
         elif os.name == "posix":
             self._mem_path = "/dev/shm/HOLODECK_MEM" + uuid + "_" + name
+            flags = os.O_CREAT | os.O_TRUNC | os.O_RDWR if create else os.O_RDWR
+            f = os.open(self._mem_path, flags)
+            try:
+                if create:
+                    os.ftruncate(f, size_bytes)
+                    os.fsync(f)
+                self._mem_pointer = mmap.mmap(f, size_bytes, **_MMAP_KWARGS)
+            finally:
+                # The mapping keeps its own reference to the file, so the descriptor isn't needed
+                os.close(f)
+        else:
+            raise HolodeckException("Currently unsupported os: " + os.name)
+
+        self.np_array = np.frombuffer(self._mem_pointer, dtype=dtype, count=size).reshape(shape)
+
+    @property
+    def closed(self):
+        """
+        Returns:
+            :obj:`bool`: If :meth:`close` has been called on this block.
+        """
+        return self._mem_pointer is None
+
+    def close(self):
+        """Releases the memory mapping.
+
+        If numpy views of the block are still alive outside of this object, the mapping is released
+        once the last of them is garbage collected instead.
+        """
+        if self._mem_pointer is None:
+            return
+        self.np_array = None
+        try:
+            self._mem_pointer.close()
+        except BufferError:
+            pass
+        self._mem_pointer = None
+
+    def unlink(self):
+        """Closes and unlinks the shared memory"""
+        self.close()
+        if os.name == "posix":
+            self.__linux_unlink__()
+        elif os.name == "nt":
+            self.__windows_unlink__()
+        else:
+            raise HolodeckException("Currently unsupported os: " + os.name)
+
+    def __linux_unlink__(self):
+        try:
+            os.remove(self._mem_path)
+        except FileNotFoundError:
+            pass
+
+    def __windows_unlink__(self):
+        pass
+
+
+class ShmemArena:
+    """A single shared memory mapping that hands out buffers as slices.
+
+    Instead of creating one shared memory file per buffer, every buffer is carved out of one large
+    page-aligned mapping. The layout is published in a manifest at the start of the mapping so
+    the engine can find each buffer by key.
+
+    The manifest is a small header (generation counter and length, both ``uint64``) followed by a
+    JSON object of the form ``{"blocks": {key: {"offset", "size", "shape", "dtype"}}}``.
+
+    The generation counter works as a sequence lock, since the layout may change while the engine
+    is reading it (e.g. when an agent is spawned while a tick is pending). It is odd while the
+    manifest is being rewritten, and even once it is complete. A reader reads the generation,
+    retries while it is odd, copies the length and JSON, and then reads the generation again. If
+    the two reads differ the copy may be torn and is retried. See :func:`read_arena_manifest`.
+
+    Args:
+        uuid (:obj:`str`, optional): UUID of the environment. Defaults to ""
+        capacity (:obj:`int`, optional): Size of the mapping in bytes. Rounded up to a whole number
+            of pages. Pages are only backed by memory once they are touched, so a generous capacity
+            is cheap. Defaults to 256 MiB.
+    """
+    manifest_bytes = 256 * 1024
+    _header_dtype = np.uint64
+    _cache_line = 64
+
+    def __init__(self, uuid="", capacity=256 * 1024 * 1024):
+        page = mmap.PAGESIZE
+        self.capacity = ((capacity + page - 1) // page) * page
+        if self.capacity <= self.manifest_bytes:
+            raise HolodeckException("Arena capacity must be larger than the manifest")
+
+        self._mem_path = None
+        self._mem_pointer = None
+        if os.name == "nt":
+            self._mem_path = "/HOLODECK_MEM" + uuid + "_ARENA"
+            self._mem_pointer = mmap.mmap(0, self.capacity, self._mem_path)
+        elif os.name == "posix":
+            self._mem_path = "/dev/shm/HOLODECK_MEM" + uuid + "_ARENA"
             f = os.open(self._mem_path, os.O_CREAT | os.O_TRUNC | os.O_RDWR)
-            self._mem_file = f
-            os.ftruncate(f, size_bytes)
-            os.fsync(f)
-
-            # TODO - I think we are leaking a file object here. Unfortunately, we
-            #        can't just .close() it since numpy acquires a reference to it
-            #        below and I can't find a way to release it in __linux_unlink__()
-            self._mem_pointer = mmap.mmap(f, size_bytes)
+            try:
+                os.ftruncate(f, self.capacity)
+                self._mem_pointer = mmap.mmap(f, self.capacity, **_MMAP_KWARGS)
+            finally:
+                os.close(f)
         else:
             raise HolodeckException("Currently unsupported os: " + os.name)
 
-        self.np_array = np.ndarray(shape, dtype=dtype)
-        self.np_array.data = (Shmem._numpy_to_ctype[dtype] * size).from_buffer(self._mem_pointer)
+        self._header = np.frombuffer(self._mem_pointer, dtype=self._header_dtype, count=2)
+        self._bytes = np.frombuffer(self._mem_pointer, dtype=np.uint8)
+        self._blocks = dict()
+        self._holes = []
+        self._used = self.manifest_bytes
+        self._write_manifest()
+
+    @property
+    def used_bytes(self):
+        """
+        Returns:
+            :obj:`int`: Number of bytes of the arena that have been handed out, including the
+            manifest.
+        """
+        return self._used
+
+    @property
+    def blocks(self):
+        """
+        Returns:
+            :obj:`dict` of (:obj:`str`, :class:`ArenaBlock`): The blocks allocated in the arena.
+        """
+        return self._blocks
+
+    def allocate(self, key, shape, dtype=np.float32):
+        """Carves a new block out of the arena.
+
+        Blocks are aligned to a cache line, and blocks of at least one page are aligned to a page.
+
+        Args:
+            key (:obj:`str`): The key to identify the block.
+            shape (:obj:`list` of :obj:`int`): The shape of the numpy array to allocate.
+            dtype (type, optional): The numpy data type. Defaults to np.float32
+
+        Returns:
+            :class:`ArenaBlock`: The block, whose ``np_array`` is positioned on the arena.
+        """
+        size_bytes = np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64))
+        align = mmap.PAGESIZE if size_bytes >= mmap.PAGESIZE else self._cache_line
+
+        offset = self._take_hole(size_bytes, align)
+        if offset is None:
+            offset = ((self._used + align - 1) // align) * align
+            if offset + size_bytes > self.capacity:
+                raise HolodeckException("Shared memory arena is full: allocating {} bytes for {} "
+                                        "would exceed the capacity of {} bytes".format(
+                                            size_bytes, key, self.capacity))
+            self._used = offset + size_bytes
+
+        block = ArenaBlock(self, key, shape, dtype, offset, size_bytes)
+        self._blocks[key] = block
+        self._write_manifest()
+        return block
+
+    def free(self, block):
+        """Returns a block to the arena so its space can be handed out again.
+
+        Args:
+            block (:class:`ArenaBlock`): The block to free.
+        """
+        if self._blocks.get(block.name) is not block:
+            return
+        del self._blocks[block.name]
+        block.np_array = None
+        self._holes.append((block.offset, block.size_bytes))
+        self._write_manifest()
+
+    def rename(self, block, key):
+        """Publishes an existing block under a new key, so it can be reused by another buffer of
+        the same shape without allocating.
+
+        Args:
+            block (:class:`ArenaBlock`): The block to rename.
+            key (:obj:`str`): The new key of the block.
+        """
+        if self._blocks.get(block.name) is block:
+            del self._blocks[block.name]
+        block.name = key
+        self._blocks[key] = block
+        self._write_manifest()
+
+    def _take_hole(self, size_bytes, align):
+        """Finds the first freed region that can fit an aligned block, and splits it."""
+        for i, (hole_offset, hole_size) in enumerate(self._holes):
+            offset = ((hole_offset + align - 1) // align) * align
+            end = hole_offset + hole_size
+            if offset + size_bytes > end:
+                continue
+            del self._holes[i]
+            if offset > hole_offset:
+                self._holes.append((hole_offset, offset - hole_offset))
+            if offset + size_bytes < end:
+                self._holes.append((offset + size_bytes, end - offset - size_bytes))
+            return offset
+        return None
+
+    def snapshot(self, out=None):
+        """Copies the whole used region of the arena in a single copy.
+
+        Args:
+            out (:obj:`np.ndarray`, optional): A ``uint8`` array with at least
+                :attr:`used_bytes` elements to copy into. Allocated if not given.
+
+        Returns:
+            :obj:`np.ndarray`: The snapshot.
+        """
+        if out is None:
+            return np.copy(self._bytes[:self._used])
+        np.copyto(out[:self._used], self._bytes[:self._used])
+        return out
+
+    def restore(self, snapshot):
+        """Restores the data region of the arena from a snapshot taken with :meth:`snapshot`.
+
+        The manifest is left untouched, so the snapshot must have been taken with the same layout.
+
+        Args:
+            snapshot (:obj:`np.ndarray`): The snapshot to restore.
+        """
+        if len(snapshot) != self._used:
+            raise HolodeckException("Snapshot does not match the current arena layout")
+        np.copyto(self._bytes[self.manifest_bytes:self._used],
+                  snapshot[self.manifest_bytes:self._used])
+
+    def manifest(self):
+        """Gets the layout of the arena.
+
+        Returns:
+            :obj:`dict`: The manifest, as published to the engine.
+        """
+        return {"blocks": {key: {"offset": block.offset,
+                                 "size": block.size_bytes,
+                                 "shape": [int(x) for x in block.shape],
+                                 "dtype": np.dtype(block.dtype).str}
+                           for key, block in self._blocks.items()}}
+
+    def _write_manifest(self):
+        encoded = json.dumps(self.manifest()).encode()
+        header_bytes = self._header.nbytes
+        if header_bytes + len(encoded) + 1 > self.manifest_bytes:
+            raise HolodeckException("Shared memory arena manifest is full")
+        # Odd while writing, so readers know to retry
+        self._header[0] += 1
+        self._bytes[header_bytes:header_bytes + len(encoded)] = np.frombuffer(encoded, np.uint8)
+        self._bytes[header_bytes + len(encoded)] = 0
+        self._header[1] = len(encoded)
+        self._header[0] += 1
 
     def unlink(self):
-        """unlinks the shared memory"""
+        """Closes and unlinks the shared memory"""
+        self.close()
         if os.name == "posix":
             self.__linux_unlink__()
         elif os.name == "nt":
@@ -63,9 +307,162 @@ class Shmem:
         else:
             raise HolodeckException("Currently unsupported os: " + os.name)
 
+    def close(self):
+        """Releases the memory mapping of the arena and every block in it."""
+        if self._mem_pointer is None:
+            return
+        for block in self._blocks.values():
+            block.np_array = None
+        self._header = None
+        self._bytes = None
+        try:
+            self._mem_pointer.close()
+        except BufferError:
+            pass
+        self._mem_pointer = None
+
     def __linux_unlink__(self):
-        os.close(self._mem_file)
-        os.remove(self._mem_path)
+        try:
+            os.remove(self._mem_path)
+        except FileNotFoundError:
+            pass
 
     def __windows_unlink__(self):
         pass
+
+
+class ArenaBlock:
+    """A buffer that lives inside a :class:`ShmemArena`.
+
+    Has the same ``shape``, ``dtype`` and ``np_array`` attributes as :class:`Shmem`, so the two
+    can be used interchangeably by :class:`~holodeck.holodeckclient.HolodeckClient`.
+
+    Args:
+        arena (:class:`ShmemArena`): The arena the block lives in
+        name (:obj:`str`): The key of the block
+        shape (:obj:`list` of :obj:`int`): Shape of the block
+        dtype (type): Data type of the block
+        offset (:obj:`int`): Offset of the block from the start of the arena, in bytes
+        size_bytes (:obj:`int`): Size of the block in bytes
+    """
+    def __init__(self, arena, name, shape, dtype, offset, size_bytes):
+        self.arena = arena
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+        self.offset = offset
+        self.size_bytes = size_bytes
+        self.np_array = np.frombuffer(arena._mem_pointer, dtype=dtype,
+                                      count=size_bytes // np.dtype(dtype).itemsize,
+                                      offset=offset).reshape(shape)
+
+    @property
+    def closed(self):
+        """
+        Returns:
+            :obj:`bool`: If the block has been returned to the arena.
+        """
+        return self.np_array is None
+
+    def close(self):
+        """Returns the block to the arena it was allocated from."""
+        self.arena.free(self)
+
+    def unlink(self):
+        """The arena owns the shared memory, so unlinking a block just returns it to the arena."""
+        self.close()
+
+
+def read_arena_manifest(buffer, timeout=1.0):
+    """Reads the manifest of a :class:`ShmemArena` the way the engine does.
+
+    Follows the sequence lock protocol described in :class:`ShmemArena`, so a manifest that is
+    being rewritten concurrently is never returned half written.
+
+    Args:
+        buffer: A buffer (e.g. a :obj:`mmap.mmap`) over the arena.
+        timeout (:obj:`float`, optional): Seconds to keep retrying while the manifest is being
+            written. Defaults to 1.
+
+    Returns:
+        (:obj:`int`, :obj:`dict`): The generation of the manifest, and the manifest.
+    """
+    header = np.frombuffer(buffer, dtype=ShmemArena._header_dtype, count=2)
+    start = header.nbytes
+    deadline = time.monotonic() + timeout
+    while True:
+        generation = int(header[0])
+        if generation % 2 == 0:
+            length = int(header[1])
+            encoded = bytes(buffer[start:start + min(length, ShmemArena.manifest_bytes - start)])
+            if int(header[0]) == generation:
+                return generation, json.loads(encoded.decode())
+        if time.monotonic() > deadline:
+            raise HolodeckException("Timed out waiting for the arena manifest to be written")
+
+
+def sweep_orphaned_segments(min_age=10):
+    """Removes shared memory segments and semaphores left behind by Holodeck runs that crashed.
+
+    A ``HOLODECK_MEM*`` segment or ``HOLODECK_SEMAPHORE_*``/``HOLODECK_LOADING_SEM*`` semaphore in
+    ``/dev/shm`` is considered orphaned if it belongs to the current user, no running process has it
+    mapped or open, and it hasn't been modified for ``min_age`` seconds.
+
+    Does nothing on platforms other than Linux, where these objects are cleaned up by the OS.
+
+    Args:
+        min_age (:obj:`float`, optional): Minimum age in seconds of an object before it is
+            removed, so that objects of an environment that is just starting up are left alone.
+            Defaults to 10.
+
+    Returns:
+        :obj:`list` of :obj:`str`: The paths that were removed.
+    """
+    shm_dir = "/dev/shm"
+    if os.name != "posix" or not os.path.isdir(shm_dir) or not os.path.isdir("/proc"):
+        return []
+
+    prefixes = ("HOLODECK_MEM", "sem.HOLODECK_SEMAPHORE_", "sem.HOLODECK_LOADING_SEM")
+    candidates = [os.path.join(shm_dir, name) for name in os.listdir(shm_dir)
+                  if name.startswith(prefixes)]
+    if not candidates:
+        return []
+
+    in_use = _shm_paths_in_use()
+    uid = os.getuid()
+    now = time.time()
+    removed = []
+    for path in candidates:
+        if path in in_use:
+            continue
+        try:
+            stat = os.stat(path)
+            if stat.st_uid != uid or now - stat.st_mtime < min_age:
+                continue
+            os.remove(path)
+        except OSError:
+            continue
+        removed.append(path)
+    return removed
+
+
+def _shm_paths_in_use():
+    """Gets every path under ``/dev/shm`` that a process has mapped or open."""
+    in_use = set()
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open("/proc/" + pid + "/maps") as maps:
+                for line in maps:
+                    index = line.find("/dev/shm/")
+                    if index != -1:
+                        in_use.add(line[index:].rstrip("\n").replace(" (deleted)", ""))
+            fd_dir = "/proc/" + pid + "/fd"
+            for fd in os.listdir(fd_dir):
+                target = os.readlink(fd_dir + "/" + fd)
+                if target.startswith("/dev/shm/"):
+                    in_use.add(target)
+        except OSError:
+            continue
+    return in_use
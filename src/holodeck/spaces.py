@@ -1,4 +1,6 @@
 """Contains action space definitions"""
+import copy
+
 import numpy as np
 
 
@@ -11,20 +13,57 @@ class ActionSpace:
             written to the shared memory.
 
             Only use this when it is different from shape.
+
+    Each action space samples from its own random generator, see :meth:`seed`.
     """
     def __init__(self, shape, buffer_shape=None):
         super(ActionSpace, self).__init__()
         self._shape = shape
         self.buffer_shape = buffer_shape or shape
+        self._rng = np.random.default_rng()
+
+    def seed(self, seed=None):
+        """Seeds the random generator of the action space.
+
+        Action spaces are copied into forked worker processes with the state of their generator.
+        To sample different actions in each worker, seed them with e.g.
+        ``[base_seed, worker_index]``.
+
+        Args:
+            seed (:obj:`int` or :obj:`list` of :obj:`int`, optional): The seed, anything
+                :func:`numpy.random.default_rng` accepts. Defaults to fresh entropy from the OS.
+        """
+        self._rng = np.random.default_rng(seed)
 
-    def sample(self):
+    def sample(self, n=None):
         """Sample from the action space.
 
+        Args:
+            n (:obj:`int`, optional): Number of actions to sample at once. Defaults to a single
+                action.
+
         Returns:
-            (:obj:`np.ndarray`): A valid command to be input to step or tick.
+            (:obj:`np.ndarray`): A valid command to be input to step or tick, or ``[n, ...]``
+            commands if ``n`` is given.
         """
         raise NotImplementedError("Must be implemented by child class")
 
+    def spawn(self):
+        """Copies the action space. The copy shares the (read-only) bounds of this space, but
+        samples from a random generator of its own.
+
+        Returns:
+            :class:`ActionSpace`: The copy.
+        """
+        space = copy.copy(self)
+        space._rng = np.random.default_rng()
+        return space
+
+    def _sample_shape(self, n):
+        if n is None:
+            return tuple(self._shape)
+        return (n,) + tuple(self._shape)
+
     @property
     def shape(self):
         """Get the shape of the action space.
@@ -50,6 +89,44 @@ class ActionSpace:
         """
         raise NotImplementedError('Must be implemented by the child class')
 
+    def clip(self, action):
+        """Clips an action to the action space.
+
+        Args:
+            action (:obj:`np.ndarray`): The action, of :attr:`shape`.
+
+        Returns:
+            (:obj:`np.ndarray`): The closest valid action.
+        """
+        raise NotImplementedError('Must be implemented by the child class')
+
+    def clip_batch(self, actions):
+        """Clips a batch of actions to the action space.
+
+        Args:
+            actions (:obj:`np.ndarray`): ``[N, ...]`` actions, each of :attr:`shape`.
+
+        Returns:
+            (:obj:`np.ndarray`): The closest valid actions.
+        """
+        actions = np.asarray(actions)
+        if actions.shape[1:] != tuple(self._shape):
+            raise ValueError("Expected a batch of actions of shape {}, got {}".format(
+                self._shape, actions.shape[1:]))
+        return self.clip(actions)
+
+    def contains(self, action):
+        """Checks if an action is in the action space.
+
+        Args:
+            action (:obj:`np.ndarray`): The action.
+
+        Returns:
+            (:obj:`bool`): If the action has the shape of the action space, and is within its
+            bounds.
+        """
+        raise NotImplementedError('Must be implemented by the child class')
+
 
 class ContinuousActionSpace(ActionSpace):
     """Action space that takes floating point inputs.
@@ -58,10 +135,14 @@ class ContinuousActionSpace(ActionSpace):
         shape (:obj:`list` of :obj:`int`): The shape of data that should be input to step or tick.
         sample_fn (function, optional): A function that takes a shape parameter and outputs a
             sampled command.
+
+            If this is not given, values with both bounds are sampled uniformly between them, and
+            the others from a unit gaussian, clipped to the bound they have.
         low (:obj:`list` of :obj:`float` or :obj:`float`): the low value(s) for the action space. Can be a scalar or an array
         high (:obj:`list` of :obj:`float` or :obj:`float`): the high value(s) for the action space. Cand be a scalar or an array
 
-            If this is not given, it will default to sampling from a unit gaussian.
+            The bounds are stored as ``float32`` arrays of the shape of the space. Missing bounds
+            (``None``) are unbounded, ``-inf`` and ``inf``.
         buffer_shape (:obj:`list` of :obj:`int`, optional): The shape of the data that will be
             written to the shared memory.
 
@@ -69,9 +150,24 @@ class ContinuousActionSpace(ActionSpace):
         """
     def __init__(self, shape, low=None, high=None, sample_fn=None, buffer_shape=None):
         super(ContinuousActionSpace, self).__init__(shape, buffer_shape=buffer_shape)
-        self.sample_fn = sample_fn or ContinuousActionSpace._default_sample_fn
-        self._low = low
-        self._high = high
+        self.sample_fn = sample_fn
+        self._low = ContinuousActionSpace._bound(low, shape, -np.inf)
+        self._high = ContinuousActionSpace._bound(high, shape, np.inf)
+        # Uniform samples are low + width * [0, 1), the width is 0 where a bound is missing
+        self._bounded = np.isfinite(self._low) & np.isfinite(self._high)
+        self._offset = np.where(self._bounded, self._low, 0).astype(np.float32)
+        self._width = np.where(self._bounded, self._high - self._low, 0).astype(np.float32)
+
+    @staticmethod
+    def _bound(bound, shape, default):
+        if bound is None:
+            bound = default
+        elif isinstance(bound, (list, tuple)):
+            bound = [default if x is None else x for x in bound]
+        bound = np.array(np.broadcast_to(np.asarray(bound, dtype=np.float32), shape))
+        # Shared by the spaces of every agent of a type, see HolodeckAgent.control_schemes
+        bound.flags.writeable = False
+        return bound
 
     def get_low(self):
         return self._low
@@ -79,16 +175,31 @@ class ContinuousActionSpace(ActionSpace):
     def get_high(self):
         return self._high
 
-    def sample(self):
-        return self.sample_fn(self._shape)
+    def clip(self, action):
+        # Cheaper than np.clip for the small arrays of a single action
+        return np.minimum(np.maximum(action, self._low), self._high)
+
+    def contains(self, action):
+        action = np.asarray(action)
+        return action.shape == self._low.shape and \
+            bool(np.logical_and(action >= self._low, action <= self._high).all())
+
+    def sample(self, n=None):
+        shape = self._sample_shape(n)
+        if self.sample_fn is not None:
+            return self.sample_fn(shape)
+
+        uniform = self._rng.random(shape, dtype=np.float32)
+        uniform *= self._width
+        uniform += self._offset
+        if self._bounded.all():
+            return uniform
+        gaussian = self.clip(self._rng.standard_normal(shape, dtype=np.float32))
+        return np.where(self._bounded, uniform, gaussian)
 
     def __repr__(self):
         return "[ContinuousActionSpace " + str(self._shape) + "]"
 
-    @staticmethod
-    def _default_sample_fn(shape):
-        return np.random.normal(size=shape)
-
 
 class DiscreteActionSpace(ActionSpace):
     """Action space that takes integer inputs.
@@ -108,8 +219,8 @@ class DiscreteActionSpace(ActionSpace):
         self._low = low
         self._high = high
 
-    def sample(self):
-        return np.random.randint(self._low, self._high, self._shape, dtype=np.int32)
+    def sample(self, n=None):
+        return self._rng.integers(self._low, self._high, self._sample_shape(n), dtype=np.int32)
 
     def get_low(self):
         return self._low
@@ -117,6 +228,16 @@ class DiscreteActionSpace(ActionSpace):
     def get_high(self):
         return self._high
 
+    def clip(self, action):
+        # Values are sampled from [low, high)
+        return np.clip(np.rint(action), self._low, self._high - 1).astype(np.int32)
+
+    def contains(self, action):
+        action = np.asarray(action)
+        return action.shape == tuple(self._shape) and \
+            bool(np.logical_and(action >= self._low, action < self._high).all()) and \
+            bool((np.mod(action, 1) == 0).all())
+
     def __repr__(self):
         return "[DiscreteActionSpace " + str(self._shape) + ", min: " +\
                str(self._low) + ", max: " + str(self._high) + "]"
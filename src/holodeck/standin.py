@@ -0,0 +1,395 @@
+"""A stand-in for the engine side of the shared memory protocol, written in Python.
+
+Lets the client be exercised, tested and benchmarked without a world binary.
+
+:class:`StandInServer` only serves the tick handshake. :class:`StandInEngine` also reads the
+commands, keeps track of the agents and sensors, and writes synthetic sensor data, so it can be used
+in place of a world binary. It is started like one, by passing the ``holodeck-standin`` script (or
+any executable that runs ``python -m holodeck.standin``) as ``binary_path``:
+
+.. code-block:: python
+
+    env = HolodeckEnvironment(scenario=scenario, binary_path=holodeck.standin.binary_path())
+
+There is no physics: agents only move when they are teleported.
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+from holodeck.exceptions import HolodeckException
+from holodeck.sensors import SensorDefinition
+from holodeck.shmem import Shmem
+from holodeck.sync import make_sync_backend
+
+
+class StandInServer:
+    """Serves the engine side of the tick handshake.
+
+    The server creates the synchronization objects, signals the client once (like the engine does
+    when it has finished loading), and then answers every release from the client with one call to
+    :meth:`tick`.
+
+    Args:
+        uuid (:obj:`str`, optional): UUID of the environment to serve. Defaults to "".
+        sync_backend (:obj:`str`, optional): The :mod:`holodeck.sync` backend to serve.
+            Defaults to ``"semaphore"``.
+    """
+
+    def __init__(self, uuid="", sync_backend="semaphore"):
+        self._uuid = uuid
+        self._sync = make_sync_backend(sync_backend, uuid, server=True)
+        self.ticks = 0
+
+    def tick(self):
+        """Does the work of one engine tick. The handshake-only server does nothing."""
+
+    def serve(self, max_ticks=None):
+        """Serves ticks until ``max_ticks`` have been served, or forever.
+
+        Args:
+            max_ticks (:obj:`int`, optional): Number of ticks to serve before returning.
+        """
+        self._sync.release()
+        while max_ticks is None or self.ticks < max_ticks:
+            self._sync.acquire()
+            self.tick()
+            self.ticks += 1
+            self._sync.release()
+
+    def unlink(self):
+        """Removes the synchronization objects."""
+        self._sync.unlink()
+
+
+def _run_server(server_class, ready, kwargs):
+    server = server_class(**kwargs)
+    ready.set()
+    server.serve()
+
+
+def start_server_process(uuid, sync_backend="semaphore", server_class=StandInServer, **kwargs):
+    """Starts a stand-in server in a separate process, and waits until a client can connect.
+
+    The process serves until it is terminated.
+
+    Args:
+        uuid (:obj:`str`): UUID of the environment to serve.
+        sync_backend (:obj:`str`, optional): The :mod:`holodeck.sync` backend to serve.
+            Defaults to ``"semaphore"``.
+        server_class (type, optional): The :class:`StandInServer` subclass to run.
+        **kwargs: Passed on to the server class.
+
+    Returns:
+        :obj:`multiprocessing.Process`: The server process.
+    """
+    ready = multiprocessing.Event()
+    kwargs.update(uuid=uuid, sync_backend=sync_backend)
+    process = multiprocessing.Process(target=_run_server, args=(server_class, ready, kwargs),
+                                      daemon=True)
+    process.start()
+    if not ready.wait(10):
+        process.terminate()
+        raise HolodeckException("Timed out waiting for the stand-in server to start")
+    return process
+
+
+class _StandInSensor:
+    """A sensor of the stand-in engine and the views of its buffers."""
+
+    def __init__(self, sensor_type, data, trace):
+        self.sensor_type = sensor_type
+        self.data = data
+        self.trace = trace
+        self.ticks_per_capture = 1
+        self.is_task = "Task" in sensor_type
+        # The data written during the last tick, which is one of the slots if there are several
+        self.current = data[0] if data.ndim > 1 else data
+
+
+class StandInEngine(StandInServer):
+    """Serves the engine side of the whole protocol, without a world.
+
+    Every tick it:
+
+    - resets the world when the ``RESET`` flag is set, dropping every agent,
+    - reads the commands the :class:`~holodeck.command.CommandCenter` wrote, and honours
+      ``SpawnAgent``, ``AddSensor``, ``RemoveSensor`` and ``RGBCameraRate``. Every command is
+      counted in :attr:`commands`, the others are otherwise ignored,
+    - applies teleports,
+    - writes synthetic data into every sensor: the agent location into a ``LocationSensor``, a
+      reward and terminal of 0 into tasks, and either noise or a constant into everything else,
+    - publishes the slot it wrote when there are several sensor slots, and runs the requested
+      number of ticks, recording sensor traces, for action schedules.
+
+    The shared memory arena isn't supported.
+
+    Args:
+        uuid (:obj:`str`, optional): UUID of the environment to serve. Defaults to "".
+        sync_backend (:obj:`str`, optional): The :mod:`holodeck.sync` backend to serve.
+            Defaults to ``"semaphore"``.
+        sensor_slots (:obj:`int`, optional): Number of sensor slots the client was created with.
+            Defaults to 1.
+        schedule_depth (:obj:`int`, optional): The schedule depth the client was created with.
+            Defaults to 1.
+        fill (:obj:`str`, optional): How sensor data is written. ``"random"`` writes noise, which
+            costs about as much memory bandwidth as a real engine writing its sensors.
+            ``"constant"`` writes the tick number, which is cheaper and reproducible. ``"none"``
+            leaves the buffers alone. Defaults to ``"random"``.
+        tick_time (:obj:`float`, optional): Seconds every tick takes at least, to stand in for the
+            simulation itself. Defaults to 0.
+        seed (:obj:`int`, optional): Seed for the noise.
+    """
+
+    def __init__(self, uuid="", sync_backend="semaphore", sensor_slots=1, schedule_depth=1,
+                 fill="random", tick_time=0.0, seed=None):
+        super(StandInEngine, self).__init__(uuid, sync_backend)
+        if fill not in ("random", "constant", "none"):
+            raise HolodeckException("Unknown fill {}, expected \"random\", \"constant\" or "
+                                    "\"none\"".format(fill))
+        self.sensor_slots = sensor_slots
+        self.schedule_depth = schedule_depth
+        self.fill = fill
+        self.tick_time = tick_time
+        self._rng = np.random.default_rng(seed)
+
+        #: :obj:`dict`: Agent name to a dict with its ``type``, ``location`` and ``sensors``.
+        self.agents = dict()
+        #: :obj:`collections.Counter`: How many commands of each type were received.
+        self.commands = Counter()
+        #: :obj:`int`: How many times the world was reset.
+        self.resets = 0
+        #: :obj:`int`: How many ticks the world ran, which is more than :attr:`ticks` when
+        #: action schedules are used.
+        self.world_ticks = 0
+        self._buffers = dict()
+        self._decoder = json.JSONDecoder()
+
+    def tick(self):
+        started = time.perf_counter()
+        reset = self._buffer("RESET", np.bool)
+        if reset is not None and reset[0]:
+            self._reset()
+            reset[0] = False
+
+        command_bool = self._buffer("command_bool", np.bool)
+        if command_bool is not None and command_bool[0]:
+            for command in self._read_commands():
+                self._handle_command(command)
+            command_bool[0] = False
+
+        schedule = self._buffer("schedule_header", np.uint32) if self.schedule_depth > 1 \
+            else None
+        if schedule is not None and schedule[0] > 0:
+            for i in range(min(int(schedule[0]), self.schedule_depth)):
+                terminal = self._simulate()
+                for agent in self.agents.values():
+                    for sensor in agent["sensors"].values():
+                        if sensor.trace is not None:
+                            sensor.trace[i] = sensor.current
+                schedule[1] = i + 1
+                if terminal:
+                    break
+        else:
+            self._simulate()
+
+        if self.tick_time > 0:
+            remaining = self.tick_time - (time.perf_counter() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def _simulate(self):
+        """Runs one tick of the world, and returns whether a task reported a terminal."""
+        tick = self.world_ticks
+        slot = tick % self.sensor_slots
+        terminal = False
+        for agent in self.agents.values():
+            self._teleport(agent)
+            for sensor in agent["sensors"].values():
+                data = sensor.data[slot] if self.sensor_slots > 1 else sensor.data
+                sensor.current = data
+                if sensor.is_task:
+                    # Tasks never score and never end
+                    data[:] = 0
+                elif sensor.sensor_type == "LocationSensor":
+                    data[:] = agent["location"]
+                elif tick % sensor.ticks_per_capture == 0:
+                    self._fill(data, tick)
+
+        header = self._buffer("sensor_header", np.uint64) if self.sensor_slots > 1 else None
+        if header is not None:
+            header[0] = tick
+            header[1] = slot
+        self.world_ticks += 1
+        return terminal
+
+    def _fill(self, data, tick):
+        if self.fill == "none":
+            return
+        if self.fill == "constant" or data.dtype.kind != "f":
+            data[...] = tick % 128 if self.fill == "constant" else \
+                self._rng.integers(0, 128, data.shape, dtype=np.uint8)
+        else:
+            self._rng.standard_normal(data.shape, dtype=data.dtype, out=data)
+
+    def _teleport(self, agent):
+        flag = agent["teleport_flag"]
+        if flag is None or flag[0] == 0:
+            return
+        # Bit 0: location, the other bits are rotation and velocities that aren't simulated
+        if flag[0] & 1:
+            agent["location"][:] = agent["teleport_command"][0:3]
+        flag[0] = 0
+
+    def _read_commands(self):
+        raw = self._buffer("command_buffer", np.byte)
+        # The buffer isn't cleared between writes, so only the first JSON value is read
+        end = np.flatnonzero(raw == 0)
+        data = raw[:end[0]] if len(end) else raw
+        text = data.tobytes().decode("utf-8", errors="replace")
+        try:
+            commands, _ = self._decoder.raw_decode(text)
+        except ValueError:
+            self.commands["<invalid>"] += 1
+            return []
+        return commands.get("commands", [])
+
+    def _handle_command(self, command):
+        command_type = command.get("type")
+        params = [param["value"] for param in command.get("params", [])]
+        self.commands[command_type] += 1
+
+        if command_type == "SpawnAgent":
+            location, _, agent_type, name = params[0:3], params[3:6], params[6], params[7]
+            self.agents[name] = dict(
+                type=agent_type, location=np.array(location, dtype=np.float32), sensors=dict(),
+                teleport_flag=self._buffer(name + "_teleport_flag", np.uint8, cache=False),
+                teleport_command=self._buffer(name + "_teleport_command", np.float32,
+                                              cache=False))
+        elif command_type == "AddSensor":
+            agent_name, sensor_name, sensor_type = params[0:3]
+            agent = self.agents.get(agent_name)
+            sensor_class = SensorDefinition._sensor_keys_.get(sensor_type)
+            if agent is None or sensor_class is None:
+                return
+            dtype = sensor_class.dtype.fget(None)
+            key = agent_name + "_" + sensor_name
+            data = self._buffer(key + "_sensor_data", dtype, cache=False)
+            if data is None:
+                return
+            if self.sensor_slots > 1:
+                data = data.reshape(self.sensor_slots, -1)
+            trace = None
+            if self.schedule_depth > 1:
+                trace = self._buffer(key + "_sensor_trace", dtype, cache=False)
+                if trace is not None:
+                    trace = trace.reshape(self.schedule_depth, -1)
+            agent["sensors"][sensor_name] = _StandInSensor(sensor_type, data, trace)
+        elif command_type == "RemoveSensor":
+            agent = self.agents.get(params[0])
+            if agent is not None:
+                agent["sensors"].pop(params[1], None)
+        elif command_type == "RGBCameraRate":
+            agent = self.agents.get(params[0])
+            if agent is not None and params[1] in agent["sensors"]:
+                agent["sensors"][params[1]].ticks_per_capture = max(int(params[2]), 1)
+
+    def _reset(self):
+        self.resets += 1
+        self.agents = dict()
+
+    def _buffer(self, key, dtype, cache=True):
+        """Attaches to a buffer the client allocated, as a flat array. Returns None if the client
+        hasn't allocated it yet."""
+        if cache and key in self._buffers:
+            return self._buffers[key]
+        path = "/dev/shm/HOLODECK_MEM" + self._uuid + "_" + key
+        try:
+            size = os.path.getsize(path) // np.dtype(dtype).itemsize
+            buffer = Shmem(key, [size], dtype, self._uuid, create=False).np_array
+        except (FileNotFoundError, ValueError):
+            return None
+        if cache:
+            self._buffers[key] = buffer
+        return buffer
+
+
+def binary_path(directory=None):
+    """Gives an executable that starts a :class:`StandInEngine`, to pass as ``binary_path``.
+
+    That is the ``holodeck-standin`` script if it is installed. Otherwise a launcher that runs
+    ``python -m holodeck.standin`` with the current interpreter is written.
+
+    Args:
+        directory (:obj:`str`, optional): Where to write the launcher if there is no installed
+            script. Defaults to a new temporary directory.
+
+    Returns:
+        :obj:`str`: Path of the executable.
+    """
+    script = shutil.which("holodeck-standin")
+    if script is not None:
+        return script
+
+    directory = tempfile.mkdtemp(prefix="holodeck-standin") if directory is None else directory
+    path = os.path.join(directory, "holodeck-standin")
+    with open(path, "w") as launcher:
+        launcher.write("#!/bin/sh\nexec {} -m holodeck.standin \"$@\"\n".format(sys.executable))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
+
+
+def _parse_engine_args(argv):
+    """Reads the options of :class:`StandInEngine` from the command line of a world binary."""
+    options = dict(uuid="", sync_backend="semaphore", sensor_slots=1, schedule_depth=1)
+    for arg in argv:
+        name, _, value = arg.lstrip("-").partition("=")
+        if name == "HolodeckUUID":
+            options["uuid"] = value
+        elif name == "HolodeckSync":
+            options["sync_backend"] = value
+        elif name == "HolodeckSensorSlots":
+            options["sensor_slots"] = int(value)
+        elif name == "HolodeckScheduleDepth":
+            options["schedule_depth"] = int(value)
+        elif name == "HolodeckArena":
+            raise HolodeckException("The stand-in engine doesn't support the shared memory arena")
+    return options
+
+
+def main(argv=None):
+    """Runs a :class:`StandInEngine` with the command line a world binary is started with.
+
+    The options that have no command line flag are read from the environment:
+    ``HOLODECK_STANDIN_FILL``, ``HOLODECK_STANDIN_TICK_TIME`` and ``HOLODECK_STANDIN_SEED``.
+    """
+    import posix_ipc
+    options = _parse_engine_args(sys.argv[1:] if argv is None else argv)
+    options["fill"] = os.environ.get("HOLODECK_STANDIN_FILL", "random")
+    options["tick_time"] = float(os.environ.get("HOLODECK_STANDIN_TICK_TIME", 0))
+    if "HOLODECK_STANDIN_SEED" in os.environ:
+        options["seed"] = int(os.environ["HOLODECK_STANDIN_SEED"])
+    engine = StandInEngine(**options)
+
+    # Tell the client that loading has finished. The client creates the semaphore before starting
+    # the engine, it is only created here when the stand-in is run on its own
+    loading_semaphore = posix_ipc.Semaphore("/HOLODECK_LOADING_SEM" + options["uuid"],
+                                            os.O_CREAT, initial_value=0)
+    loading_semaphore.release()
+    loading_semaphore.close()
+    try:
+        engine.serve()
+    finally:
+        engine.unlink()
+
+
+if __name__ == "__main__":
+    main()
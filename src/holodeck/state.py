@@ -0,0 +1,124 @@
+"""Containers for the states returned by an environment."""
+import weakref
+from collections.abc import MutableMapping
+
+import numpy as np
+
+
+class LazyState(MutableMapping):
+    """A state dictionary that copies each sensor buffer the first time it is read.
+
+    Returned by :class:`~holodeck.environments.HolodeckEnvironment` when it was created with
+    ``copy_state="lazy"``. Sensors that are never read are never copied. When the environment
+    starts its next tick, which overwrites the sensor buffers, every outstanding lazy state
+    :meth:`expires <expire>`: the sensors that were read keep their copies, and the ones that
+    weren't are dropped from the state. To keep a whole state across ticks, call
+    :meth:`materialize` before the next tick.
+
+    Nested dictionaries (e.g. one per agent) are themselves lazy states.
+
+    Args:
+        source (:obj:`dict`): The state to copy from, with arrays that point at shared memory.
+        tracker (:obj:`list`, optional): List the state, and the nested states it creates, add a
+            weak reference to themselves to, so they can be materialized before the next tick.
+        on_copy (callable, optional): Called with the number of bytes of every copy made.
+    """
+
+    def __init__(self, source, tracker=None, on_copy=None):
+        self._source = source
+        self._tracker = tracker
+        self._on_copy = on_copy
+        self._copies = dict()
+        self._expired = False
+        self.bytes_copied = 0
+        if tracker is not None:
+            tracker.append(weakref.ref(self))
+
+    @property
+    def materialized(self):
+        """
+        Returns:
+            :obj:`bool`: If every entry has been copied, and the state no longer points at the
+            sensor buffers.
+        """
+        return self._source is None
+
+    @property
+    def expired(self):
+        """
+        Returns:
+            :obj:`bool`: If the entries that weren't read before the next tick were dropped.
+        """
+        return self._expired
+
+    def materialize(self):
+        """Copies every entry that hasn't been copied yet."""
+        if self._source is None:
+            return
+        for key in self._source:
+            if key not in self._copies:
+                self._copy(key)
+        for value in self._copies.values():
+            if isinstance(value, LazyState):
+                value.materialize()
+        self._source = None
+
+    def expire(self):
+        """Drops the entries that haven't been copied yet, because the buffers they point at are
+        about to be overwritten. The entries that were read are kept."""
+        if self._source is None:
+            return
+        self._source = None
+        self._expired = True
+        for value in self._copies.values():
+            if isinstance(value, LazyState):
+                value.expire()
+
+    def _copy(self, key):
+        value = self._source[key]
+        if isinstance(value, dict):
+            copy = LazyState(value, self._tracker, self._on_copy)
+        else:
+            copy = np.copy(value)
+            self.bytes_copied += copy.nbytes
+            if self._on_copy is not None:
+                self._on_copy(copy.nbytes)
+        self._copies[key] = copy
+        return copy
+
+    def __getitem__(self, key):
+        if key in self._copies:
+            return self._copies[key]
+        if self._source is None:
+            if self._expired:
+                raise KeyError("{} wasn't read before the next tick, so it was dropped from the "
+                               "lazy state".format(key))
+            raise KeyError(key)
+        return self._copy(key)
+
+    def __setitem__(self, key, value):
+        self._copies[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._copies.pop(key, None)
+        if self._source is not None and key in self._source:
+            # The source belongs to the environment, so the key is hidden rather than removed
+            self._source = {k: v for k, v in self._source.items() if k != key}
+
+    def __contains__(self, key):
+        return key in self._copies or (self._source is not None and key in self._source)
+
+    def __iter__(self):
+        yield from self._copies
+        if self._source is not None:
+            for key in self._source:
+                if key not in self._copies:
+                    yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return "LazyState({})".format(list(self))
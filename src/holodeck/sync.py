@@ -0,0 +1,314 @@
+"""Backends for the tick handshake between the client and the engine.
+
+Every tick, the client releases the engine and then waits for it to finish. A backend provides the
+two halves of that handshake for either side: on the client, :meth:`~SyncBackend.release` lets the
+engine take a step and :meth:`~SyncBackend.acquire` waits until it is done. On the server (engine)
+side the roles are swapped.
+"""
+import ctypes
+import errno
+import mmap
+import os
+import platform
+import time
+
+from holodeck.exceptions import HolodeckException
+
+
+class SyncBackend:
+    """Base class for a tick handshake backend.
+
+    Args:
+        uuid (:obj:`str`, optional): UUID of the environment. Defaults to "".
+        should_timeout (:obj:`bool`, optional): If waiting for the other side should time out.
+            Defaults to False.
+        server (:obj:`bool`, optional): If this is the engine side of the handshake. The server
+            creates the synchronization objects, the client opens them. Defaults to False.
+    """
+    name = ""
+
+    def __init__(self, uuid="", should_timeout=False, server=False):
+        self._uuid = uuid
+        self.should_timeout = should_timeout
+        self.server = server
+
+    def acquire(self):
+        """Waits until the other side has released control.
+
+        Raises:
+            TimeoutError: If ``should_timeout`` is set and the other side didn't respond in time.
+        """
+        raise NotImplementedError("Child class must implement this function")
+
+    def release(self):
+        """Releases control to the other side."""
+        raise NotImplementedError("Child class must implement this function")
+
+    def unlink(self):
+        """Removes the synchronization objects."""
+        raise NotImplementedError("Child class must implement this function")
+
+
+class SemaphoreSync(SyncBackend):
+    """Handshake over two named semaphores, ``HOLODECK_SEMAPHORE_SERVER`` and
+    ``HOLODECK_SEMAPHORE_CLIENT``. This is the default backend and the one every world binary
+    supports.
+
+    Every acquire and release is a system call.
+    """
+    name = "semaphore"
+
+    def __init__(self, uuid="", should_timeout=False, server=False):
+        super(SemaphoreSync, self).__init__(uuid, should_timeout, server)
+        self._server_semaphore = None
+        self._client_semaphore = None
+        self._acquire_fn = None
+
+        if os.name == "nt":
+            self.__windows_init__()
+        elif os.name == "posix":
+            self.__posix_init__()
+        else:
+            raise HolodeckException("Currently unsupported os: " + os.name)
+
+        # The client waits on the client semaphore and posts the server semaphore, and vice versa
+        if self.server:
+            self._wait_semaphore = self._server_semaphore
+            self._post_semaphore = self._client_semaphore
+        else:
+            self._wait_semaphore = self._client_semaphore
+            self._post_semaphore = self._server_semaphore
+
+    def __windows_init__(self):
+        import win32event
+        semaphore_all_access = 0x1F0003
+
+        self.timeout = 5000 if self.should_timeout else win32event.INFINITE
+
+        server_name = "Global\\HOLODECK_SEMAPHORE_SERVER" + self._uuid
+        client_name = "Global\\HOLODECK_SEMAPHORE_CLIENT" + self._uuid
+        if self.server:
+            self._server_semaphore = win32event.CreateSemaphore(None, 0, 1, server_name)
+            self._client_semaphore = win32event.CreateSemaphore(None, 0, 1, client_name)
+        else:
+            self._server_semaphore = \
+                win32event.OpenSemaphore(semaphore_all_access, False, server_name)
+            self._client_semaphore = \
+                win32event.OpenSemaphore(semaphore_all_access, False, client_name)
+
+        def windows_acquire_semaphore(sem):
+            result = win32event.WaitForSingleObject(sem, self.timeout)
+
+            if result != win32event.WAIT_OBJECT_0:
+                raise TimeoutError("Timed out or error waiting for engine!")
+
+        def windows_release_semaphore(sem):
+            win32event.ReleaseSemaphore(sem, 1)
+
+        def windows_unlink():
+            pass
+
+        self._acquire_fn = windows_acquire_semaphore
+        self._release_fn = windows_release_semaphore
+        self._unlink_fn = windows_unlink
+
+    def __posix_init__(self):
+        import posix_ipc
+        flags = os.O_CREAT if self.server else 0
+        self._server_semaphore = \
+            posix_ipc.Semaphore("/HOLODECK_SEMAPHORE_SERVER" + self._uuid, flags, initial_value=0)
+        self._client_semaphore = \
+            posix_ipc.Semaphore("/HOLODECK_SEMAPHORE_CLIENT" + self._uuid, flags, initial_value=0)
+
+        # Unfortunately, OSX doesn't support sem_timedwait(), so setting this timeout
+        # does nothing.
+        self.timeout = 60 if self.should_timeout else None
+
+        def posix_acquire_semaphore(sem):
+            try:
+                sem.acquire(self.timeout)
+            except posix_ipc.BusyError:
+                raise TimeoutError("Timed out waiting for engine!")
+
+        def posix_release_semaphore(sem):
+            sem.release()
+
+        def posix_unlink():
+            for sem in (self._server_semaphore, self._client_semaphore):
+                try:
+                    posix_ipc.unlink_semaphore(sem.name)
+                except posix_ipc.ExistentialError:
+                    pass
+
+        self._acquire_fn = posix_acquire_semaphore
+        self._release_fn = posix_release_semaphore
+        self._unlink_fn = posix_unlink
+
+    def acquire(self):
+        self._acquire_fn(self._wait_semaphore)
+
+    def release(self):
+        self._release_fn(self._post_semaphore)
+
+    def unlink(self):
+        self._unlink_fn()
+
+
+class FutexSync(SyncBackend):
+    """Handshake over two counters in shared memory, with an adaptive spin-then-block wait.
+
+    Releasing increments the counter the other side waits on and wakes it with a futex. Waiting
+    first spins on the counter for a while, and only goes to sleep in a futex wait if the other
+    side hasn't answered yet. The number of spins adapts: it grows while waits finish during the
+    spin, and shrinks when they don't, so the backend doesn't burn a core on long ticks. For short
+    ticks (e.g. scenarios without cameras) this avoids the sleep/wake-up latency of a semaphore.
+
+    Linux only. The engine must be started with ``-HolodeckSync=futex``.
+
+    Args:
+        uuid (:obj:`str`, optional): UUID of the environment. Defaults to "".
+        should_timeout (:obj:`bool`, optional): If waiting for the other side should time out
+            after 60 seconds. Defaults to False.
+        server (:obj:`bool`, optional): If this is the engine side of the handshake.
+            Defaults to False.
+        max_spins (:obj:`int`, optional): Upper bound for the number of spins before blocking.
+            Defaults to 20000, or 0 on single core machines, where spinning only delays the other
+            side.
+    """
+    name = "futex"
+
+    _FUTEX_WAIT = 0
+    _FUTEX_WAKE = 1
+    _SYS_FUTEX = {"x86_64": 202, "amd64": 202, "aarch64": 98, "arm64": 98,
+                  "i386": 240, "i686": 240, "armv7l": 240}
+
+    # Word 0 is incremented by the client to start a tick, word 1 by the server once it is done
+    _SERVER_WORD = 0
+    _CLIENT_WORD = 1
+
+    class _Timespec(ctypes.Structure):
+        _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+    def __init__(self, uuid="", should_timeout=False, server=False, max_spins=None):
+        super(FutexSync, self).__init__(uuid, should_timeout, server)
+        if os.name != "posix" or platform.system() != "Linux":
+            raise HolodeckException("The futex sync backend is only supported on Linux")
+        machine = platform.machine().lower()
+        if machine not in self._SYS_FUTEX:
+            raise HolodeckException("The futex sync backend is not supported on " + machine)
+
+        self._sys_futex = self._SYS_FUTEX[machine]
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self.timeout = 60 if should_timeout else None
+
+        if max_spins is None:
+            max_spins = 20000 if (os.cpu_count() or 1) > 1 else 0
+        self.max_spins = max_spins
+        self._spins = min(1000, max_spins)
+
+        # The mapping is opened without truncating, since either side may get there first
+        self._mem_path = "/dev/shm/HOLODECK_MEM" + uuid + "_futex_sync"
+        f = os.open(self._mem_path, os.O_CREAT | os.O_RDWR)
+        try:
+            if os.fstat(f).st_size < mmap.PAGESIZE:
+                os.ftruncate(f, mmap.PAGESIZE)
+            self._mem_pointer = mmap.mmap(f, mmap.PAGESIZE)
+        finally:
+            os.close(f)
+
+        if server:
+            wait_word, post_word = self._SERVER_WORD, self._CLIENT_WORD
+        else:
+            wait_word, post_word = self._CLIENT_WORD, self._SERVER_WORD
+        # ctypes views are used rather than numpy, since this is all scalar access on a hot path
+        self._wait_value = ctypes.c_uint32.from_buffer(self._mem_pointer, 4 * wait_word)
+        self._post_value = ctypes.c_uint32.from_buffer(self._mem_pointer, 4 * post_word)
+        self._wait_address = ctypes.c_void_p(ctypes.addressof(self._wait_value))
+        self._post_address = ctypes.c_void_p(ctypes.addressof(self._post_value))
+
+        self._syscall = self._libc.syscall
+        self._syscall.restype = ctypes.c_long
+        # Counters only ever move forward, so anything past what we've seen is a pending release.
+        # A file left behind by a crashed session with the same uuid holds stale counters, so the
+        # server, which starts before the client connects, zeroes them
+        if server:
+            self._wait_value.value = 0
+            self._post_value.value = 0
+            self._seen = 0
+        else:
+            # The server posts once per release of the client, after the post that says it is
+            # ready, so the client has seen as many posts as it has released
+            self._seen = self._post_value.value
+
+    def acquire(self):
+        wait_value = self._wait_value
+        seen = self._seen
+
+        spins = self._spins
+        for _ in range(spins):
+            if wait_value.value != seen:
+                self._seen = (seen + 1) & 0xFFFFFFFF
+                self._spins = min(self.max_spins, spins * 2 + 1)
+                return
+
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while wait_value.value == seen:
+            timespec = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("Timed out waiting for engine!")
+                timespec = ctypes.byref(
+                    self._Timespec(int(remaining), int((remaining % 1) * 1e9)))
+            self._futex(self._wait_address, self._FUTEX_WAIT, seen, timespec)
+
+        self._seen = (seen + 1) & 0xFFFFFFFF
+        self._spins = spins // 2
+
+    def release(self):
+        # Only this side ever writes the counter, so a plain increment is safe
+        self._post_value.value += 1
+        self._futex(self._post_address, self._FUTEX_WAKE, 1, None)
+
+    def unlink(self):
+        self._wait_value = None
+        self._post_value = None
+        try:
+            self._mem_pointer.close()
+        except BufferError:
+            pass
+        try:
+            os.remove(self._mem_path)
+        except FileNotFoundError:
+            pass
+
+    def _futex(self, address, op, value, timespec):
+        if self._syscall(self._sys_futex, address, op, value, timespec, None, 0) == -1:
+            err = ctypes.get_errno()
+            # EAGAIN: the value already changed, EINTR: interrupted, ETIMEDOUT: checked by caller
+            if err not in (errno.EAGAIN, errno.EINTR, errno.ETIMEDOUT):
+                raise OSError(err, os.strerror(err))
+
+
+_BACKENDS = {
+    SemaphoreSync.name: SemaphoreSync,
+    FutexSync.name: FutexSync,
+}
+
+
+def make_sync_backend(name, uuid="", should_timeout=False, server=False):
+    """Creates a sync backend by name.
+
+    Args:
+        name (:obj:`str`): ``"semaphore"`` or ``"futex"``.
+        uuid (:obj:`str`, optional): UUID of the environment. Defaults to "".
+        should_timeout (:obj:`bool`, optional): If waiting should time out. Defaults to False.
+        server (:obj:`bool`, optional): If this is the engine side. Defaults to False.
+
+    Returns:
+        :class:`SyncBackend`: The backend.
+    """
+    if name not in _BACKENDS:
+        raise HolodeckException("Unknown sync backend {}. Available backends: {}".format(
+            name, list(_BACKENDS)))
+    return _BACKENDS[name](uuid, should_timeout=should_timeout, server=server)
@@ -0,0 +1,467 @@
+"""Module containing environments that run several Holodeck worlds side by side.
+
+All of the worlds are stepped together, and their observations, rewards and terminals are returned
+stacked along a leading batch dimension.
+"""
+import multiprocessing
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from holodeck.exceptions import HolodeckException
+from holodeck.shmem import Shmem
+
+
+class VectorHolodeckEnvironment:
+    """Steps several :class:`~holodeck.environments.HolodeckEnvironment` in lockstep.
+
+    Every step, commands are flushed and every engine is released before any of them is waited on,
+    so the engines simulate their ticks in parallel instead of one after another.
+
+    With ``auto_reset``, an environment that reaches a terminal state is reset in a background
+    thread while the others keep stepping, so one episode ending doesn't stall the whole batch:
+
+    - The step on which an environment terminates is returned as usual.
+    - While it is resetting, its action is ignored, and it returns its terminal state again with a
+      reward of ``0``, and ``{"resetting": True}`` as info.
+    - On the first step after the reset has finished, it returns the state from the reset with a
+      reward of ``0``, and ``{"reset": True}`` as info. It is stepped normally from then on.
+
+    Instantiate this object using :meth:`holodeck.holodeck.make_vector`, or pass environments that
+    were already created.
+
+    Args:
+        envs (:obj:`list` of :class:`~holodeck.environments.HolodeckEnvironment`):
+            The environments to step. They are expected to run the same scenario.
+        auto_reset (:obj:`bool`, optional): If environments should be reset in the background when
+            they reach a terminal state. Defaults to False.
+    """
+
+    def __init__(self, envs, auto_reset=False):
+        if not envs:
+            raise HolodeckException("A vector environment needs at least one environment")
+        self.envs = list(envs)
+        self.auto_reset = auto_reset
+        self._reset_executor = None
+        # Index of environment to (future of its reset, copy of its terminal state)
+        self._resetting = dict()
+
+    @property
+    def num_envs(self):
+        """
+        Returns:
+            :obj:`int`: The number of environments.
+        """
+        return len(self.envs)
+
+    @property
+    def action_space(self):
+        """Gives the action space for the main agent of a single environment.
+
+        Returns:
+            :class:`~holodeck.spaces.ActionSpace`: The action space for the main agent.
+        """
+        return self.envs[0].action_space
+
+    @property
+    def num_resetting(self):
+        """
+        Returns:
+            :obj:`int`: The number of environments being reset in the background.
+        """
+        return len(self._resetting)
+
+    def reset(self):
+        """Resets every environment.
+
+        Returns:
+            :obj:`dict`: The states of all environments, stacked. See :meth:`step`.
+        """
+        self._wait_for_resets()
+        return _stack([env.reset() for env in self.envs])
+
+    def step(self, actions):
+        """Supplies an action to the main agent of every environment and ticks them all once.
+
+        Args:
+            actions (:obj:`np.ndarray`): An ``(num_envs, action_dim)`` array, or any sequence of
+                ``num_envs`` actions. Row ``i`` is the action for environment ``i``.
+
+        Returns:
+            (:obj:`dict`, :obj:`np.ndarray`, :obj:`np.ndarray`, :obj:`list`): A 4tuple:
+                - States: Dictionary from sensor name to an array with a leading ``num_envs``
+                  dimension.
+                - Rewards: ``(num_envs,)`` float32 array. ``nan`` for environments without a task.
+                - Terminals: ``(num_envs,)`` bool array.
+                - Infos: List with the info of each environment.
+        """
+        if len(actions) != self.num_envs:
+            raise HolodeckException("Expected {} actions, got {}".format(self.num_envs,
+                                                                        len(actions)))
+        results = self._reset_results()
+        active = [i for i in range(self.num_envs) if i not in results]
+
+        for i in active:
+            self.envs[i]._check_can_tick("step")
+        # All actions are applied before any engine is released. If one of them is rejected, no
+        # tick has been started yet and the vector environment can still be used
+        for i in active:
+            if self.envs[i]._agent is not None:
+                self.envs[i]._agent.act(actions[i])
+
+        self._start_ticks(active)
+        for i in active:
+            results[i] = self.envs[i].step_wait()
+
+        collated = self._collate([results[i] for i in range(self.num_envs)])
+        if self.auto_reset:
+            for i in active:
+                if results[i][2]:
+                    self._start_reset(i, results[i][0])
+        return collated
+
+    def tick(self):
+        """Ticks every environment once, without supplying new actions.
+
+        Environments that are being reset in the background are not ticked, see
+        :class:`VectorHolodeckEnvironment`.
+
+        Returns:
+            :obj:`dict`: The states of all environments, stacked.
+        """
+        results = self._reset_results()
+        active = [i for i in range(self.num_envs) if i not in results]
+
+        for i in active:
+            self.envs[i]._check_can_tick("tick")
+        self._start_ticks(active)
+        states = [results[i][0] if i in results else self.envs[i].tick_wait()
+                  for i in range(self.num_envs)]
+        return _stack(states)
+
+    def close(self):
+        """Closes every environment and its world."""
+        self._wait_for_resets()
+        if self._reset_executor is not None:
+            self._reset_executor.shutdown()
+            self._reset_executor = None
+        for env in self.envs:
+            env.__on_exit__()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _start_ticks(self, indices):
+        """Flushes the commands of the given environments and releases their engines.
+
+        If this fails partway, the ticks that were already started are waited on before the error
+        is raised, so that no environment is left with a pending tick.
+        """
+        started = []
+        try:
+            for i in indices:
+                self.envs[i]._start_tick()
+                started.append(self.envs[i])
+        except Exception:
+            for env in started:
+                env.tick_wait()
+            raise
+
+    def _start_reset(self, index, terminal_state):
+        if self._reset_executor is None:
+            self._reset_executor = ThreadPoolExecutor(max_workers=self.num_envs,
+                                                      thread_name_prefix="holodeck-reset")
+        # The state may point at buffers the reset is about to overwrite
+        self._resetting[index] = (self._reset_executor.submit(self.envs[index].reset),
+                                  _copy(terminal_state))
+
+    def _reset_results(self):
+        """Gives a step result for every environment that is being reset in the background.
+
+        Environments whose reset has finished are no longer resetting afterwards.
+        """
+        results = dict()
+        for index, (future, terminal_state) in list(self._resetting.items()):
+            if future.done():
+                del self._resetting[index]
+                results[index] = (future.result(), 0.0, False, {"reset": True})
+            else:
+                results[index] = (terminal_state, 0.0, False, {"resetting": True})
+        return results
+
+    def _wait_for_resets(self):
+        resetting, self._resetting = self._resetting, dict()
+        for future, _ in resetting.values():
+            future.exception()
+
+    @staticmethod
+    def _collate(results):
+        states, rewards, terminals, infos = zip(*results)
+        reward_array = np.array([np.nan if reward is None else reward for reward in rewards],
+                                dtype=np.float32)
+        terminal_array = np.array([bool(terminal) for terminal in terminals], dtype=bool)
+        return _stack(states), reward_array, terminal_array, list(infos)
+
+
+class SubprocVectorHolodeckEnvironment:
+    """Runs each environment in its own worker process, with the states in shared memory.
+
+    Building observations for many environments in one process is limited by the GIL and by a
+    single core doing all of the copying. Here every worker process owns one environment and
+    copies its state straight into its slice of a batch buffer owned by this process. There is one
+    batch buffer per sensor, of shape ``(num_envs, *data_shape)``. Only actions, rewards,
+    terminals and infos are sent over the pipes, the state data is never pickled.
+
+    The returned states are views of the batch buffers, so they are overwritten by the next call
+    to :meth:`step` or :meth:`reset`. Copy them if they need to be kept.
+
+    Instantiate this object using :meth:`holodeck.holodeck.make_vector` with
+    ``use_processes=True``, or pass functions that create the environments.
+
+    Args:
+        env_fns (:obj:`list` of callable): One function per environment that creates it. They are
+            called in the worker processes.
+    """
+
+    def __init__(self, env_fns):
+        if not env_fns:
+            raise HolodeckException("A vector environment needs at least one environment")
+        self._uuid = str(uuid.uuid4())
+        self._pipes = []
+        self._processes = []
+        self._batch_memory = []
+        self._closed = False
+
+        for index, env_fn in enumerate(env_fns):
+            parent_pipe, worker_pipe = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_subproc_worker,
+                                              args=(worker_pipe, parent_pipe, env_fn, index),
+                                              daemon=True)
+            process.start()
+            worker_pipe.close()
+            self._pipes.append(parent_pipe)
+            self._processes.append(process)
+
+        try:
+            layouts, action_spaces = zip(*self._receive_all())
+            self._layout = layouts[0]
+            self._action_space = action_spaces[0]
+            for layout in layouts[1:]:
+                if layout != self._layout:
+                    raise HolodeckException("All environments must have the same sensors")
+            self._states = self._allocate_batch()
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def num_envs(self):
+        """
+        Returns:
+            :obj:`int`: The number of environments.
+        """
+        return len(self._pipes)
+
+    @property
+    def action_space(self):
+        """Gives the action space for the main agent of a single environment.
+
+        Returns:
+            :class:`~holodeck.spaces.ActionSpace`: The action space for the main agent.
+        """
+        return self._action_space
+
+    def reset(self):
+        """Resets every environment.
+
+        Returns:
+            :obj:`dict`: The batched states, see :meth:`step`.
+        """
+        for pipe in self._pipes:
+            pipe.send(("reset", None))
+        self._receive_all()
+        return self._states
+
+    def step(self, actions):
+        """Supplies an action to the main agent of every environment and ticks them all once.
+
+        Args:
+            actions (:obj:`np.ndarray`): An ``(num_envs, action_dim)`` array, or any sequence of
+                ``num_envs`` actions.
+
+        Returns:
+            (:obj:`dict`, :obj:`np.ndarray`, :obj:`np.ndarray`, :obj:`list`): The same 4tuple as
+            :meth:`VectorHolodeckEnvironment.step`. The states are views of the shared batch
+            buffers.
+        """
+        if len(actions) != self.num_envs:
+            raise HolodeckException("Expected {} actions, got {}".format(self.num_envs,
+                                                                        len(actions)))
+        for pipe, action in zip(self._pipes, actions):
+            pipe.send(("step", action))
+        results = self._receive_all()
+
+        rewards, terminals, infos = zip(*results)
+        reward_array = np.array([np.nan if reward is None else reward for reward in rewards],
+                                dtype=np.float32)
+        terminal_array = np.array([bool(terminal) for terminal in terminals], dtype=bool)
+        return self._states, reward_array, terminal_array, list(infos)
+
+    def close(self):
+        """Closes every environment, stops the workers and frees the batch buffers."""
+        if self._closed:
+            return
+        self._closed = True
+        for pipe, process in zip(self._pipes, self._processes):
+            try:
+                if process.is_alive():
+                    pipe.send(("close", None))
+                    pipe.recv()
+            except (EOFError, OSError):
+                pass
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        for block in self._batch_memory:
+            block.unlink()
+        self._batch_memory = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback_):
+        self.close()
+
+    def _receive_all(self):
+        results = []
+        errors = []
+        for index, pipe in enumerate(self._pipes):
+            try:
+                status, payload = pipe.recv()
+            except EOFError:
+                status, payload = "error", "worker exited unexpectedly"
+            if status == "error":
+                errors.append("Environment {}: {}".format(index, payload))
+            results.append(payload)
+        if errors:
+            raise HolodeckException("\n".join(errors))
+        return results
+
+    def _allocate_batch(self):
+        """Creates one shared batch buffer per sensor, and has every worker attach to them."""
+        names = dict()
+        views = dict()
+        for i, (path, (shape, dtype)) in enumerate(sorted(self._layout.items())):
+            name = "batch_" + str(i)
+            block = Shmem(name, [self.num_envs] + list(shape), np.dtype(dtype), self._uuid)
+            self._batch_memory.append(block)
+            names[path] = name
+            views[path] = block.np_array
+
+        for pipe in self._pipes:
+            pipe.send(("attach", (self._uuid, self.num_envs, names)))
+        self._receive_all()
+        return _unflatten(views)
+
+
+def _subproc_worker(pipe, parent_pipe, env_fn, index):
+    """Main loop of a worker process of :class:`SubprocVectorHolodeckEnvironment`."""
+    parent_pipe.close()
+    env = None
+    batch_memory = []
+    destinations = []
+
+    def write_state(state):
+        flat = _flatten(state)
+        for path, destination in destinations:
+            np.copyto(destination, flat[path])
+
+    try:
+        env = env_fn()
+        layout = {path: (tuple(value.shape), value.dtype.str)
+                  for path, value in _flatten(env._default_state_fn()).items()}
+        action_space = env.action_space if env._agent is not None else None
+        pipe.send(("ok", (layout, action_space)))
+
+        while True:
+            command, data = pipe.recv()
+            if command == "step":
+                state, reward, terminal, info = env.step(data)
+                write_state(state)
+                pipe.send(("ok", (reward, terminal, info)))
+            elif command == "reset":
+                write_state(env.reset())
+                pipe.send(("ok", None))
+            elif command == "attach":
+                batch_uuid, num_envs, names = data
+                for path, name in names.items():
+                    shape, dtype = layout[path]
+                    block = Shmem(name, [num_envs] + list(shape), np.dtype(dtype), batch_uuid,
+                                  create=False)
+                    batch_memory.append(block)
+                    destinations.append((path, block.np_array[index]))
+                write_state(env._default_state_fn())
+                pipe.send(("ok", None))
+            elif command == "close":
+                break
+    except (KeyboardInterrupt, EOFError):
+        reply = None
+    except Exception:  # pylint: disable=broad-except
+        reply = ("error", traceback.format_exc())
+    else:
+        reply = ("ok", None)
+
+    # The views into the batch buffers have to go before the buffers can be closed
+    destinations = []
+    for block in batch_memory:
+        block.close()
+    if env is not None:
+        env.__on_exit__()
+    if reply is not None:
+        try:
+            pipe.send(reply)
+        except OSError:
+            pass
+    pipe.close()
+
+
+def _flatten(state, prefix=()):
+    """Flattens a (possibly nested) state dictionary into a dictionary keyed by key paths."""
+    flat = dict()
+    for key, value in state.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, prefix + (key,)))
+        else:
+            flat[prefix + (key,)] = value
+    return flat
+
+
+def _unflatten(flat):
+    """Inverse of :func:`_flatten`."""
+    state = dict()
+    for path, value in flat.items():
+        node = state
+        for key in path[:-1]:
+            node = node.setdefault(key, dict())
+        node[path[-1]] = value
+    return state
+
+
+def _copy(state):
+    """Deep copies a (possibly nested) state dictionary."""
+    if isinstance(state, dict):
+        return {key: _copy(value) for key, value in state.items()}
+    return np.copy(state)
+
+
+def _stack(states):
+    """Stacks a list of (possibly nested) state dictionaries along a new leading dimension."""
+    first = states[0]
+    if isinstance(first, dict):
+        return {key: _stack([state[key] for state in states]) for key in first}
+    return np.stack(states)
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from holodeck.agents import AndroidAgent, SphereAgent, UavAgent
+from holodeck.spaces import ContinuousActionSpace, DiscreteActionSpace
+
+
+def control_schemes(agent_class):
+    # The control schemes don't depend on a client
+    return agent_class.__new__(agent_class).control_schemes
+
+
+def test_control_schemes_are_built_once_per_type():
+    first = control_schemes(AndroidAgent)[0][1]
+    second = control_schemes(AndroidAgent)[0][1]
+    assert first is not second
+    assert first.get_low() is second.get_low()
+    assert control_schemes(UavAgent)[0][1].get_low() is not first.get_low()
+
+
+def test_agents_of_a_type_sample_independently():
+    agent_a = AndroidAgent.__new__(AndroidAgent)
+    agent_b = AndroidAgent.__new__(AndroidAgent)
+    assert agent_a.control_schemes is agent_a.control_schemes
+
+    agent_b.control_schemes[1][1].seed(0)
+    expected = agent_b.control_schemes[1][1].sample(3)
+    agent_b.control_schemes[1][1].seed(0)
+    # Seeding and sampling agent A leaves the generator of agent B alone
+    agent_a.control_schemes[1][1].seed(0)
+    agent_a.control_schemes[1][1].sample(3)
+    np.testing.assert_array_equal(agent_b.control_schemes[1][1].sample(3), expected)
+
+    agent_a.control_schemes[1][1].seed(1)
+    assert not np.array_equal(agent_a.control_schemes[1][1].sample(3), expected)
+
+
+def test_bounds_are_float32_arrays():
+    space = control_schemes(AndroidAgent)[0][1]
+    assert space.get_low().dtype == np.float32
+    np.testing.assert_array_equal(space.get_low(), np.full(94, -20))
+    np.testing.assert_array_equal(space.get_high(), np.full(94, 20))
+    with pytest.raises(ValueError):
+        space.get_low()[0] = 0
+
+
+def test_missing_bounds_are_unbounded():
+    space = control_schemes(UavAgent)[1][1]
+    assert np.isinf(space.get_low()).all() and np.isinf(space.get_high()).all()
+    assert space.contains([1e9, -1e9, 0, 0])
+
+
+def test_continuous_clip_and_contains():
+    space = ContinuousActionSpace([3], low=[-1, None, 0], high=[1, None, 2])
+    np.testing.assert_array_equal(space.clip([5, 5, -5]), [1, 5, 0])
+    assert space.contains([0, 100, 2])
+    assert not space.contains([0, 0, 3])
+    assert not space.contains([0, 0])
+
+    batch = np.array([[5, 5, -5], [-5, 0, 1]])
+    np.testing.assert_array_equal(space.clip_batch(batch), [[1, 5, 0], [-1, 0, 1]])
+    with pytest.raises(ValueError):
+        space.clip_batch(batch[:, :2])
+
+
+def test_discrete_clip_and_contains():
+    space = control_schemes(SphereAgent)[0][1]
+    assert isinstance(space, DiscreteActionSpace)
+    np.testing.assert_array_equal(space.clip([7]), [3])
+    np.testing.assert_array_equal(space.clip_batch([[-1], [1.2]]), [[0], [1]])
+    assert space.contains([3])
+    assert not space.contains([4])
+    assert not space.contains([1.5])
+
+
+def test_samples_are_within_the_bounds():
+    space = ContinuousActionSpace([4], low=[-1, None, 10, 0], high=[1, None, 20, None])
+    samples = space.sample(10000)
+    assert samples.shape == (10000, 4) and samples.dtype == np.float32
+    assert all(space.contains(sample) for sample in samples[:100])
+    assert (samples[:, 2] >= 10).all() and (samples[:, 2] < 20).all()
+    assert (samples[:, 3] >= 0).all()
+    # Unbounded values come from a unit gaussian
+    assert abs(samples[:, 1].std() - 1) < 0.1
+
+
+def test_seeded_samples_are_reproducible():
+    space = control_schemes(AndroidAgent)[1][1]
+    space.seed([7, 0])
+    first = space.sample(3)
+    space.seed([7, 0])
+    np.testing.assert_array_equal(space.sample(3), first)
+    space.seed([7, 1])
+    assert not np.array_equal(space.sample(3), first)
+
+
+def test_discrete_samples():
+    space = control_schemes(SphereAgent)[0][1]
+    space.seed(0)
+    assert space.sample().shape == (1,)
+    samples = space.sample(1000)
+    assert samples.shape == (1000, 1)
+    np.testing.assert_array_equal(np.unique(samples), [0, 1, 2, 3])
+
+
+def test_custom_sample_function_gets_the_batch_shape():
+    space = ContinuousActionSpace([2], sample_fn=np.zeros)
+    assert space.sample(5).shape == (5, 2)
@@ -0,0 +1,94 @@
+import json
+import uuid
+
+import numpy as np
+import pytest
+
+from holodeck.command import CommandCenter, CustomCommand, DebugDrawCommand
+from holodeck.exceptions import HolodeckException
+from holodeck.holodeckclient import HolodeckClient
+from holodeck.standin import StandInServer
+from tests.utils.standin import make_standin_env, close_standin_env
+
+
+@pytest.fixture
+def command_center():
+    env_uuid = str(uuid.uuid4())
+    server = StandInServer(env_uuid)
+    client = HolodeckClient(env_uuid)
+    command_center = CommandCenter(client)
+    # Small enough that a few dozen commands need several ticks
+    command_center.max_buffer = 2000
+    yield command_center
+    client.unlink()
+    server.unlink()
+
+
+def sent_commands(command_center):
+    """Runs handle_buffer like a tick does, and returns the commands the engine would read"""
+    command_center._command_bool_ptr[0] = False
+    command_center.handle_buffer()
+    if not command_center._command_bool_ptr[0]:
+        return None
+    raw = command_center._command_buffer_ptr.tobytes()
+    parsed, end = json.JSONDecoder().raw_decode(raw.decode("utf-8", errors="replace"))
+    assert end + 1 <= command_center.max_buffer
+    return parsed["commands"]
+
+
+def command(i):
+    return CustomCommand("Command", num_params=[i])
+
+
+def test_large_queue_is_sent_in_order_over_several_ticks(command_center):
+    for i in range(100):
+        command_center.enqueue_command(command(i))
+    backlog = command_center.backlog_ticks
+    assert backlog > 1
+
+    received = []
+    ticks = 0
+    while command_center.queue_size:
+        received += [c["params"][1]["value"] for c in sent_commands(command_center)]
+        ticks += 1
+    assert received == list(range(100))
+    assert ticks == backlog
+    assert sent_commands(command_center) is None
+    assert command_center.backlog_ticks == 0
+
+
+def test_atomic_commands_are_never_split(command_center):
+    for i in range(10):
+        command_center.enqueue_command(command(i))
+    command_center.enqueue_commands([command(i) for i in range(100, 120)], atomic=True)
+
+    first = sent_commands(command_center)
+    second = sent_commands(command_center)
+    assert [c["params"][1]["value"] for c in first] == list(range(10))
+    assert [c["params"][1]["value"] for c in second] == list(range(100, 120))
+
+
+def test_oversized_command_is_dropped(command_center):
+    command_center.enqueue_commands([command(i) for i in range(200)], atomic=True)
+    command_center.enqueue_command(command(0))
+
+    with pytest.raises(HolodeckException):
+        command_center.handle_buffer()
+    assert command_center.queue_size == 1
+    assert len(sent_commands(command_center)) == 1
+
+
+def test_flush_ticks_until_the_queue_drains():
+    env, process = make_standin_env()
+    try:
+        env.reset()
+        for i in range(30000):
+            env.draw_point([i, 0, 0])
+        backlog = env.command_backlog_ticks
+        assert backlog > 1
+
+        assert env.flush_commands() == backlog
+        assert env.command_backlog_ticks == 0
+        assert env.flush_commands() == 0
+    finally:
+        close_standin_env(env, process)
@@ -0,0 +1,117 @@
+import json
+import uuid
+
+import pytest
+
+from holodeck.command import (CommandCenter, CustomCommand, DebugDrawCommand,
+                              RemoveSensorCommand, RGBCameraRateCommand, RotateSensorCommand)
+from holodeck.holodeckclient import HolodeckClient
+from holodeck.standin import StandInServer
+
+
+@pytest.fixture
+def command_center():
+    env_uuid = str(uuid.uuid4())
+    server = StandInServer(env_uuid)
+    client = HolodeckClient(env_uuid)
+    yield CommandCenter(client)
+    client.unlink()
+    server.unlink()
+
+
+def sent(command_center):
+    """Sends the queued commands, and returns their types and first parameters."""
+    command_center._command_bool_ptr[0] = False
+    command_center.handle_buffer()
+    if not command_center._command_bool_ptr[0]:
+        return []
+    raw = command_center._command_buffer_ptr.tobytes()
+    parsed, _ = json.JSONDecoder().raw_decode(raw.decode("utf-8", errors="replace"))
+    return [(command["type"], command["params"][0]["value"]) for command in parsed["commands"]]
+
+
+def weather(name, *values):
+    return CustomCommand(name, num_params=list(values))
+
+
+def test_only_the_last_setting_is_sent(command_center):
+    for hour in range(24):
+        command_center.enqueue_command(weather("SetHour", hour))
+    command_center.enqueue_command(DebugDrawCommand(0, [0, 0, 0], [1, 1, 1], [255, 0, 0], 1))
+    assert command_center.queue_size == 2
+    assert sent(command_center) == [("CustomCommand", "SetHour"), ("DebugDraw", 0)]
+
+
+def test_replaced_command_moves_to_the_end(command_center):
+    command_center.enqueue_command(RotateSensorCommand("uav0", "RGBCamera", [0, 0, 0]))
+    command_center.enqueue_command(DebugDrawCommand(0, [0, 0, 0], [1, 1, 1], [255, 0, 0], 1))
+    command_center.enqueue_command(RotateSensorCommand("uav0", "RGBCamera", [0, 0, 90]))
+    assert sent(command_center) == [("DebugDraw", 0), ("RotateSensor", "uav0")]
+
+
+def test_setting_in_effect_is_not_sent_again(command_center):
+    command_center.enqueue_command(weather("SetFogDensity", 0.5))
+    assert len(sent(command_center)) == 1
+    command_center.enqueue_command(weather("SetFogDensity", 0.5))
+    assert command_center.queue_size == 0
+    assert sent(command_center) == []
+
+    command_center.enqueue_command(weather("SetFogDensity", 0.7))
+    assert len(sent(command_center)) == 1
+
+
+def test_weather_resets_the_fog(command_center):
+    command_center.enqueue_command(weather("SetFogDensity", 0.5))
+    sent(command_center)
+    command_center.enqueue_command(CustomCommand("SetWeather", string_params=["rain"]))
+    command_center.enqueue_command(weather("SetFogDensity", 0.5))
+    assert len(sent(command_center)) == 2
+
+
+def test_weather_sent_with_the_fog_resets_it(command_center):
+    command_center.enqueue_command(weather("SetFogDensity", 0.5))
+    command_center.enqueue_command(CustomCommand("SetWeather", string_params=["rain"]))
+    assert len(sent(command_center)) == 2
+    command_center.enqueue_command(weather("SetFogDensity", 0.5))
+    assert len(sent(command_center)) == 1
+
+
+def test_removed_sensor_forgets_its_rate(command_center):
+    command_center.enqueue_command(RGBCameraRateCommand("uav0", "RGBCamera", 2))
+    sent(command_center)
+    command_center.enqueue_command(RemoveSensorCommand("uav0", "RGBCamera"))
+    command_center.enqueue_command(RGBCameraRateCommand("uav0", "RGBCamera", 2))
+    assert [name for name, _ in sent(command_center)] == ["RemoveSensor", "RGBCameraRate"]
+
+
+def test_sensor_removed_with_its_rate_forgets_it(command_center):
+    command_center.enqueue_command(RGBCameraRateCommand("uav0", "RGBCamera", 2))
+    command_center.enqueue_command(RemoveSensorCommand("uav0", "RGBCamera"))
+    sent(command_center)
+    command_center.enqueue_command(RGBCameraRateCommand("uav0", "RGBCamera", 2))
+    assert [name for name, _ in sent(command_center)] == ["RGBCameraRate"]
+
+
+def test_forgotten_settings_are_sent_again(command_center):
+    command_center.enqueue_command(weather("SetFogDensity", 0.5))
+    sent(command_center)
+    command_center.forget_settings()
+    command_center.enqueue_command(weather("SetFogDensity", 0.5))
+    assert len(sent(command_center)) == 1
+
+
+def test_atomic_commands_are_not_coalesced(command_center):
+    command_center.enqueue_commands([weather("SetHour", 1), weather("SetHour", 2)], atomic=True)
+    command_center.enqueue_command(weather("SetHour", 3))
+    assert sent(command_center) == [("CustomCommand", "SetHour")] * 3
+
+
+def test_day_cycle_keeps_the_hour_around_it(command_center):
+    command_center.enqueue_command(weather("SetHour", 12))
+    command_center.enqueue_command(weather("SetDayCycle", 1, 30))
+    command_center.enqueue_command(weather("SetHour", 12))
+    assert [name for _, name in sent(command_center)] == ["SetHour", "SetDayCycle", "SetHour"]
+
+    # The running day cycle moves the hour, so setting it again isn't a no-op
+    command_center.enqueue_command(weather("SetHour", 12))
+    assert [name for _, name in sent(command_center)] == ["SetHour"]
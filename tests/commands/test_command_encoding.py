@@ -0,0 +1,79 @@
+import json
+import uuid
+
+import numpy as np
+import pytest
+
+from holodeck.command import (AddSensorCommand, CommandCenter, CommandsGroup, CustomCommand,
+                              DebugDrawCommand, SpawnAgentCommand)
+from holodeck.exceptions import HolodeckException
+from holodeck.holodeckclient import HolodeckClient
+from holodeck.sensors import SensorDefinition
+from holodeck.standin import StandInServer
+
+
+@pytest.fixture
+def command_center():
+    env_uuid = str(uuid.uuid4())
+    server = StandInServer(env_uuid)
+    client = HolodeckClient(env_uuid)
+    yield CommandCenter(client)
+    client.unlink()
+    server.unlink()
+
+
+def values(command):
+    return [param["value"] for param in json.loads(command.to_json())["params"]]
+
+
+def test_numpy_values_are_plain_numbers():
+    command = DebugDrawCommand(np.int64(0), np.array([1, 2, 3], dtype=np.float32),
+                               np.arange(3), [np.float64(0.5), 1, 2], np.float32(2.5))
+    assert values(command) == [0, 1, 2, 3, 0, 1, 2, 0.5, 1, 2, 2.5]
+
+
+def test_booleans_are_numbers():
+    command = SpawnAgentCommand([0, 0, 0], [0, 0, 0], "uav0", "UavAgent", is_main_agent=True)
+    command.add_number_parameters(np.bool_(False))
+    assert values(command)[-2:] == [1, 0]
+
+
+def test_strings_are_escaped():
+    name = 'say "hi"\\\n\tthere'
+    assert values(CustomCommand(name, string_params=["ünïcode"])) == [name, "ünïcode"]
+
+
+def test_sensor_configuration_arrives_as_json():
+    config = {"CaptureWidth": 64, "Name": 'a "quoted" name'}
+    definition = SensorDefinition("uav0", "UavAgent", "RGBCamera", "RGBCamera", config=config)
+    assert json.loads(values(AddSensorCommand(definition))[3]) == config
+
+
+def test_non_finite_numbers_are_rejected():
+    with pytest.raises(HolodeckException):
+        CustomCommand("Command", num_params=[float("nan")])
+
+
+def test_group_is_written_to_the_buffer(command_center):
+    commands = [DebugDrawCommand(0, [i, 0, 0], [0, i, 0], [255, 0, 0], 1.0) for i in range(100)]
+    for command in commands:
+        command_center.enqueue_command(command)
+    command_center.handle_buffer()
+
+    raw = command_center._command_buffer_ptr.tobytes()
+    parsed, end = json.JSONDecoder().raw_decode(raw.decode("utf-8", errors="replace"))
+    assert raw[end:end + 1] == b"0"
+    assert len(parsed["commands"]) == 100
+    assert parsed["commands"][99]["params"][0:4] == [{"value": 0}, {"value": 99},
+                                                      {"value": 0}, {"value": 0}]
+    assert command_center._command_bool_ptr[0]
+    assert command_center.queue_size == 0
+
+
+def test_to_json_matches_the_written_buffer():
+    group = CommandsGroup()
+    group.add_command(CustomCommand("OpenDoor", [1, 2], ["front"]))
+    out = bytearray()
+    group.write_json(out)
+    assert out.decode() == group.to_json()
+    assert json.loads(group.to_json())["commands"][0]["type"] == "CustomCommand"
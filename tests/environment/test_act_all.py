@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from holodeck.agents import AgentDefinition, ControlSchemes
+from holodeck.exceptions import HolodeckException
+from tests.utils.standin import make_standin_env, close_standin_env, uav_definition
+
+
+@pytest.fixture
+def swarm_env():
+    agents = [uav_definition("uav{}".format(i)) for i in range(8)]
+    for agent in agents[1:]:
+        agent.is_main_agent = False
+    env, process = make_standin_env(agent_definitions=agents)
+    env.reset()
+    yield env
+    close_standin_env(env, process)
+
+
+def buffers(env):
+    return np.array([agent._action_buffer for agent in env.agents.values()])
+
+
+def test_array_fills_every_agent(swarm_env):
+    actions = np.arange(32, dtype=np.float32).reshape(8, 4)
+    swarm_env.act_all(actions)
+    np.testing.assert_array_equal(buffers(swarm_env), actions)
+
+    # Short rows are padded
+    swarm_env.act_all(np.ones((8, 2)))
+    np.testing.assert_array_equal(buffers(swarm_env)[:, 2:], 0)
+
+
+def test_dict_fills_the_given_agents(swarm_env):
+    swarm_env.act_all(np.zeros((8, 4)))
+    swarm_env.act_all({"uav3": [1, 2, 3, 4], "uav5": np.full(4, 5)})
+    expected = np.zeros((8, 4))
+    expected[3] = [1, 2, 3, 4]
+    expected[5] = 5
+    np.testing.assert_array_equal(buffers(swarm_env), expected)
+
+
+def test_wrong_number_of_actions_is_rejected(swarm_env):
+    with pytest.raises(HolodeckException):
+        swarm_env.act_all(np.zeros((7, 4)))
+
+
+def test_sphere_actions():
+    agent = AgentDefinition("sphere0", "SphereAgent", is_main_agent=True)
+    env, process = make_standin_env(agent_definitions=[agent])
+    try:
+        env.reset()
+        sphere = env.agents["sphere0"]
+        sphere.act(2)
+        np.testing.assert_array_equal(sphere._action_buffer, [0, 10])
+        sphere.act(np.array([1]))
+        np.testing.assert_allclose(sphere._action_buffer, [-.185, 0])
+
+        sphere.set_control_scheme(ControlSchemes.SPHERE_CONTINUOUS)
+        sphere.act([3, 4])
+        np.testing.assert_array_equal(sphere._action_buffer, [3, 4])
+    finally:
+        close_standin_env(env, process)
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from holodeck.agents import AgentDefinition
+from holodeck.exceptions import HolodeckException
+from holodeck.sensors import SensorDefinition
+from tests.utils.standin import AttachingServer, make_standin_env, close_standin_env
+
+DEPTH = 8
+
+
+class ScheduleServer(AttachingServer):
+    """Runs the scheduled ticks: the location moves by the first three action values every tick,
+    the reward is the number of the tick, and a terminal is reported once the x location reaches
+    ``terminal_x``"""
+
+    def __init__(self, terminal_x, **kwargs):
+        super(ScheduleServer, self).__init__(**kwargs)
+        self._terminal_x = terminal_x
+
+    def attach(self):
+        open_buffer = self.open_buffer
+        return dict(header=open_buffer("schedule_header", [2], np.uint32),
+                    action=open_buffer("uav0", [4]),
+                    schedule=open_buffer("uav0_action_schedule", [DEPTH, 4]),
+                    location=open_buffer("uav0_LocationSensor_sensor_data", [3]),
+                    location_trace=open_buffer("uav0_LocationSensor_sensor_trace", [DEPTH, 3]),
+                    task=open_buffer("uav0_DistanceTask_sensor_data", [2]),
+                    task_trace=open_buffer("uav0_DistanceTask_sensor_trace", [DEPTH, 2]))
+
+    def serve_tick(self, buffers):
+        header = buffers["header"]
+        if header[0] == 0:
+            self._run_tick(buffers, buffers["action"], 0)
+            return
+
+        for i in range(header[0]):
+            self._run_tick(buffers, buffers["schedule"][i], i)
+            buffers["location_trace"][i] = buffers["location"]
+            buffers["task_trace"][i] = buffers["task"]
+            header[1] = i + 1
+            if buffers["task"][1]:
+                break
+
+    def _run_tick(self, buffers, action, index):
+        buffers["location"] += action[:3]
+        buffers["task"][:] = [index, buffers["location"][0] >= self._terminal_x]
+
+
+@pytest.fixture
+def schedule_env():
+    sensors = [SensorDefinition("uav0", "UavAgent", "LocationSensor", "LocationSensor"),
+               SensorDefinition("uav0", "UavAgent", "DistanceTask", "DistanceTask")]
+    agent = AgentDefinition("uav0", "UavAgent", sensors=sensors, is_main_agent=True)
+    env, process = make_standin_env(agent_definitions=[agent], schedule_depth=DEPTH,
+                                    server_kwargs=dict(server_class=ScheduleServer,
+                                                       terminal_x=100))
+    env.reset()
+    yield env
+    close_standin_env(env, process)
+
+
+def test_schedule_runs_in_one_handshake(schedule_env):
+    actions = np.zeros((5, 4), dtype=np.float32)
+    actions[:, 0] = np.arange(1, 6)
+
+    state, rewards, terminals, _ = schedule_env.step_schedule(actions)
+
+    assert state["LocationSensor"].shape == (5, 3)
+    np.testing.assert_array_equal(state["LocationSensor"][:, 0], np.cumsum(np.arange(1, 6)))
+    np.testing.assert_array_equal(rewards, np.arange(5))
+    assert not terminals.any()
+
+
+def test_schedule_stops_at_terminal(schedule_env):
+    actions = np.zeros((DEPTH, 4), dtype=np.float32)
+    actions[:, 0] = 40
+
+    state, rewards, terminals, _ = schedule_env.step_schedule(actions)
+
+    assert len(state["LocationSensor"]) == 3
+    np.testing.assert_array_equal(terminals, [False, False, True])
+
+
+def test_single_ticks_still_work_after_a_schedule(schedule_env):
+    schedule_env.step_schedule(np.ones((2, 4)))
+    state, reward, _, _ = schedule_env.step(np.ones(4))
+
+    np.testing.assert_array_equal(state["LocationSensor"], [3, 3, 3])
+    assert reward == 0
+
+
+def test_schedule_keeps_current_action(schedule_env):
+    schedule_env.act("uav0", np.full(4, 7))
+    schedule_env.step_schedule(np.ones((2, 4)))
+
+    np.testing.assert_array_equal(schedule_env.agents["uav0"]._action_buffer, np.full(4, 7))
+
+
+def test_schedule_longer_than_depth_is_rejected(schedule_env):
+    with pytest.raises(HolodeckException):
+        schedule_env.step_schedule(np.zeros((DEPTH + 1, 4)))
+    assert not schedule_env._tick_pending
+
+
+def test_schedule_needs_depth():
+    env, process = make_standin_env()
+    try:
+        env.reset()
+        with pytest.raises(HolodeckException, match="schedule_depth"):
+            env.step_schedule(np.zeros((2, 4)))
+    finally:
+        close_standin_env(env, process)
@@ -0,0 +1,93 @@
+import asyncio
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from holodeck.asyncenvironments import AsyncHolodeckEnvironment
+from tests.utils.standin import GatedServer, make_standin_env, close_standin_env
+
+
+@pytest.fixture
+def gate():
+    gate = multiprocessing.Event()
+    gate.set()
+    return gate
+
+
+@pytest.fixture
+def standin_env(gate):
+    env, process = make_standin_env(server_kwargs=dict(server_class=GatedServer, gate=gate))
+    yield env
+    gate.set()
+    close_standin_env(env, process)
+
+
+def test_step_and_tick(standin_env):
+    async def run():
+        env = AsyncHolodeckEnvironment(standin_env)
+        state = await env.reset()
+        assert "LocationSensor" in state
+        state, _, _, _ = await env.step(np.zeros(4))
+        assert "LocationSensor" in state
+        state = await env.tick()
+        assert "LocationSensor" in state
+
+    asyncio.run(run())
+
+
+def test_event_loop_is_not_blocked(standin_env, gate):
+    async def run():
+        env = AsyncHolodeckEnvironment(standin_env)
+        await env.reset()
+        gate.clear()
+
+        beats = 0
+
+        async def heartbeat():
+            nonlocal beats
+            while True:
+                await asyncio.sleep(0)
+                beats += 1
+                # The tick can only finish once the heartbeat got to run while it was pending
+                if beats == 3:
+                    gate.set()
+
+        task = asyncio.ensure_future(heartbeat())
+        await env.step(np.zeros(4))
+        task.cancel()
+        assert beats >= 3
+
+    asyncio.run(run())
+
+
+def test_timed_out_tick_is_finished_by_the_next_call(standin_env, gate):
+    async def run():
+        env = AsyncHolodeckEnvironment(standin_env)
+        await env.reset()
+
+        gate.clear()
+        with pytest.raises(asyncio.TimeoutError):
+            await env.step(np.zeros(4), timeout=0.01)
+        gate.set()
+        state, _, _, _ = await env.step(np.zeros(4))
+        assert "LocationSensor" in state
+
+    asyncio.run(run())
+
+
+def test_cancelled_step_is_finished_by_the_next_call(standin_env, gate):
+    async def run():
+        env = AsyncHolodeckEnvironment(standin_env)
+        await env.reset()
+
+        gate.clear()
+        task = asyncio.ensure_future(env.step(np.zeros(4)))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        gate.set()
+        await env.tick()
+
+    asyncio.run(run())
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from tests.utils.standin import make_standin_env, close_standin_env
+
+
+@pytest.fixture
+def standin_env():
+    env, process = make_standin_env()
+    yield env, process
+    close_standin_env(env, process)
+
+
+def test_step_async_then_wait(standin_env):
+    env, _ = standin_env
+    env.reset()
+    env.step_async(np.zeros(4))
+    state, _, _, _ = env.step_wait()
+    assert "LocationSensor" in state
+
+
+def test_timed_out_tick_is_not_left_pending(standin_env):
+    env, process = standin_env
+    env.reset()
+
+    # Without a server, the engine never answers
+    process.terminate()
+    process.join()
+    env._client.sync_backend.timeout = 0.1
+
+    env.step_async(np.zeros(4))
+    with pytest.raises(TimeoutError):
+        env.step_wait()
+
+    assert not env._tick_pending
+    env.act("uav0", np.ones(4))
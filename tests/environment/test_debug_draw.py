@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+import pytest
+
+from holodeck.command import DebugDrawCommand
+from holodeck.environments import _douglas_peucker
+from tests.utils.standin import make_standin_env, close_standin_env
+
+
+@pytest.fixture
+def draw_env(request):
+    env, process = make_standin_env(draw_budget=getattr(request, "param", None))
+    env.reset()
+    yield env
+    close_standin_env(env, process)
+
+
+def queued_params(env):
+    commands = [command for unit in env._command_center._queue for command in unit]
+    return np.array([[param["value"] for param in json.loads(command.to_json())["params"]]
+                     for command in commands])
+
+
+def test_batch_matches_single_commands():
+    batch = DebugDrawCommand.batch(1, [[1, 2, 3], [4, 5, 6]], [[0, 0, 1], [0, 0, 2]],
+                                   [0, 255, 0], [2, 3])
+    single = DebugDrawCommand(1, [4, 5, 6], [0, 0, 2], [0, 255, 0], 3)
+    assert json.loads(batch[1].to_json()) == json.loads(single.to_json())
+    assert batch[1].json_size() == len(batch[1].to_json())
+
+
+def test_lines_are_queued_in_order(draw_env):
+    starts = np.arange(30, dtype=np.float32).reshape(10, 3)
+    colors = np.tile([[0, 0, 255]], (10, 1))
+    assert draw_env.draw_lines(starts, starts + 1, colors, thickness=2) == 10
+
+    params = queued_params(draw_env)
+    np.testing.assert_array_equal(params[:, 1:4], starts)
+    np.testing.assert_array_equal(params[:, 4:7], starts + 1)
+    np.testing.assert_array_equal(params[:, 7:10], colors)
+    assert (params[:, 10] == 2).all()
+
+
+@pytest.mark.parametrize("draw_env", [5000], indirect=True)
+def test_points_are_decimated_to_the_budget(draw_env):
+    points = np.random.rand(1000, 3)
+    drawn = draw_env.draw_points(points)
+    assert 0 < drawn < 1000
+    assert draw_env._draw_bytes <= 5000
+    # The points are spread over the whole input
+    last = queued_params(draw_env)[-1, 1:4]
+    assert np.isclose(points[len(points) // 2:], last).all(axis=1).any()
+
+    # The budget is used up until the next tick
+    assert draw_env.draw_points(points) == 0
+    draw_env.tick()
+    assert draw_env.draw_points(points[:10]) == 10
+
+
+@pytest.mark.parametrize("draw_env", [20000], indirect=True)
+def test_polyline_keeps_its_ends_within_the_budget(draw_env):
+    points = np.stack([np.linspace(0, 100, 2000), np.sin(np.linspace(0, 20, 2000)),
+                       np.zeros(2000)], axis=1)
+    drawn = draw_env.draw_polyline(points)
+    assert 0 < drawn < 1999
+    assert draw_env._draw_bytes <= 20000
+
+    params = queued_params(draw_env)
+    np.testing.assert_allclose(params[0, 1:4], points[0], rtol=1e-7)
+    np.testing.assert_allclose(params[-1, 4:7], points[-1], rtol=1e-7)
+    # Consecutive segments are connected
+    np.testing.assert_array_equal(params[1:, 1:4], params[:-1, 4:7])
+
+
+def test_douglas_peucker_drops_collinear_points():
+    points = np.array([[0, 0, 0], [1, 0, 0], [2, 0, 0], [3, 1, 0], [4, 2, 0], [5, 2, 0]],
+                      dtype=np.float64)
+    np.testing.assert_array_equal(np.flatnonzero(_douglas_peucker(points, 0.01)), [0, 2, 4, 5])
+    assert _douglas_peucker(points, 10).sum() == 2
+
+
+def test_polyline_is_simplified(draw_env):
+    points = np.stack([np.arange(100), np.zeros(100), np.zeros(100)], axis=1)
+    assert draw_env.draw_polyline(points, tolerance=0.1) == 1
+    assert draw_env.draw_polyline(points) == 99
@@ -0,0 +1,97 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from holodeck.agents import AgentDefinition
+from holodeck.sensors import SensorDefinition
+from tests.utils.standin import AttachingServer, make_standin_env, close_standin_env
+
+
+class FrameServer(AttachingServer):
+    """Writes the tick number into the camera frame, gives a reward of 1 every tick and reports a
+    terminal from tick ``terminal_at`` on"""
+
+    def __init__(self, terminal_at, **kwargs):
+        super(FrameServer, self).__init__(**kwargs)
+        self._terminal_at = terminal_at
+
+    def attach(self):
+        return dict(camera=self.open_buffer("uav0_RGBCamera_sensor_data", [2, 2, 4], np.uint8),
+                    task=self.open_buffer("uav0_DistanceTask_sensor_data", [2]))
+
+    def serve_tick(self, buffers):
+        buffers["camera"][:] = self.ticks % 256
+        buffers["task"][:] = [1, self.ticks >= self._terminal_at.value]
+
+
+@pytest.fixture
+def frame_env(request):
+    sensors = [SensorDefinition("uav0", "UavAgent", "RGBCamera", "RGBCamera",
+                                config={"CaptureWidth": 2, "CaptureHeight": 2}),
+               SensorDefinition("uav0", "UavAgent", "DistanceTask", "DistanceTask")]
+    agent = AgentDefinition("uav0", "UavAgent", sensors=sensors, is_main_agent=True)
+    terminal_at = multiprocessing.Value("q", 1 << 60)
+    env, process = make_standin_env(agent_definitions=[agent],
+                                    server_kwargs=dict(server_class=FrameServer,
+                                                       terminal_at=terminal_at),
+                                    copy_state=getattr(request, "param", True))
+    env.reset()
+    yield env, terminal_at
+    close_standin_env(env, process)
+
+
+def test_state_is_built_once(frame_env):
+    env, _ = frame_env
+    copied = env.bytes_copied
+    state, reward, _, _ = env.step(np.zeros(4), ticks=4)
+
+    assert env.bytes_copied - copied == sum(value.nbytes for value in state.values())
+    assert reward == 1
+
+
+def test_frame_skip_sums_rewards(frame_env):
+    env, _ = frame_env
+    _, reward, terminal, _ = env.step(np.zeros(4), ticks=4, frame_skip=True)
+    assert reward == 4
+    assert not terminal
+
+
+def test_frame_skip_stops_on_terminal(frame_env):
+    env, terminal_at = frame_env
+    start = int(env.step(np.zeros(4))[0]["RGBCamera"][0, 0, 0])
+    terminal_at.value = start + 2
+
+    state, reward, terminal, _ = env.step(np.zeros(4), ticks=10, frame_skip=True)
+    assert terminal
+    assert reward == 2
+    assert state["RGBCamera"][0, 0, 0] == start + 2
+
+
+def test_frames_are_pooled(frame_env):
+    env, _ = frame_env
+    start = int(env.step(np.zeros(4))[0]["RGBCamera"][0, 0, 0])
+
+    state, _, _, _ = env.step(np.zeros(4), ticks=3, pool_frames="stack")
+    assert state["RGBCamera"].shape == (2, 2, 2, 4)
+    assert state["RGBCamera"][0, 0, 0, 0] == start + 2
+    assert state["RGBCamera"][1, 0, 0, 0] == start + 3
+
+    state, _, _, _ = env.step(np.zeros(4), ticks=2, pool_frames="max")
+    assert state["RGBCamera"].shape == (2, 2, 4)
+    assert np.all(state["RGBCamera"] == start + 5)
+
+
+@pytest.mark.parametrize("frame_env", [False], indirect=True)
+@pytest.mark.parametrize("pool_frames", ["max", "stack"])
+def test_pooling_leaves_the_sensor_buffers_alone(frame_env, pool_frames):
+    env, _ = frame_env
+    camera = env.agents["uav0"].sensors["RGBCamera"].sensor_data
+    pooled, _, _, _ = env.step(np.zeros(4), ticks=2, pool_frames=pool_frames)
+    assert not np.shares_memory(pooled["RGBCamera"], camera)
+
+    state, _, _, _ = env.step(np.zeros(4))
+    assert state["RGBCamera"].shape == (2, 2, 4)
+    assert np.shares_memory(state["RGBCamera"], camera)
+    assert np.all(state["RGBCamera"] == camera)
+    assert pooled["RGBCamera"].max() < camera.max()
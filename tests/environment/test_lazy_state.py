@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from holodeck.state import LazyState
+from tests.utils.standin import CountingServer, make_standin_env, close_standin_env
+
+
+@pytest.fixture
+def lazy_env():
+    env, process = make_standin_env(copy_state="lazy",
+                                    server_kwargs=dict(server_class=CountingServer))
+    yield env
+    close_standin_env(env, process)
+
+
+def test_only_read_sensors_are_copied():
+    location = np.arange(3, dtype=np.float32)
+    image = np.zeros((64, 64, 4), dtype=np.uint8)
+    state = LazyState({"LocationSensor": location, "RGBCamera": image})
+
+    assert np.all(state["LocationSensor"] == location)
+    assert state["LocationSensor"] is not location
+    assert state.bytes_copied == location.nbytes
+    assert sorted(state) == ["LocationSensor", "RGBCamera"]
+    assert len(state) == 2
+
+    state.materialize()
+    assert state.bytes_copied == location.nbytes + image.nbytes
+    assert state.materialized
+
+
+def test_nested_states_are_lazy():
+    state = LazyState({"uav0": {"LocationSensor": np.zeros(3)}})
+    assert isinstance(state["uav0"], LazyState)
+    assert state.bytes_copied == 0
+    assert dict(state["uav0"])["LocationSensor"].shape == (3,)
+
+
+def test_unread_sensors_are_dropped_at_the_next_tick(lazy_env):
+    lazy_env.reset()
+    first, _, _, _ = lazy_env.step(np.zeros(4))
+    location = first["LocationSensor"]
+    copied = lazy_env.bytes_copied
+
+    second, _, _, _ = lazy_env.step(np.zeros(4))
+    assert lazy_env.bytes_copied == copied
+    assert first.expired
+    assert first["LocationSensor"] is location
+    with pytest.raises(KeyError, match="VelocitySensor"):
+        first["VelocitySensor"]
+    assert list(first) == ["LocationSensor"]
+    assert np.all(second["LocationSensor"] == location + 1)
+
+
+def test_step_loop_only_copies_what_is_read(lazy_env):
+    lazy_env.reset()
+    copied = lazy_env.bytes_copied
+    state = None
+    for _ in range(10):
+        # The previous state is still referenced when the next step starts
+        state, _, _, _ = lazy_env.step(np.zeros(4))
+        state["LocationSensor"]
+    assert lazy_env.bytes_copied - copied == 10 * state["LocationSensor"].nbytes
+
+
+def test_materialized_state_survives_the_next_tick(lazy_env):
+    lazy_env.reset()
+    state, _, _, _ = lazy_env.step(np.zeros(4))
+    state.materialize()
+    lazy_env.step(np.zeros(4))
+    assert sorted(state) == ["LocationSensor", "VelocitySensor"]
+
+
+def test_read_sensors_are_not_copied_again(lazy_env):
+    lazy_env.reset()
+    state, _, _, _ = lazy_env.step(np.zeros(4))
+    location = state["LocationSensor"]
+    lazy_env.step(np.zeros(4))
+    assert state["LocationSensor"] is location
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from tests.utils.standin import make_standin_env, close_standin_env, uav_definition
+
+
+@pytest.fixture
+def standin_env():
+    env, process = make_standin_env()
+    yield env
+    close_standin_env(env, process)
+
+
+def test_allocated_state_matches_the_sensor_layout(standin_env):
+    standin_env.reset()
+    out = standin_env.allocate_state()
+    state, _, _, _ = standin_env.step(np.zeros(4))
+
+    assert sorted(out) == sorted(state)
+    for name, value in state.items():
+        assert out[name].shape == value.shape
+        assert out[name].dtype == value.dtype
+
+
+def test_step_fills_the_given_state(standin_env):
+    standin_env.reset()
+    out = standin_env.allocate_state()
+    location = out["LocationSensor"]
+    out["LocationSensor"][:] = -1
+
+    state, _, _, _ = standin_env.step(np.zeros(4), out=out)
+    assert state is out
+    assert out["LocationSensor"] is location
+    assert np.all(out["LocationSensor"] != -1)
+
+    assert standin_env.tick(out=out) is out
+
+
+def test_multi_agent_state_is_nested():
+    agents = [uav_definition("uav0"), uav_definition("uav1")]
+    agents[1].is_main_agent = False
+    env, process = make_standin_env(agent_definitions=agents)
+    try:
+        env.reset()
+        out = env.allocate_state()
+        assert sorted(out) == ["uav0", "uav1"]
+        assert env.tick(out=out)["uav1"]["LocationSensor"].shape == (3,)
+    finally:
+        close_standin_env(env, process)
+
+
+def test_multi_tick_copies_once(standin_env):
+    standin_env.reset()
+    out = standin_env.allocate_state()
+    state_bytes = sum(value.nbytes for value in out.values())
+
+    copied = standin_env.bytes_copied
+    standin_env.tick(4, out=out)
+    assert standin_env.bytes_copied - copied == state_bytes
+
+    copied = standin_env.bytes_copied
+    standin_env.step(np.zeros(4), ticks=4, out=out)
+    assert standin_env.bytes_copied - copied == state_bytes
@@ -0,0 +1,115 @@
+import json
+
+import numpy as np
+import pytest
+
+from holodeck.exceptions import HolodeckException
+from tests.utils.standin import make_standin_env, close_standin_env
+
+
+@pytest.fixture
+def env():
+    env, process = make_standin_env()
+    env.reset()
+    yield env
+    close_standin_env(env, process)
+
+
+def queued(env):
+    commands = [command for unit in env._command_center._queue for command in unit]
+    return [[param["value"] for param in json.loads(command.to_json())["params"]]
+            for command in commands]
+
+
+def test_props_match_single_spawns(env):
+    env.spawn_prop("Box", [1, 2, 3], [0, 0, 90], scale=[1, 2, 3], sim_physics=True,
+                   material="Gold", tag="goal")
+    env.spawn_prop("sphere")
+    single = queued(env)
+    env._command_center.clear()
+
+    assert env.spawn_props(["Box", "sphere"], [[1, 2, 3], [0, 0, 0]],
+                           rotations=[[0, 0, 90], [0, 0, 0]], scales=[[1, 2, 3], [1, 1, 1]],
+                           sim_physics=[True, False], materials=["Gold", ""],
+                           tags=["goal", ""]) == 2
+    assert queued(env) == single
+    assert single[0] == ["SpawnProp", 1, 2, 3, 0, 0, 90, 1, 2, 3, 1, "box", "gold", "goal"]
+
+
+def test_single_values_apply_to_every_prop(env):
+    env.spawn_props("cone", np.arange(30).reshape(10, 3), scales=2, materials="wood")
+    props = queued(env)
+    assert len(props) == 10
+    assert all(prop[7:10] == [2, 2, 2] and prop[11:13] == ["cone", "wood"] for prop in props)
+
+
+def scales(env, count, scales):
+    env._command_center.clear()
+    env.spawn_props("box", np.zeros((count, 3)), scales=scales)
+    return [prop[7:10] for prop in queued(env)]
+
+
+def test_scale_shapes(env):
+    assert scales(env, 2, 3) == [[3, 3, 3]] * 2
+    assert scales(env, 2, [2, 3]) == [[2, 2, 2], [3, 3, 3]]
+    # A single [x, y, z] scale applies to every prop
+    assert scales(env, 2, [1, 2, 3]) == [[1, 2, 3]] * 2
+    assert scales(env, 4, [1, 2, 3]) == [[1, 2, 3]] * 4
+    assert scales(env, 2, [[1, 2, 3], [4, 5, 6]]) == [[1, 2, 3], [4, 5, 6]]
+    # With three props, three scales are one per prop
+    assert scales(env, 3, [1, 2, 3]) == [[1, 1, 1], [2, 2, 2], [3, 3, 3]]
+
+
+@pytest.mark.parametrize("bad_scales", [[1], [1, 2, 3, 4], [[1, 2, 3]], [[1, 2], [3, 4]],
+                                        np.ones((2, 3, 1))])
+def test_scales_of_other_shapes_are_rejected(env, bad_scales):
+    with pytest.raises(HolodeckException, match="Scales"):
+        env.spawn_props("box", np.zeros((2, 3)), scales=bad_scales)
+    assert env._command_center.queue_size == 0
+
+
+def test_unknown_names_are_rejected(env):
+    with pytest.raises(HolodeckException, match="pyramid"):
+        env.spawn_props(["box", "pyramid"], np.zeros((2, 3)))
+    with pytest.raises(HolodeckException, match="marble"):
+        env.spawn_props("box", np.zeros((2, 3)), materials=["marble", "wood"])
+    assert env._command_center.queue_size == 0
+
+
+def test_large_scenes_are_spread_over_ticks(env):
+    env.spawn_props("box", np.random.rand(20000, 3) * 1000, tags="wall")
+    assert env.command_backlog_ticks > 1
+    assert env.flush_commands() > 1
+    assert env._command_center.queue_size == 0
+
+
+def test_scene_files(env, tmp_path):
+    locations = np.arange(15, dtype=np.float32).reshape(5, 3)
+    npz = str(tmp_path / "scene.npz")
+    np.savez(npz, types=np.array(["box", "sphere", "box", "cone", "box"]), locations=locations,
+             scales=np.arange(1, 6), materials=np.array("steel"))
+    jsonl = str(tmp_path / "scene.jsonl")
+    with open(jsonl, "w") as scene:
+        for location in locations.tolist():
+            scene.write(json.dumps({"prop_type": "box", "location": location, "scale": 2}) + "\n")
+
+    sent = []
+    original = env._command_center.handle_buffer
+
+    def record():
+        sent.append(env._command_center.queue_size)
+        original()
+    env._command_center.handle_buffer = record
+
+    assert env.spawn_props_from_file(npz, chunk_size=2) == 5
+    # Each chunk was sent before the next one was queued
+    assert max(sent) == 2
+    assert env.spawn_props_from_file(jsonl, chunk_size=2) == 5
+    assert env._command_center.queue_size == 0
+
+
+def test_scene_file_needs_locations(env, tmp_path):
+    path = str(tmp_path / "scene.npz")
+    np.savez(path, types=np.array(["box"]))
+    with pytest.raises(HolodeckException, match="locations"):
+        env.spawn_props_from_file(path)
@@ -0,0 +1,98 @@
+import uuid
+
+import numpy as np
+import pytest
+
+from holodeck.environments import HolodeckEnvironment
+from holodeck.exceptions import HolodeckException
+from holodeck.sensors import SensorDefinition
+from holodeck import standin
+from holodeck.standin import _parse_engine_args
+
+SCENARIO = {
+    "name": "StandIn",
+    "world": "StandInWorld",
+    "main_agent": "uav0",
+    "agents": [{
+        "agent_name": "uav0",
+        "agent_type": "UavAgent",
+        "control_scheme": 0,
+        "location": [1, 2, 3],
+        "sensors": [{"sensor_type": "LocationSensor"},
+                    {"sensor_type": "VelocitySensor"},
+                    {"sensor_type": "RGBCamera",
+                     "configuration": {"CaptureWidth": 4, "CaptureHeight": 4}},
+                    {"sensor_type": "DistanceTask"}]
+    }]
+}
+
+
+@pytest.fixture(scope="module")
+def binary_path(tmp_path_factory):
+    return standin.binary_path(str(tmp_path_factory.mktemp("standin")))
+
+
+def make_env(binary_path, **kwargs):
+    return HolodeckEnvironment(scenario=SCENARIO, binary_path=binary_path,
+                               uuid=str(uuid.uuid4()), pre_start_steps=0, show_viewport=False,
+                               **kwargs)
+
+
+def test_engine_serves_the_scenario(binary_path):
+    with make_env(binary_path) as env:
+        state = env.reset()
+        assert sorted(state) == ["DistanceTask", "LocationSensor", "RGBCamera", "VelocitySensor"]
+
+        first, reward, terminal, _ = env.step(np.zeros(4))
+        second, _, _, _ = env.step(np.zeros(4))
+        np.testing.assert_array_equal(first["LocationSensor"], [1, 2, 3])
+        assert reward == 0 and not terminal
+        # The synthetic data changes every tick
+        assert not np.array_equal(first["VelocitySensor"], second["VelocitySensor"])
+        assert not np.array_equal(first["RGBCamera"], second["RGBCamera"])
+
+
+def test_engine_follows_teleports_and_sensor_changes(binary_path):
+    with make_env(binary_path) as env:
+        env.reset()
+        env.agents["uav0"].teleport([4, 5, 6])
+        state, _, _, _ = env.step(np.zeros(4))
+        np.testing.assert_array_equal(state["LocationSensor"], [4, 5, 6])
+
+        rotation = SensorDefinition("uav0", "UavAgent", "RotationSensor", "RotationSensor")
+        env.agents["uav0"].add_sensors(rotation)
+        env.tick()
+        assert np.any(env.tick()["RotationSensor"] != 0)
+
+        env.agents["uav0"].remove_sensors(rotation)
+        assert "RotationSensor" not in env.tick()
+
+
+def test_engine_rotates_sensor_slots(binary_path):
+    with make_env(binary_path, sensor_slots=2, copy_state=False) as env:
+        env.reset()
+        first = env.step(np.zeros(4))[0]["VelocitySensor"]
+        kept = first.copy()
+        second = env.step(np.zeros(4))[0]["VelocitySensor"]
+        assert not np.shares_memory(first, second)
+        np.testing.assert_array_equal(first, kept)
+
+
+def test_engine_runs_action_schedules(binary_path):
+    with make_env(binary_path, schedule_depth=4) as env:
+        env.reset()
+        state, rewards, terminals, _ = env.step_schedule(np.zeros((3, 4)))
+        assert state["VelocitySensor"].shape == (3, 3)
+        assert state["RGBCamera"].shape == (4, 4, 4)
+        np.testing.assert_array_equal(rewards, [0, 0, 0])
+        assert not terminals.any()
+
+
+def test_engine_reads_the_binary_command_line():
+    options = _parse_engine_args(["StandInWorld", "-HolodeckOn", "--HolodeckUUID=abc",
+                                  "-HolodeckSensorSlots=3", "-HolodeckSync=futex",
+                                  "-HolodeckScheduleDepth=8", "-TicksPerSec=30"])
+    assert options == dict(uuid="abc", sync_backend="futex", sensor_slots=3, schedule_depth=8)
+
+    with pytest.raises(HolodeckException):
+        _parse_engine_args(["-HolodeckArena"])
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from holodeck.sensors import SensorDefinition
+from tests.utils.standin import AttachingServer, make_standin_env, close_standin_env, \
+    uav_definition
+
+
+class RewardServer(AttachingServer):
+    """Reports the number of served ticks as the reward of the distance task"""
+
+    def attach(self):
+        return dict(task=self.open_buffer("uav0_DistanceTask_sensor_data", [2]))
+
+    def serve_tick(self, buffers):
+        buffers["task"][:] = [self.ticks, 0]
+
+
+@pytest.fixture
+def task_env():
+    agent = uav_definition(sensors=("LocationSensor", "DistanceTask"))
+    env, process = make_standin_env(agent_definitions=[agent],
+                                    server_kwargs=dict(server_class=RewardServer))
+    env.reset()
+    yield env
+    close_standin_env(env, process)
+
+
+def test_reset_compiles_the_plan(task_env):
+    plan = task_env._plan
+    task_env.step(np.zeros(4))
+    task_env.step(np.zeros(4))
+    assert task_env._plan is plan
+
+
+def test_reward_comes_from_the_task_buffer(task_env):
+    _, first, terminal, _ = task_env.step(np.zeros(4))
+    _, second, _, _ = task_env.step(np.zeros(4))
+    assert second == first + 1
+    assert not terminal
+
+
+def test_states_are_independent_copies(task_env):
+    first = task_env.step(np.zeros(4))[0]
+    second = task_env.step(np.zeros(4))[0]
+    assert first["DistanceTask"][0] + 1 == second["DistanceTask"][0]
+    assert not np.shares_memory(first["DistanceTask"], second["DistanceTask"])
+
+
+def test_plan_follows_added_and_removed_sensors(task_env):
+    velocity = SensorDefinition("uav0", "UavAgent", "VelocitySensor", "VelocitySensor")
+    task_env.agents["uav0"].add_sensors(velocity)
+    assert "VelocitySensor" in task_env.step(np.zeros(4))[0]
+
+    task_env.agents["uav0"].remove_sensors(velocity)
+    assert "VelocitySensor" not in task_env.step(np.zeros(4))[0]
+
+
+def test_short_actions_are_padded_with_zeros(task_env):
+    agent = task_env.agents["uav0"]
+    agent.act(np.ones(4))
+    agent.act([2, 3])
+    np.testing.assert_array_equal(agent._action_buffer, [2, 3, 0, 0])
+
+
+def test_multi_agent_plan():
+    agents = [uav_definition("uav0"), uav_definition("uav1")]
+    agents[1].is_main_agent = False
+    env, process = make_standin_env(agent_definitions=agents)
+    try:
+        env.reset()
+        state = env.tick()
+        assert sorted(state) == ["uav0", "uav1"]
+        assert sorted(state["uav1"]) == ["LocationSensor", "VelocitySensor"]
+        assert env.step(np.zeros(4))[1] is None
+    finally:
+        close_standin_env(env, process)
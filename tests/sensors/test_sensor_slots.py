@@ -0,0 +1,85 @@
+import numpy as np
+
+from holodeck.agents import UavAgent
+from holodeck.sensors import LocationSensor
+from tests.utils.client import make_client
+from tests.utils.standin import AttachingServer, make_standin_env, close_standin_env
+
+
+class RotatingSlotServer(AttachingServer):
+    """Writes the tick number into the next location sensor slot, and publishes it in the header"""
+
+    def __init__(self, slots, **kwargs):
+        super(RotatingSlotServer, self).__init__(**kwargs)
+        self._slots = slots
+
+    def attach(self):
+        return dict(location=self.open_buffer("uav0_LocationSensor_sensor_data", [self._slots, 3]),
+                    header=self.open_buffer("sensor_header", [2], np.uint64))
+
+    def serve_tick(self, buffers):
+        slot = self.ticks % self._slots
+        buffers["location"][slot] = self.ticks
+        buffers["header"][:] = [self.ticks, slot]
+
+
+def test_sensor_data_follows_the_written_slot():
+    client = make_client(sensor_slots=3)
+    try:
+        sensor = LocationSensor(client, "uav0", "UAV", "LocationSensor")
+        slots = client._memory[sensor._sensor_data_key].np_array
+        assert slots.shape == (3, 3)
+
+        for tick in range(3):
+            slots[tick] = tick
+        client._sensor_header[:] = [7, 1]
+
+        assert client.tick_sequence == 7
+        assert np.all(sensor.sensor_data == 1)
+    finally:
+        client.unlink()
+
+
+def test_earlier_state_is_kept_intact():
+    client = make_client(sensor_slots=2)
+    try:
+        agent = UavAgent(client, "uav0")
+        sensor = LocationSensor(client, "uav0", "UAV", "LocationSensor")
+        agent.sensors["LocationSensor"] = sensor
+        slots = client._memory[sensor._sensor_data_key].np_array
+
+        slots[0] = 1
+        client._sensor_header[:] = [1, 0]
+        agent.update_sensor_views()
+        first = agent.agent_state_dict
+
+        slots[1] = 2
+        client._sensor_header[:] = [2, 1]
+        agent.update_sensor_views()
+
+        assert np.all(first["LocationSensor"] == 1)
+        assert np.all(agent.agent_state_dict["LocationSensor"] == 2)
+    finally:
+        client.unlink()
+
+
+def test_states_from_step_survive_the_following_ticks():
+    slots = 3
+    env, process = make_standin_env(copy_state=False, sensor_slots=slots,
+                                    server_kwargs=dict(server_class=RotatingSlotServer,
+                                                       slots=slots))
+    try:
+        env.reset()
+        kept = env.step(np.zeros(4))[0]["LocationSensor"]
+        expected = kept.copy()
+
+        for _ in range(slots - 1):
+            latest = env.step(np.zeros(4))[0]["LocationSensor"]
+            assert np.all(kept == expected)
+
+        assert np.all(latest == expected + slots - 1)
+        # One more tick and the engine writes into the kept slot again
+        env.step(np.zeros(4))
+        assert np.all(kept == expected + slots)
+    finally:
+        close_standin_env(env, process)
@@ -0,0 +1,17 @@
+import pytest
+
+from tests.utils.client import make_client
+
+
+@pytest.fixture
+def client():
+    client = make_client()
+    yield client
+    client.unlink()
+
+
+@pytest.fixture
+def arena_client():
+    client = make_client(use_arena=True)
+    yield client
+    client.unlink()
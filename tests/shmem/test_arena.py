@@ -0,0 +1,80 @@
+import json
+import mmap
+import uuid
+
+import numpy as np
+import pytest
+
+from holodeck.exceptions import HolodeckException
+from holodeck.shmem import ShmemArena, read_arena_manifest
+
+
+@pytest.fixture
+def arena():
+    arena = ShmemArena(str(uuid.uuid4()), capacity=8 * 1024 * 1024)
+    yield arena
+    arena.unlink()
+
+
+def test_blocks_are_aligned_and_disjoint(arena):
+    small = arena.allocate("small", [3], np.float32)
+    image = arena.allocate("image", (64, 64, 4), np.uint8)
+    flag = arena.allocate("flag", [1], np.uint8)
+
+    assert small.offset % 64 == 0
+    assert image.offset % mmap.PAGESIZE == 0
+    assert small.offset + small.size_bytes <= image.offset
+    assert image.offset + image.size_bytes <= flag.offset
+
+    small.np_array[:] = [1, 2, 3]
+    image.np_array[:] = 7
+    flag.np_array[0] = 1
+    assert np.all(small.np_array == [1, 2, 3])
+    assert np.all(image.np_array == 7)
+
+
+def test_manifest_is_published(arena):
+    block = arena.allocate("agent_LocationSensor_sensor_data", [3], np.float32)
+
+    with open(arena._mem_path, "rb") as f:
+        raw = f.read(ShmemArena.manifest_bytes)
+    generation, length = np.frombuffer(raw[:16], dtype=np.uint64)
+    manifest = json.loads(raw[16:16 + int(length)].decode())
+
+    # Every change moves the generation forward by two, it is only odd while writing
+    assert generation == 4
+    entry = manifest["blocks"]["agent_LocationSensor_sensor_data"]
+    assert entry["offset"] == block.offset
+    assert entry["shape"] == [3]
+    assert np.dtype(entry["dtype"]) == np.float32
+
+
+def test_snapshot_and_restore(arena):
+    block = arena.allocate("data", [16], np.float32)
+    block.np_array[:] = np.arange(16)
+    snapshot = arena.snapshot()
+
+    block.np_array[:] = 0
+    arena.restore(snapshot)
+
+    assert np.all(block.np_array == np.arange(16))
+
+
+def test_full_arena_raises(arena):
+    with pytest.raises(HolodeckException):
+        arena.allocate("too_big", [arena.capacity], np.uint8)
+
+
+def test_manifest_is_not_read_while_being_written(arena):
+    arena.allocate("data", [16], np.float32)
+    generation, manifest = read_arena_manifest(arena._mem_pointer)
+    assert generation % 2 == 0
+    assert "data" in manifest["blocks"]
+
+    # Simulate the engine reading in the middle of a rewrite
+    arena._header[0] += 1
+    with pytest.raises(HolodeckException):
+        read_arena_manifest(arena._mem_pointer, timeout=0.05)
+
+    arena._header[0] += 1
+    assert read_arena_manifest(arena._mem_pointer)[0] == generation + 2
@@ -0,0 +1,124 @@
+import os
+import time
+import uuid
+
+import numpy as np
+
+from holodeck.sensors import SensorDefinition
+from holodeck.shmem import Shmem, sweep_orphaned_segments
+from tests.utils.standin import make_standin_env, close_standin_env
+
+
+def test_close_releases_mapping():
+    block = Shmem("close_test", [4], np.float32, str(uuid.uuid4()))
+    block.np_array[:] = 1
+    block.close()
+
+    assert block.closed
+    assert block.np_array is None
+    block.unlink()
+    assert not os.path.exists(block._mem_path)
+
+
+def test_no_file_descriptor_is_leaked():
+    before = len(os.listdir("/proc/self/fd"))
+    blocks = [Shmem("fd_test_" + str(i), [16], np.float32, str(uuid.uuid4())) for i in range(8)]
+    for block in blocks:
+        block.unlink()
+    assert len(os.listdir("/proc/self/fd")) == before
+
+
+def test_malloc_is_reference_counted(client):
+    first = client.malloc("shared", [3], np.float32)
+    second = client.malloc("shared", [3], np.float32)
+    assert np.shares_memory(first, second)
+
+    client.free("shared")
+    assert "shared" in client._memory
+    client.free("shared")
+    assert "shared" not in client._memory
+    assert "shared" in client._pool
+
+
+def test_freed_block_is_reused(client):
+    data = client.malloc("agent_RGBCamera_sensor_data", (8, 8, 4), np.uint8)
+    data[:] = 3
+    client.free("agent_RGBCamera_sensor_data")
+
+    again = client.malloc("agent_RGBCamera_sensor_data", (8, 8, 4), np.uint8)
+    assert np.shares_memory(data, again)
+    assert np.all(again == 3)
+
+
+def test_pool_evicts_least_recently_freed(client):
+    client.pool_size = 2
+    paths = []
+    for i in range(3):
+        key = "evict_" + str(i)
+        client.malloc(key, [1], np.float32)
+        paths.append(client._memory[key]._mem_path)
+        client.free(key)
+
+    assert list(client._pool) == ["evict_1", "evict_2"]
+    assert not os.path.exists(paths[0])
+    assert os.path.exists(paths[2])
+
+
+def test_arena_reuses_blocks_of_the_same_shape(arena_client):
+    first = arena_client.malloc("old_sensor", [6], np.float32)
+    arena_client.free("old_sensor")
+    second = arena_client.malloc("new_sensor", [6], np.float32)
+
+    assert np.shares_memory(first, second)
+    assert "new_sensor" in arena_client.arena.manifest()["blocks"]
+    assert "old_sensor" not in arena_client.arena.manifest()["blocks"]
+
+
+def test_arena_fills_holes():
+    from tests.utils.client import make_client
+    client = make_client(use_arena=True, pool_size=0)
+    try:
+        client.malloc("a", [1024], np.uint8)
+        client.malloc("b", [16], np.uint8)
+        used = client.arena.used_bytes
+        client.free("a")
+        client.malloc("c", [512], np.uint8)
+        assert client.arena.used_bytes == used
+    finally:
+        client.unlink()
+
+
+def test_sweeper_removes_only_orphans():
+    orphan_path = "/dev/shm/HOLODECK_MEM" + str(uuid.uuid4()) + "_orphan"
+    with open(orphan_path, "wb") as f:
+        f.write(b"\0" * 16)
+    old = time.time() - 3600
+    os.utime(orphan_path, (old, old))
+
+    live = Shmem("live", [4], np.float32, str(uuid.uuid4()))
+    os.utime(live._mem_path, (old, old))
+
+    removed = sweep_orphaned_segments()
+
+    assert orphan_path in removed
+    assert not os.path.exists(orphan_path)
+    assert os.path.exists(live._mem_path)
+    live.unlink()
+
+
+def test_readded_sensor_frees_the_one_it_replaces():
+    env, process = make_standin_env()
+    try:
+        agent = env.agents["uav0"]
+        replaced = agent.sensors["LocationSensor"]
+        key = replaced._sensor_data_key
+
+        agent.add_sensors(SensorDefinition("uav0", "UavAgent", "LocationSensor", "LocationSensor"))
+        assert replaced._sensor_data_key is None
+        assert env._client._refcounts[key] == 1
+
+        agent.remove_sensors(SensorDefinition("uav0", "UavAgent", "LocationSensor",
+                                              "LocationSensor"))
+        assert key not in env._client._refcounts
+    finally:
+        close_standin_env(env, process)
@@ -0,0 +1,82 @@
+import mmap
+import struct
+import threading
+import uuid
+
+import pytest
+
+from holodeck.holodeckclient import HolodeckClient
+from holodeck.standin import StandInServer, start_server_process
+
+
+@pytest.mark.parametrize("sync_backend", ["semaphore", "futex"])
+def test_round_trips_against_server_process(sync_backend):
+    env_uuid = str(uuid.uuid4())
+    process = start_server_process(env_uuid, sync_backend)
+    client = HolodeckClient(env_uuid, should_timeout=True, sync_backend=sync_backend)
+    try:
+        client.acquire()
+        for _ in range(200):
+            client.release()
+            client.acquire()
+    finally:
+        process.terminate()
+        process.join()
+        client.unlink()
+
+
+@pytest.mark.parametrize("sync_backend", ["semaphore", "futex"])
+def test_every_release_is_one_tick(sync_backend):
+    env_uuid = str(uuid.uuid4())
+    server = StandInServer(env_uuid, sync_backend)
+    thread = threading.Thread(target=server.serve, args=(50,), daemon=True)
+    thread.start()
+
+    client = HolodeckClient(env_uuid, should_timeout=True, sync_backend=sync_backend)
+    try:
+        client.acquire()
+        for _ in range(50):
+            client.release()
+            client.acquire()
+        thread.join(5)
+        assert server.ticks == 50
+    finally:
+        client.unlink()
+
+
+def test_futex_wait_times_out():
+    env_uuid = str(uuid.uuid4())
+    server = StandInServer(env_uuid, "futex")
+    client = HolodeckClient(env_uuid, should_timeout=True, sync_backend="futex")
+    client.sync_backend.timeout = 0.05
+    try:
+        with pytest.raises(TimeoutError):
+            client.acquire()
+    finally:
+        server.unlink()
+        client.unlink()
+
+
+def test_futex_ignores_counters_of_a_stale_session():
+    env_uuid = str(uuid.uuid4())
+    # A crashed session left its counters behind
+    path = "/dev/shm/HOLODECK_MEM" + env_uuid + "_futex_sync"
+    with open(path, "wb") as stale:
+        stale.write(struct.pack("II", 7, 5) + bytes(mmap.PAGESIZE - 8))
+
+    server = StandInServer(env_uuid, "futex")
+    thread = threading.Thread(target=server.serve, args=(20,), daemon=True)
+    thread.start()
+    client = HolodeckClient(env_uuid, should_timeout=True, sync_backend="futex")
+    client.sync_backend.timeout = 5
+    try:
+        client.acquire()
+        assert server.ticks == 0
+        for i in range(20):
+            client.release()
+            client.acquire()
+            # The server ran exactly the tick that was released
+            assert server.ticks == i + 1
+        thread.join(5)
+    finally:
+        client.unlink()
@@ -0,0 +1,13 @@
+import os
+import uuid
+
+from holodeck.holodeckclient import HolodeckClient
+
+
+def make_client(**kwargs):
+    """Creates a client along with the semaphores that the engine would normally create"""
+    import posix_ipc
+    client_uuid = str(uuid.uuid4())
+    posix_ipc.Semaphore("/HOLODECK_SEMAPHORE_SERVER" + client_uuid, os.O_CREAT, initial_value=0)
+    posix_ipc.Semaphore("/HOLODECK_SEMAPHORE_CLIENT" + client_uuid, os.O_CREAT, initial_value=0)
+    return HolodeckClient(client_uuid, **kwargs)
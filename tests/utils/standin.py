@@ -0,0 +1,97 @@
+import uuid
+
+import numpy as np
+
+from holodeck.agents import AgentDefinition
+from holodeck.environments import HolodeckEnvironment
+from holodeck.sensors import SensorDefinition
+from holodeck.shmem import Shmem
+from holodeck.standin import StandInServer, start_server_process
+
+
+class AttachingServer(StandInServer):
+    """A stand-in server that writes into buffers of the client.
+
+    The client only creates its buffers once the agent is spawned, so the buffers returned by
+    :meth:`attach` are opened on the first tick that finds them, and ticks before that do nothing.
+    Subclasses fill the buffers in :meth:`serve_tick`.
+    """
+
+    def __init__(self, **kwargs):
+        super(AttachingServer, self).__init__(**kwargs)
+        self.buffers = None
+
+    def open_buffer(self, name, shape, dtype=np.float32):
+        return Shmem(name, shape, dtype, self._uuid, create=False).np_array
+
+    def attach(self):
+        """
+        Returns:
+            :obj:`dict`: The buffers to serve, opened with :meth:`open_buffer`.
+        """
+        raise NotImplementedError
+
+    def serve_tick(self, buffers):
+        raise NotImplementedError
+
+    def tick(self):
+        if self.buffers is None:
+            try:
+                self.buffers = self.attach()
+            except FileNotFoundError:
+                return
+        self.serve_tick(self.buffers)
+
+
+class CountingServer(AttachingServer):
+    """Writes the number of served ticks, plus ``offset``, into the location sensor of uav0"""
+
+    def __init__(self, offset=0, **kwargs):
+        super(CountingServer, self).__init__(**kwargs)
+        self._offset = offset
+
+    def attach(self):
+        return dict(location=self.open_buffer("uav0_LocationSensor_sensor_data", [3]))
+
+    def serve_tick(self, buffers):
+        buffers["location"][:] = self.ticks + self._offset
+
+
+class GatedServer(StandInServer):
+    """Holds every tick until ``gate``, a :class:`multiprocessing.Event`, is set"""
+
+    def __init__(self, gate, **kwargs):
+        super(GatedServer, self).__init__(**kwargs)
+        self._gate = gate
+
+    def tick(self):
+        # Give up eventually, so that a failing test can't hang the server
+        self._gate.wait(10)
+
+
+
+def uav_definition(name="uav0", sensors=("LocationSensor", "VelocitySensor")):
+    """A main UAV agent with the given sensor types"""
+    sensor_defs = [SensorDefinition(name, "UavAgent", sensor, sensor) for sensor in sensors]
+    return AgentDefinition(name, "UavAgent", sensors=sensor_defs, is_main_agent=True)
+
+
+def make_standin_env(agent_definitions=None, server_kwargs=None, **kwargs):
+    """Creates an environment served by a stand-in server process instead of a world binary.
+
+    Returns:
+        (HolodeckEnvironment, multiprocessing.Process): The environment and the server process.
+    """
+    env_uuid = str(uuid.uuid4())
+    process = start_server_process(env_uuid, **(server_kwargs or {}))
+    if agent_definitions is None:
+        agent_definitions = [uav_definition()]
+    env = HolodeckEnvironment(agent_definitions=agent_definitions, start_world=False,
+                              uuid=env_uuid, pre_start_steps=0, **kwargs)
+    return env, process
+
+
+def close_standin_env(env, process):
+    env.__on_exit__()
+    process.terminate()
+    process.join()
@@ -0,0 +1,70 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from holodeck.exceptions import HolodeckException
+from holodeck.scheduler import CompletionScheduler
+from tests.utils.standin import GatedServer, make_standin_env, close_standin_env
+
+
+@pytest.fixture
+def scheduler():
+    pairs = [make_standin_env(), make_standin_env()]
+    scheduler = CompletionScheduler([env for env, _ in pairs])
+    scheduler.reset()
+    yield scheduler
+    for env, process in pairs:
+        close_standin_env(env, process)
+
+
+def test_every_submitted_step_is_yielded(scheduler):
+    scheduler.submit(0, np.zeros(4))
+    scheduler.submit(1, np.zeros(4))
+
+    results = dict(scheduler.results())
+    assert sorted(results) == [0, 1]
+    state, _, _, _ = results[0]
+    assert "LocationSensor" in state
+    assert scheduler.num_pending == 0
+
+
+def test_submitting_twice_raises(scheduler):
+    scheduler.submit(0, np.zeros(4))
+    with pytest.raises(HolodeckException):
+        scheduler.submit(0, np.zeros(4))
+    list(scheduler.results())
+
+
+def test_fast_engines_are_not_held_back_by_slow_ones():
+    gate = multiprocessing.Event()
+    gate.set()
+    slow_env, slow_process = make_standin_env(server_kwargs=dict(server_class=GatedServer,
+                                                                 gate=gate))
+    fast_env, fast_process = make_standin_env()
+    try:
+        scheduler = CompletionScheduler([slow_env, fast_env])
+        scheduler.reset()
+
+        # The slow environment can't finish its step until the fast one has stepped five times
+        gate.clear()
+        scheduler.submit(0, np.zeros(4))
+        scheduler.submit(1, np.zeros(4))
+        order = []
+        for env_id, _ in scheduler.results(timeout=10):
+            order.append(env_id)
+            if env_id == 1 and len(order) < 5:
+                scheduler.submit(1, np.zeros(4))
+            elif env_id == 1:
+                gate.set()
+
+        assert order == [1, 1, 1, 1, 1, 0]
+        stats = scheduler.stats()
+        assert stats[0]["steps"] == 1
+        assert stats[1]["steps"] == 5
+        # The slow step was pending during all five fast ones
+        assert stats[0]["latency"] > stats[1]["latency"]
+    finally:
+        gate.set()
+        close_standin_env(slow_env, slow_process)
+        close_standin_env(fast_env, fast_process)
@@ -0,0 +1,73 @@
+import functools
+import os
+import uuid
+
+import numpy as np
+import pytest
+
+from holodeck.environments import HolodeckEnvironment
+from holodeck.exceptions import HolodeckException
+from holodeck.standin import start_server_process
+from holodeck.vectorenvironments import SubprocVectorHolodeckEnvironment
+from tests.utils.standin import CountingServer, uav_definition
+
+
+def make_env(env_uuid):
+    return HolodeckEnvironment(agent_definitions=[uav_definition()], start_world=False,
+                               uuid=env_uuid, pre_start_steps=0, copy_state=False)
+
+
+@pytest.fixture
+def subproc_env():
+    uuids = [str(uuid.uuid4()) for _ in range(2)]
+    servers = [start_server_process(env_uuid, server_class=CountingServer, offset=1)
+               for env_uuid in uuids]
+    env = SubprocVectorHolodeckEnvironment([functools.partial(make_env, u) for u in uuids])
+    yield env
+    env.close()
+    for server in servers:
+        server.terminate()
+        server.join()
+
+
+def test_states_are_gathered_in_shared_memory(subproc_env):
+    states = subproc_env.reset()
+    assert states["LocationSensor"].shape == (2, 3)
+
+    stepped, rewards, terminals, infos = subproc_env.step(np.zeros((2, 4), dtype=np.float32))
+
+    # The same batch buffers are returned every time, and the workers have written into them
+    assert stepped["LocationSensor"] is states["LocationSensor"]
+    assert np.all(stepped["LocationSensor"] == stepped["LocationSensor"][0, 0])
+    assert stepped["LocationSensor"][0, 0] > 0
+    assert rewards.shape == (2,) and terminals.shape == (2,)
+    assert len(infos) == 2
+
+
+def test_states_follow_the_ticks(subproc_env):
+    subproc_env.reset()
+    first = subproc_env.step(np.zeros((2, 4)))[0]["LocationSensor"].copy()
+    second = subproc_env.step(np.zeros((2, 4)))[0]["LocationSensor"]
+    assert np.all(second == first + 1)
+
+
+def test_batch_buffers_are_removed_on_close():
+    env_uuid = str(uuid.uuid4())
+    server = start_server_process(env_uuid)
+    try:
+        env = SubprocVectorHolodeckEnvironment([functools.partial(make_env, env_uuid)])
+        paths = [block._mem_path for block in env._batch_memory]
+        env.close()
+        assert paths
+        assert not any(os.path.exists(path) for path in paths)
+    finally:
+        server.terminate()
+        server.join()
+
+
+def test_worker_errors_are_raised():
+    def failing_env():
+        raise RuntimeError("no world")
+
+    with pytest.raises(HolodeckException, match="no world"):
+        SubprocVectorHolodeckEnvironment([failing_env])
@@ -0,0 +1,155 @@
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from holodeck.exceptions import HolodeckException
+from holodeck.standin import StandInServer
+from holodeck.vectorenvironments import VectorHolodeckEnvironment
+from tests.utils.standin import AttachingServer, make_standin_env, close_standin_env, \
+    uav_definition
+
+
+class BarrierServer(StandInServer):
+    """Once armed, every tick waits until all servers sharing the barrier are ticking"""
+
+    def __init__(self, barrier, armed, broken, **kwargs):
+        super(BarrierServer, self).__init__(**kwargs)
+        self._barrier = barrier
+        self._armed = armed
+        self._broken = broken
+
+    def tick(self):
+        if self._armed.is_set():
+            try:
+                self._barrier.wait(5)
+            except threading.BrokenBarrierError:
+                self._broken.set()
+
+
+class TaskServer(AttachingServer):
+    """Reports a terminal through the task sensor while ``finished`` is set, and takes ``delay``
+    seconds to handle a reset"""
+
+    def __init__(self, finished, delay, **kwargs):
+        super(TaskServer, self).__init__(**kwargs)
+        self._finished = finished
+        self._delay = delay
+
+    def attach(self):
+        return dict(reset=self.open_buffer("RESET", [1], bool),
+                    task=self.open_buffer("uav0_DistanceTask_sensor_data", [2]))
+
+    def serve_tick(self, buffers):
+        if buffers["reset"][0]:
+            time.sleep(self._delay)
+            buffers["reset"][0] = False
+        buffers["task"][:] = 1 if self._finished.is_set() else 0
+
+
+@pytest.fixture
+def vector_env():
+    pairs = [make_standin_env(copy_state=False) for _ in range(3)]
+    yield VectorHolodeckEnvironment([env for env, _ in pairs])
+    for env, process in pairs:
+        close_standin_env(env, process)
+
+
+def test_states_are_stacked(vector_env):
+    states = vector_env.reset()
+    assert states["LocationSensor"].shape == (3, 3)
+
+    actions = np.ones((3, 4), dtype=np.float32)
+    states, rewards, terminals, infos = vector_env.step(actions)
+
+    assert states["VelocitySensor"].shape == (3, 3)
+    assert rewards.shape == (3,) and rewards.dtype == np.float32
+    assert terminals.shape == (3,) and terminals.dtype == bool
+    assert len(infos) == 3
+
+
+def test_actions_are_written_per_env(vector_env):
+    vector_env.reset()
+    actions = np.arange(12, dtype=np.float32).reshape(3, 4)
+    vector_env.step(actions)
+
+    for i, env in enumerate(vector_env.envs):
+        assert np.all(env.agents["uav0"]._action_buffer == actions[i])
+
+
+def test_wrong_number_of_actions_raises(vector_env):
+    vector_env.reset()
+    with pytest.raises(HolodeckException):
+        vector_env.step(np.zeros((2, 4)))
+
+
+def test_bad_action_leaves_no_tick_pending(vector_env):
+    vector_env.reset()
+    with pytest.raises(ValueError):
+        vector_env.step([np.zeros(4), np.zeros(9), np.zeros(4)])
+
+    states, _, _, _ = vector_env.step(np.zeros((3, 4)))
+    assert states["LocationSensor"].shape == (3, 3)
+
+
+def test_every_engine_is_released_before_waiting():
+    barrier = multiprocessing.Barrier(3)
+    armed = multiprocessing.Event()
+    broken = multiprocessing.Event()
+    server_kwargs = dict(server_class=BarrierServer, barrier=barrier, armed=armed, broken=broken)
+    pairs = [make_standin_env(copy_state=False, server_kwargs=server_kwargs) for _ in range(3)]
+    try:
+        vector_env = VectorHolodeckEnvironment([env for env, _ in pairs])
+        vector_env.reset()
+
+        # A server only finishes its tick once all three are in the middle of one
+        armed.set()
+        vector_env.step(np.zeros((3, 4)))
+        vector_env.tick()
+        assert not broken.is_set()
+    finally:
+        armed.clear()
+        for env, process in pairs:
+            close_standin_env(env, process)
+
+
+def test_terminated_envs_are_reset_in_the_background():
+    finished = multiprocessing.Event()
+    agents = [uav_definition(sensors=("LocationSensor", "DistanceTask"))]
+    pairs = [make_standin_env(agent_definitions=agents, copy_state=False,
+                              server_kwargs=dict(server_class=TaskServer, delay=delay,
+                                                 finished=event))
+             for delay, event in ((0.1, finished), (0, multiprocessing.Event()))]
+    try:
+        vector_env = VectorHolodeckEnvironment([env for env, _ in pairs], auto_reset=True)
+        vector_env.reset()
+
+        finished.set()
+        _, rewards, terminals, _ = vector_env.step(np.zeros((2, 4)))
+        finished.clear()
+        assert terminals.tolist() == [True, False]
+        assert rewards[0] == 1
+
+        # The other environment keeps stepping while the first one resets
+        _, _, terminals, infos = vector_env.step(np.zeros((2, 4)))
+        assert infos[0] == {"resetting": True}
+        assert vector_env.num_resetting == 1
+        assert not terminals.any()
+
+        for _ in range(100):
+            time.sleep(0.02)
+            states, rewards, terminals, infos = vector_env.step(np.zeros((2, 4)))
+            if infos[0] != {"resetting": True}:
+                break
+        assert infos[0] == {"reset": True}
+        assert states["LocationSensor"].shape == (2, 3)
+        assert vector_env.num_resetting == 0
+
+        _, _, _, infos = vector_env.step(np.zeros((2, 4)))
+        assert infos[0] is None
+        vector_env.close()
+    finally:
+        for env, process in pairs:
+            close_standin_env(env, process)